@@ -0,0 +1,209 @@
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Opt-in: "1"/"print" prints a summary table at exit, a path ending in .json
+# writes the summary there instead.
+API_METRICS_ENV = "AWS_API_METRICS"
+
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+    "ProvisionedThroughputExceededException",
+    "SlowDown",
+}
+
+_START_KEY = "api_metrics_start"
+_THROTTLES_KEY = "api_metrics_throttles"
+_OPERATION_KEY = "api_metrics_operation"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _error_code(parsed):
+    if isinstance(parsed, dict):
+        return parsed.get("Error", {}).get("Code")
+    return None
+
+
+class ApiCallMetrics:
+    """Per-(service, operation) call counts, latencies, retries, throttles and errors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+        self._retries = defaultdict(int)
+        self._throttles = defaultdict(int)
+        self._errors = defaultdict(int)
+
+    def record(self, service, operation, latency, retries=0, throttles=0, error=False):
+        key = (service, operation)
+        with self._lock:
+            self._latencies[key].append(latency)
+            self._retries[key] += retries
+            self._throttles[key] += throttles
+            if error:
+                self._errors[key] += 1
+
+    # botocore event handlers ---------------------------------------------
+
+    def before_call(self, model=None, context=None, **kwargs):
+        if context is not None:
+            context[_START_KEY] = time.perf_counter()
+            context[_THROTTLES_KEY] = 0
+            if model is not None:
+                # after-call-error only receives the context, so keep the operation there
+                context[_OPERATION_KEY] = (model.service_model.service_name, model.name)
+
+    def needs_retry(self, response=None, request_dict=None, **kwargs):
+        # Called after every attempt; counts the throttled ones (even if a retry succeeds)
+        if response is None or request_dict is None:
+            return None
+        _, parsed = response
+        if _error_code(parsed) in THROTTLING_ERROR_CODES:
+            context = request_dict.get("context", {})
+            context[_THROTTLES_KEY] = context.get(_THROTTLES_KEY, 0) + 1
+        return None
+
+    def after_call(self, model=None, parsed=None, context=None, **kwargs):
+        context = context or {}
+        start = context.get(_START_KEY)
+        if model is None or start is None:
+            return
+        metadata = parsed.get("ResponseMetadata", {}) if isinstance(parsed, dict) else {}
+        self.record(
+            model.service_model.service_name,
+            model.name,
+            time.perf_counter() - start,
+            retries=metadata.get("RetryAttempts", 0),
+            throttles=context.get(_THROTTLES_KEY, 0),
+            error=_error_code(parsed) is not None,
+        )
+
+    def after_call_error(self, context=None, **kwargs):
+        # Raised before a response was parsed (e.g. connection errors)
+        context = context or {}
+        start = context.get(_START_KEY)
+        operation = context.get(_OPERATION_KEY)
+        if operation is not None and start is not None:
+            service, operation_name = operation
+            self.record(
+                service,
+                operation_name,
+                time.perf_counter() - start,
+                throttles=context.get(_THROTTLES_KEY, 0),
+                error=True,
+            )
+
+    def instrument(self, client):
+        """Register the handlers on a boto3 client's event system."""
+        events = client.meta.events
+        events.register("before-call", self.before_call)
+        events.register("needs-retry", self.needs_retry)
+        events.register("after-call", self.after_call)
+        events.register("after-call-error", self.after_call_error)
+        return client
+
+    # reporting ------------------------------------------------------------
+
+    def summary(self):
+        """Return one dict per (service, operation), sorted by call count."""
+        with self._lock:
+            keys = list(self._latencies)
+            rows = []
+            for service, operation in keys:
+                latencies = sorted(self._latencies[(service, operation)])
+                rows.append({
+                    "Service": service,
+                    "Operation": operation,
+                    "Calls": len(latencies),
+                    "TotalSeconds": round(sum(latencies), 4),
+                    "P50Ms": round(percentile(latencies, 0.5) * 1000, 1),
+                    "P90Ms": round(percentile(latencies, 0.9) * 1000, 1),
+                    "P99Ms": round(percentile(latencies, 0.99) * 1000, 1),
+                    "Retries": self._retries[(service, operation)],
+                    "Throttles": self._throttles[(service, operation)],
+                    "Errors": self._errors[(service, operation)],
+                })
+        rows.sort(key=lambda row: (-row["Calls"], row["Service"], row["Operation"]))
+        return rows
+
+    def format_table(self):
+        rows = self.summary()
+        if not rows:
+            return "[*] AWS API calls: none recorded"
+
+        columns = list(rows[0])
+        widths = {
+            column: max(len(column), *(len(str(row[column])) for row in rows))
+            for column in columns
+        }
+        lines = ["[*] AWS API calls:"]
+        lines.append("  ".join(column.ljust(widths[column]) for column in columns))
+        for row in rows:
+            lines.append("  ".join(str(row[column]).ljust(widths[column]) for column in columns))
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        print(f"[+] AWS API call metrics saved to {path}")
+
+
+_metrics = None
+_configured = False
+_lock = threading.Lock()
+
+
+def enable_api_metrics(output=None):
+    """Turn on API call accounting for every client created afterwards.
+
+    ``output`` is a JSON path to write at exit; without it the summary table is
+    printed at exit. Returns the process-wide ApiCallMetrics.
+    """
+    global _metrics, _configured
+    with _lock:
+        _configured = True
+        if _metrics is None:
+            _metrics = ApiCallMetrics()
+            if output:
+                atexit.register(_metrics.write_json, output)
+            else:
+                atexit.register(lambda: print(_metrics.format_table()))
+        return _metrics
+
+
+def get_api_metrics():
+    """Return the active ApiCallMetrics, enabling it from AWS_API_METRICS if set."""
+    global _configured
+    if not _configured:
+        setting = os.environ.get(API_METRICS_ENV, "").strip()
+        if setting and setting.lower() not in ("0", "false", "no"):
+            enable_api_metrics(setting if setting.lower().endswith(".json") else None)
+        _configured = True
+    return _metrics
+
+
+def instrument_client(client):
+    """Attach the metrics handlers to a client when accounting is enabled."""
+    metrics = get_api_metrics()
+    if metrics is not None:
+        metrics.instrument(client)
+    return client
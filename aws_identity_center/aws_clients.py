@@ -0,0 +1,82 @@
+import threading
+from functools import lru_cache
+
+import boto3
+from botocore.config import Config
+
+from api_metrics import instrument_client
+
+# Upper bound on concurrent AWS API calls made by the loaders and scanners.
+DEFAULT_MAX_WORKERS = 16
+
+
+@lru_cache(maxsize=None)
+def client_config(max_workers=DEFAULT_MAX_WORKERS):
+    """Return the client Config for ``max_workers`` threads sharing one client.
+
+    One pooled connection per worker thread, and adaptive client-side rate
+    limiting so throttled fan-outs back off instead of failing.
+    """
+    return Config(
+        max_pool_connections=max(1, max_workers),
+        retries={"max_attempts": 10, "mode": "adaptive"},
+    )
+
+
+CLIENT_CONFIG = client_config(DEFAULT_MAX_WORKERS)
+
+_sessions = {}
+_clients = {}  # (profile, service, region) -> (client, connection pool size)
+_lock = threading.Lock()
+
+
+def get_session(profile=None):
+    """Return the cached boto3 session for a profile (None means the default session)."""
+    with _lock:
+        return _get_session(profile)
+
+
+def _get_session(profile):
+    session = _sessions.get(profile)
+    if session is None:
+        session = boto3.Session(profile_name=profile)
+        _sessions[profile] = session
+    return session
+
+
+def get_client(service_name, profile=None, region=None, max_workers=DEFAULT_MAX_WORKERS):
+    """Return a cached client for (profile, service, region), creating it on first use.
+
+    Clients are safe to share between threads; sessions are not, so creation is
+    serialized behind a lock. The connection pool holds ``max_workers``
+    connections: a cached client with a smaller pool is replaced by a larger
+    one, and callers asking for fewer workers reuse the larger client. With
+    AWS_API_METRICS set, every client is instrumented by api_metrics.
+    """
+    key = (profile, service_name, region)
+    cached = _clients.get(key)
+    if cached is not None and cached[1] >= max_workers:
+        return cached[0]
+
+    with _lock:
+        cached = _clients.get(key)
+        if cached is None or cached[1] < max_workers:
+            config = client_config(max_workers)
+            if profile:
+                client = _get_session(profile).client(
+                    service_name, region_name=region, config=config
+                )
+            else:
+                client = boto3.client(
+                    service_name, region_name=region, config=config
+                )
+            cached = _clients[key] = (instrument_client(client), max_workers)
+
+    return cached[0]
+
+
+def clear_client_cache():
+    """Forget every cached session and client (used by the tests)."""
+    with _lock:
+        _sessions.clear()
+        _clients.clear()
@@ -0,0 +1,287 @@
+import argparse
+import csv
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+from faker import Faker
+
+from find_duplicate_inline_statement import (
+    StatementMatchCache,
+    find_duplicate_statements,
+    statement_match_cache,
+)
+from find_duplicate_policies import (
+    detect_full_matches,
+    detect_partial_matches,
+    detect_subsumptions,
+)
+from iam_action_catalog import clear_default_catalog
+from iam_patterns import (
+    action_pattern_trie,
+    compile_action_pattern,
+    compile_resource_pattern,
+    resource_pattern_trie,
+)
+from profiling import run_with_profiling
+from statement_matching import (
+    constraint_covers,
+    frozen_condition_covers,
+    statements_match,
+)
+
+# Service -> a few real actions, used to build synthetic statements
+SERVICE_ACTIONS = {
+    "s3": ["GetObject", "PutObject", "DeleteObject", "ListBucket", "GetBucketPolicy"],
+    "ec2": ["DescribeInstances", "StartInstances", "StopInstances", "DescribeVolumes"],
+    "dynamodb": ["GetItem", "PutItem", "Query", "Scan", "DescribeTable"],
+    "lambda": ["InvokeFunction", "GetFunction", "ListFunctions", "UpdateFunctionCode"],
+    "sqs": ["SendMessage", "ReceiveMessage", "DeleteMessage", "GetQueueUrl"],
+    "logs": ["CreateLogGroup", "PutLogEvents", "DescribeLogGroups", "GetLogEvents"],
+    "glue": ["GetTable", "GetDatabase", "StartJobRun", "GetJobRun"],
+    "kms": ["Decrypt", "Encrypt", "GenerateDataKey", "DescribeKey"],
+}
+WILDCARD_VERBS = ["Get", "Put", "Describe", "List", "Start"]
+
+DEFAULT_SIZES = [10, 50, 200]
+# statements_match is timed on this many random statement pairs per statement
+PAIRS_PER_STATEMENT = 10
+ANALYZERS = [
+    "detect_full_matches",
+    "detect_partial_matches",
+    "detect_subsumptions",
+    "find_duplicate_statements",
+    "statements_match",
+]
+
+
+class SyntheticInstanceGenerator:
+    """Seeded generator of Identity Center-like inline policies.
+
+    ``wildcard_ratio`` is the share of statements using wildcard actions and
+    ``shared_ratio`` the share copied from a pool shared by all permission sets.
+    """
+
+    def __init__(self, seed=42, wildcard_ratio=0.2, shared_ratio=0.3):
+        self.random = random.Random(seed)
+        self.faker = Faker()
+        self.faker.seed_instance(seed)
+        self.wildcard_ratio = wildcard_ratio
+        self.shared_ratio = shared_ratio
+        self.account_id = self.faker.numerify("############")
+        self.shared_pool = [self.statement() for _ in range(50)]
+
+    def actions(self):
+        service = self.random.choice(sorted(SERVICE_ACTIONS))
+        if self.random.random() < self.wildcard_ratio:
+            if self.random.random() < 0.3:
+                return f"{service}:*"
+            return f"{service}:{self.random.choice(WILDCARD_VERBS)}*"
+        count = self.random.randint(1, 3)
+        names = self.random.sample(SERVICE_ACTIONS[service], count)
+        return [f"{service}:{name}" for name in names]
+
+    def resource(self):
+        roll = self.random.random()
+        if roll < 0.3:
+            return "*"
+        bucket = self.faker.slug()
+        if roll < 0.6:
+            return f"arn:aws:s3:::{bucket}/*"
+        return [f"arn:aws:s3:::{bucket}", f"arn:aws:s3:::{bucket}/*"]
+
+    def statement(self):
+        statement = {
+            "Effect": "Allow" if self.random.random() < 0.9 else "Deny",
+            "Action": self.actions(),
+            "Resource": self.resource(),
+        }
+        if self.random.random() < 0.1:
+            statement["Condition"] = {
+                "StringEquals": {"aws:PrincipalAccount": self.account_id}
+            }
+        return statement
+
+    def policy(self, statements_per_policy):
+        statements = []
+        for _ in range(statements_per_policy):
+            if self.random.random() < self.shared_ratio:
+                statements.append(dict(self.random.choice(self.shared_pool)))
+            else:
+                statements.append(self.statement())
+        return {"Version": "2012-10-17", "Statement": statements}
+
+    def instance(self, permission_sets, statements_per_policy):
+        """Return {permission set name: inline policy text}."""
+        policies = {}
+        while len(policies) < permission_sets:
+            name = f"{self.faker.word().capitalize()}{self.faker.job().split()[0]}-{len(policies)}"
+            policies[name] = json.dumps(self.policy(statements_per_policy))
+        return policies
+
+
+def build_policy_data_map(policies):
+    """Build the policy_data_map used by find_duplicate_policies' detectors."""
+    return {
+        name: {
+            "policy_text": policy_text,
+            "statements": json.loads(policy_text)["Statement"],
+        }
+        for name, policy_text in policies.items()
+    }
+
+
+def clear_analysis_caches():
+    """Reset every memo the analyzers keep between calls, so each timed run starts cold."""
+    for cached in (
+        constraint_covers,
+        frozen_condition_covers,
+        compile_action_pattern,
+        compile_resource_pattern,
+        action_pattern_trie,
+        resource_pattern_trie,
+    ):
+        cached.cache_clear()
+    statement_match_cache.clear()
+    clear_default_catalog()
+
+
+def time_call(function, repeat):
+    """Run function() ``repeat`` times from cold caches and return the durations in seconds."""
+    durations = []
+    for _ in range(repeat):
+        clear_analysis_caches()  # not timed
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def sample_statement_pairs(statements, count, seed=42):
+    """Return ``count`` seeded random pairs of two different statements (none if there are fewer than two)."""
+    if len(statements) < 2:
+        return []
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        i, j = rng.sample(range(len(statements)), 2)
+        pairs.append((statements[i], statements[j]))
+    return pairs
+
+
+def benchmark_instance(policies, repeat=3, pairs_per_statement=PAIRS_PER_STATEMENT, seed=42):
+    """Time every analyzer on one synthetic instance; returns {analyzer: durations}."""
+    def full_matches():
+        detect_full_matches(build_policy_data_map(policies))
+
+    def partial_matches():
+        policy_data_map = build_policy_data_map(policies)
+        _, full_match_pairs = detect_full_matches(policy_data_map)
+        detect_partial_matches(policy_data_map, full_match_pairs)
+
+    def subsumptions():
+        detect_subsumptions(build_policy_data_map(policies))
+
+    def duplicate_statements():
+        cache = StatementMatchCache()  # fresh per run, so repeats are not free
+        for policy_text in policies.values():
+            find_duplicate_statements(policy_text, match_cache=cache)
+
+    statements = [
+        stmt for policy_text in policies.values()
+        for stmt in json.loads(policy_text)["Statement"]
+    ]
+    # the number of pairs grows with the instance, like the analyzers' workload
+    pairs = sample_statement_pairs(statements, pairs_per_statement * len(statements), seed)
+
+    def statement_pairs():
+        for s1, s2 in pairs:
+            statements_match(s1, s2)
+
+    return {
+        "detect_full_matches": time_call(full_matches, repeat),
+        "detect_partial_matches": time_call(partial_matches, repeat),
+        "detect_subsumptions": time_call(subsumptions, repeat),
+        "find_duplicate_statements": time_call(duplicate_statements, repeat),
+        "statements_match": time_call(statement_pairs, repeat),
+    }
+
+
+def run_benchmarks(sizes, statements_per_policy, wildcard_ratio, shared_ratio, seed=42, repeat=3):
+    """Benchmark every analyzer at each instance size and return the report rows."""
+    rows = []
+    for size in sizes:
+        generator = SyntheticInstanceGenerator(seed, wildcard_ratio, shared_ratio)
+        policies = generator.instance(size, statements_per_policy)
+        print(f"[*] Benchmarking {size} permission sets x {statements_per_policy} statements")
+
+        for analyzer, durations in benchmark_instance(policies, repeat, seed=seed).items():
+            rows.append({
+                "Analyzer": analyzer,
+                "PermissionSets": size,
+                "StatementsPerPolicy": statements_per_policy,
+                "WildcardRatio": wildcard_ratio,
+                "SharedRatio": shared_ratio,
+                "Seed": seed,
+                "Repeat": repeat,
+                "BestSeconds": round(min(durations), 6),
+                "MeanSeconds": round(sum(durations) / len(durations), 6),
+            })
+            print(f"    {analyzer:<28} {min(durations):.4f}s")
+    return rows
+
+
+def save_report(rows, output_dir="outputs"):
+    """Write the benchmark rows as JSON and CSV; returns both paths."""
+    today = datetime.today().strftime("%Y-%m-%d")
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = os.path.join(output_dir, f"benchmark_policy_analysis_{today}.json")
+    csv_path = os.path.join(output_dir, f"benchmark_policy_analysis_{today}.csv")
+
+    with open(json_path, "w") as f:
+        json.dump(rows, f, indent=2)
+
+    with open(csv_path, "w", newline="") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=list(rows[0]) if rows else [])
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"[+] Benchmark report saved to {json_path} and {csv_path}")
+    return json_path, csv_path
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the policy analysis algorithms on synthetic instances"
+    )
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated numbers of permission sets (default: 10,50,200)",
+    )
+    parser.add_argument("--statements", type=int, default=20, help="Statements per policy")
+    parser.add_argument("--wildcard-ratio", type=float, default=0.2)
+    parser.add_argument("--shared-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per analyzer; the best is reported")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    rows = run_benchmarks(
+        sizes,
+        args.statements,
+        args.wildcard_ratio,
+        args.shared_ratio,
+        seed=args.seed,
+        repeat=args.repeat,
+    )
+    save_report(rows)
+
+
+if __name__ == "__main__":
+    run_with_profiling(main, "benchmark_policy_analysis")
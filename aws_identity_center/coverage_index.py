@@ -0,0 +1,112 @@
+from collections import defaultdict
+
+from policy_canonical import statement_fingerprint
+from statement_matching import (
+    extract_action_or_notaction,
+    statement_covers,
+    statement_services,
+)
+
+
+def resource_prefix(resource):
+    """Return the literal part of a resource pattern, up to its first wildcard."""
+    end = len(resource)
+    for wildcard in "*?":
+        position = resource.find(wildcard)
+        if position != -1:
+            end = min(end, position)
+    return resource[:end]
+
+
+class StatementCoverageIndex:
+    """Index of policy statements for finding every statement that covers a given one.
+
+    Candidates are narrowed by (Effect, Action/NotAction), by service prefix
+    and by the literal prefix of their resources; only the survivors go
+    through the full ``statement_covers`` check.
+    """
+
+    def __init__(self):
+        self.entries = []  # (owner, statement, fingerprint)
+        # (Effect, key type) -> service -> entry ids
+        self._by_service = defaultdict(lambda: defaultdict(set))
+        # (Effect, key type) -> entry ids whose actions can match any service
+        self._any_service = defaultdict(set)
+        # character trie of resource prefixes; node[None] holds the entry ids
+        self._resource_trie = {}
+
+    def add(self, owner, statement, fingerprint=None):
+        """Index a statement belonging to ``owner`` (e.g. a permission set name)."""
+        entry_id = len(self.entries)
+        self.entries.append(
+            (owner, statement, fingerprint or statement_fingerprint(statement))
+        )
+
+        key_type, actions = extract_action_or_notaction(statement)
+        if key_type is None or "Resource" not in statement:
+            return  # cannot cover anything
+
+        group = (statement.get("Effect"), key_type)
+        # NotAction coverage runs the other way round, so those are never pruned by service
+        services = statement_services(actions) if key_type == "Action" else None
+        if services is None:
+            self._any_service[group].add(entry_id)
+        else:
+            for service in services:
+                self._by_service[group][service].add(entry_id)
+
+        resources = statement["Resource"]
+        if not isinstance(resources, list):
+            resources = [resources]
+        for resource in resources:
+            node = self._resource_trie
+            for char in resource_prefix(resource):
+                node = node.setdefault(char, {})
+            node.setdefault(None, set()).add(entry_id)
+
+    def _service_candidates(self, statement):
+        key_type, actions = extract_action_or_notaction(statement)
+        if key_type is None:
+            return set()
+
+        group = (statement.get("Effect"), key_type)
+        candidates = set(self._any_service.get(group, ()))
+        services = statement_services(actions) if key_type == "Action" else None
+        if services is None:
+            return candidates
+
+        by_service = self._by_service.get(group, {})
+        shared = None
+        for service in services:
+            entry_ids = by_service.get(service, set())
+            shared = entry_ids if shared is None else shared & entry_ids
+        return candidates | (shared or set())
+
+    def _resource_candidates(self, statement):
+        resources = statement.get("Resource", "")
+        if not isinstance(resources, list):
+            resources = [resources]
+
+        candidates = None
+        for resource in resources:
+            # Entries whose literal prefix is a prefix of this resource
+            node = self._resource_trie
+            found = set(node.get(None, ()))
+            for char in resource:
+                node = node.get(char)
+                if node is None:
+                    break
+                found |= node.get(None, set())
+            candidates = found if candidates is None else candidates & found
+        return candidates or set()
+
+    def covering(self, statement):
+        """Yield (owner, statement, fingerprint) for each indexed statement covering ``statement``."""
+        candidates = self._service_candidates(statement)
+        if candidates:
+            candidates &= self._resource_candidates(statement)
+
+        for entry_id in sorted(candidates):
+            entry = self.entries[entry_id]
+            if statement_covers(entry[1], statement):
+                yield entry
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+from aws_clients import get_client, get_session
+
+# Opt-in on-disk cache shared between runs; memory-only when unset.
+CREDENTIAL_CACHE_DIR_ENV = "AWS_CREDENTIAL_CACHE_DIR"
+
+# Credentials are refreshed once they are this close to expiring.
+REFRESH_MARGIN = timedelta(minutes=5)
+
+# A profile's caller identity (account ID, ARN) does not expire; re-check it daily.
+IDENTITY_TTL = timedelta(hours=24)
+
+DEFAULT_ROLE_SESSION_NAME = "IdentityCenterAuditSession"
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def source_access_key_id(profile=None):
+    """Return the access key ID of the credentials a profile's clients sign with, or None."""
+    credentials = get_session(profile).get_credentials()
+    return credentials.access_key if credentials is not None else None
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    return datetime.fromisoformat(value)
+
+
+class CredentialCache:
+    """Assumed-role credentials and profile identities, cached until shortly before they expire.
+
+    Entries are keyed by ("role", source access key ID, account ID, role name)
+    or ("profile", name, source access key ID). The source key keeps an entry
+    from being handed out after a profile is re-pointed or logged in to
+    another identity, since that changes the credentials it signs with. With ``cache_dir`` they are also written as JSON files readable only by the
+    current user (directory 0700, files 0600), so chained runs reuse them.
+    """
+
+    def __init__(self, cache_dir=None, refresh_margin=REFRESH_MARGIN):
+        self.cache_dir = cache_dir
+        self.refresh_margin = refresh_margin
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        if cache_dir:
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            os.chmod(cache_dir, 0o700)
+
+    def _path(self, key):
+        name = hashlib.sha256(json.dumps(list(key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def _key_lock(self, key):
+        # One lock per key, so concurrent callers for the same key make one round trip
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _is_fresh(self, entry):
+        return _to_datetime(entry["Expiration"]) - self.refresh_margin > _utcnow()
+
+    def get(self, key):
+        """Return the cached entry for key if it is not about to expire, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and self._is_fresh(entry):
+            return entry
+
+        if self.cache_dir:
+            try:
+                with open(self._path(key)) as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None and self._is_fresh(entry):
+                with self._lock:
+                    self._entries[key] = entry
+                return entry
+        return None
+
+    def put(self, key, entry):
+        """Store an entry; it must have an "Expiration" datetime or ISO string."""
+        entry = dict(entry, Expiration=_to_datetime(entry["Expiration"]).isoformat())
+        with self._lock:
+            self._entries[key] = entry
+
+        if self.cache_dir:
+            path = self._path(key)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.replace(temp_path, path)
+        return entry
+
+    def clear(self):
+        """Forget the in-memory entries (the on-disk files are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def assume_role(self, account_id, role_name, session_name=DEFAULT_ROLE_SESSION_NAME):
+        """Return credentials for role_name in account_id, calling AssumeRole only when needed."""
+        key = ("role", source_access_key_id(), account_id, role_name)
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+
+        with self._key_lock(key):
+            entry = self.get(key)
+            if entry is None:
+                response = get_client("sts").assume_role(
+                    RoleArn=f"arn:aws:iam::{account_id}:role/{role_name}",
+                    RoleSessionName=session_name,
+                )
+                credentials = response["Credentials"]
+                entry = self.put(key, {
+                    "AccessKeyId": credentials["AccessKeyId"],
+                    "SecretAccessKey": credentials["SecretAccessKey"],
+                    "SessionToken": credentials["SessionToken"],
+                    "Expiration": credentials["Expiration"],
+                })
+        return entry
+
+    def caller_identity(self, profile=None, fresh=False):
+        """Return {"Account", "Arn", "UserId"} for a profile, calling GetCallerIdentity only when needed.
+
+        With ``fresh``, GetCallerIdentity is always called (and the cache updated).
+        """
+        key = ("profile", profile or "default", source_access_key_id(profile))
+        entry = None if fresh else self.get(key)
+        if entry is not None:
+            return entry
+
+        with self._key_lock(key):
+            entry = None if fresh else self.get(key)
+            if entry is None:
+                identity = get_client("sts", profile=profile).get_caller_identity()
+                entry = self.put(key, {
+                    "Account": identity["Account"],
+                    "Arn": identity["Arn"],
+                    "UserId": identity["UserId"],
+                    "Expiration": _utcnow() + IDENTITY_TTL,
+                })
+        return entry
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_credential_cache():
+    """Return the process-wide CredentialCache (on disk if AWS_CREDENTIAL_CACHE_DIR is set)."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            cache_dir = os.environ.get(CREDENTIAL_CACHE_DIR_ENV)
+            _default_cache = CredentialCache(
+                os.path.expanduser(cache_dir) if cache_dir else None
+            )
+        return _default_cache
+
+
+def clear_credential_cache():
+    """Drop the process-wide cache (used by the tests)."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = None
+
+
+def get_profile_account_id(profile=None, fresh=False):
+    """Return the account ID a profile's credentials belong to (``fresh`` skips the cache)."""
+    return default_credential_cache().caller_identity(profile, fresh=fresh)["Account"]
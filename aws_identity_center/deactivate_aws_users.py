@@ -1,4 +1,3 @@
-import boto3
 import csv
 import argparse
 import os
@@ -6,6 +5,10 @@ import configparser
 
 from datetime import datetime, timedelta
 
+from aws_clients import get_client
+from credential_cache import get_profile_account_id
+from profiling import phase, run_with_profiling
+
 
 def list_profiles_mapping():
     """Map AWS profiles to their account IDs based on SSO login."""
@@ -20,10 +23,8 @@ def list_profiles_mapping():
             profile_name = section.strip().split("profile ", 1)[-1].strip()
 
             try:
-                # Try creating session and fetching account ID
-                session = boto3.Session(profile_name=profile_name)
-                sts_client = session.client("sts")
-                account_id = sts_client.get_caller_identity()["Account"]
+                # Users are deactivated through this mapping, so never trust a cached identity
+                account_id = get_profile_account_id(profile_name, fresh=True)
                 profiles_mapping[account_id] = profile_name
             except Exception as e:
                 print(f"[!] Error getting account for profile {profile_name}: {e}")
@@ -130,8 +131,7 @@ def process_users(csv_file_path, profiles_mapping):
                 continue
 
             try:
-                session = boto3.Session(profile_name=profile)
-                iam_client = session.client("iam")
+                iam_client = get_client("iam", profile=profile)
 
                 remove_console_login(iam_client, username)
                 deactivate_access_keys(iam_client, username)
@@ -160,14 +160,16 @@ def main():
     args = parse_arguments()
 
     print("[*] Mapping profiles to accounts...")
-    profiles_mapping = list_profiles_mapping()
+    with phase("enumerate"):
+        profiles_mapping = list_profiles_mapping()
 
     print("[*] Profiles loaded:")
     for acc_id, prof in profiles_mapping.items():
         print(f"  - Account {acc_id} -> Profile {prof}")
 
-    process_users(args.file, profiles_mapping)
+    with phase("deactivate"):
+        process_users(args.file, profiles_mapping)
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "deactivate_aws_users")
@@ -1,175 +1,114 @@
-import boto3
+import argparse
 import json
 import csv
 import os
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import combinations
+
+from aws_clients import DEFAULT_MAX_WORKERS
+from permission_set_utils import get_instance_arn, load_permission_set_snapshot
+from policy_canonical import statement_fingerprint
+from profiling import phase, run_with_profiling
+from snapshot_store import open_snapshot_store
+from statement_matching import (
+    extract_action_or_notaction,
+    statement_services,
+    statements_match,
+)
+
+
+def candidate_pairs(statements):
+    """Return the sorted (i, j) index pairs of statements that could possibly match.
+
+    Statements are bucketed by (Effect, Action/NotAction) and by service prefix.
+    Two statements can only cover each other if one's services are a subset of
+    the other's, so every other pair is skipped. Statements whose actions span
+    every service (and those missing both Action and NotAction) form a small
+    separate bucket compared against their whole group.
+    """
+    buckets = defaultdict(lambda: defaultdict(list))  # group -> service -> indices
+    wildcards = defaultdict(list)  # group -> indices
+    services_by_index = {}
 
+    for index, statement in enumerate(statements):
+        key_type, actions = extract_action_or_notaction(statement)
+        group = (statement.get("Effect"), key_type)
+        services = statement_services(actions) if key_type else None
 
-def list_permission_sets(sso_client, instance_arn):
-    """List all permission sets across all pages."""
-    permission_sets = []
-    next_token = None
-
-    while True:
-        if next_token:
-            response = sso_client.list_permission_sets(
-                InstanceArn=instance_arn,
-                NextToken=next_token
-            )
-        else:
-            response = sso_client.list_permission_sets(
-                InstanceArn=instance_arn
-            )
-
-        permission_sets.extend(response.get("PermissionSets", []))
-        next_token = response.get("NextToken")
-        if not next_token:
-            break
-
-    return permission_sets
-
-
-def get_permission_set_name(sso_client, instance_arn, permission_set_arn):
-    response = sso_client.describe_permission_set(
-        InstanceArn=instance_arn,
-        PermissionSetArn=permission_set_arn,
-    )
-    return response["PermissionSet"]["Name"]
-
-
-def get_inline_policy(sso_client, instance_arn, permission_set_arn):
-    response = sso_client.get_inline_policy_for_permission_set(
-        InstanceArn=instance_arn,
-        PermissionSetArn=permission_set_arn,
-    )
-    return response.get("InlinePolicy")
-
-
-def action_includes(action1, action2):
-    if action1 == "*" or action2 == "*":
-        return True
+        if services is None:
+            wildcards[group].append(index)
+            continue
 
-    if action1 == action2:
-        return True
+        services_by_index[index] = services
+        for service in services:
+            buckets[group][service].append(index)
 
-    if ":" not in action1 or ":" not in action2:
-        print(f"[!] Warning: unexpected action format -> '{action1}' or '{action2}'")
-        return False
+    pairs = set()
+    for group, by_service in buckets.items():
+        for indices in by_service.values():
+            for i, j in combinations(indices, 2):
+                services_i, services_j = services_by_index[i], services_by_index[j]
+                if services_i <= services_j or services_j <= services_i:
+                    pairs.add((i, j))
 
-    service1, act1 = action1.split(":", 1)
-    service2, act2 = action2.split(":", 1)
+        group_indices = {index for indices in by_service.values() for index in indices}
+        for wildcard_index in wildcards.get(group, []):
+            for index in group_indices:
+                pairs.add((min(wildcard_index, index), max(wildcard_index, index)))
 
-    if service1 != service2:
-        return False
+    for indices in wildcards.values():
+        pairs.update(combinations(indices, 2))
 
-    if act1 == "*":
-        return True  # Example: s3:* covers s3:GetObject
+    return sorted(pairs)
 
-    if act2 == "*":
-        return False  # Example: s3:GetObject does not cover s3:*
 
-    return False
+# Bound on remembered statement pairs; large enough for an instance-wide scan
+MATCH_CACHE_SIZE = 100_000
 
 
-def actions_cover_each_other(actions1, actions2):
-    if not isinstance(actions1, list):
-        actions1 = [actions1]
-    if not isinstance(actions2, list):
-        actions2 = [actions2]
+class StatementMatchCache:
+    """Bounded LRU cache of statements_match results keyed by statement fingerprints.
 
-    for a2 in actions2:
-        if not any(action_includes(a1, a2) for a1 in actions1):
-            return False
-    return True
+    Permission sets often share copy-pasted statements, so the same pair of
+    statement bodies is only evaluated once per run.
+    """
 
+    def __init__(self, maxsize=MATCH_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
 
-def resource_covers(resource1, resource2):
-    if resource1 == "*":
-        return True
+    def __len__(self):
+        return len(self._results)
 
-    if isinstance(resource1, str) and isinstance(resource2, str):
-        return resource1 == resource2
+    def match(self, fingerprint1, s1, fingerprint2, s2):
+        """Return statements_match(s1, s2), evaluating it only on a cache miss."""
+        key = tuple(sorted((fingerprint1, fingerprint2)))  # statements_match is symmetric
+        if key in self._results:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return self._results[key]
 
-    if isinstance(resource1, list) and isinstance(resource2, str):
-        return resource2 in resource1
+        self.misses += 1
+        result = statements_match(s1, s2)
+        self._results[key] = result
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+        return result
 
-    if isinstance(resource1, str) and isinstance(resource2, list):
-        return all(resource1 == r2 for r2 in resource2)
+    def clear(self):
+        self.hits = 0
+        self.misses = 0
+        self._results.clear()
 
-    if isinstance(resource1, list) and isinstance(resource2, list):
-        return all(r2 in resource1 for r2 in resource2)
 
-    return False
+statement_match_cache = StatementMatchCache()
 
 
-def condition_covers(cond1, cond2):
-    """
-    Check if cond1 is equal to or more permissive (covers) cond2.
-    For simplicity:
-    - If cond1 is None and cond2 is None: return True
-    - If cond1 is None and cond2 exists: cond1 covers cond2 (less restrictive)
-    - If cond2 is None and cond1 exists: cond1 does NOT cover cond2 (more restrictive)
-    - If both exist: must be equal
-    """
-    if not cond1 and not cond2:
-        return True
-    if not cond1 and cond2:
-        return True
-    if cond1 and not cond2:
-        return False
-
-    # Both exist - must be identical for coverage
-    return cond1 == cond2
-
-def extract_action_or_notaction(statement):
-    """Return tuple (key_type, actions), where key_type is 'Action' or 'NotAction'."""
-    if "Action" in statement:
-        return "Action", statement.get("Action")
-    elif "NotAction" in statement:
-        return "NotAction", statement.get("NotAction")
-    else:
-        return None, None
-
-
-def statements_match(s1, s2):
-    try:
-        if s1.get("Effect") != s2.get("Effect"):
-            return False
-
-        key1, actions1 = extract_action_or_notaction(s1)
-        key2, actions2 = extract_action_or_notaction(s2)
-
-        if key1 is None or key2 is None:
-            print(f"[!] Warning: One of the statements is missing both Action and NotAction. Skipping.")
-            return False
-
-        if key1 != key2:
-            return False  # Cannot match Action with NotAction
-
-        # Statement 1 covers Statement 2
-        s1_covers_s2 = (
-            actions_cover_each_other(actions1, actions2)
-            and resource_covers(s1.get("Resource"), s2.get("Resource"))
-            and condition_covers(s1.get("Condition"), s2.get("Condition"))
-        )
-
-        # Statement 2 covers Statement 1
-        s2_covers_s1 = (
-            actions_cover_each_other(actions2, actions1)
-            and resource_covers(s2.get("Resource"), s1.get("Resource"))
-            and condition_covers(s2.get("Condition"), s1.get("Condition"))
-        )
-
-        return s1_covers_s2 or s2_covers_s1
-
-    except Exception as e:
-        print("\n⚠️ Error while matching two statements!")
-        print(f"Statement 1: {json.dumps(s1, indent=2)}")
-        print(f"Statement 2: {json.dumps(s2, indent=2)}")
-        raise e
-
-
-def find_duplicate_statements(inline_policy_json):
+def find_duplicate_statements(inline_policy_json, match_cache=None):
     duplicates = []
     if not inline_policy_json:
         return duplicates
@@ -180,68 +119,137 @@ def find_duplicate_statements(inline_policy_json):
     if not isinstance(statements, list):
         statements = [statements]
 
+    # Canonical fingerprints are computed once per statement and reused for
+    # both the exact-match test and the already-compared bookkeeping.
+    fingerprints = [statement_fingerprint(stmt) for stmt in statements]
     checked_pairs = set()
+    if match_cache is None:
+        match_cache = statement_match_cache
 
-    for i, s1 in enumerate(statements):
-        for j, s2 in enumerate(statements):
-            if i >= j:
-                continue
+    for i, j in candidate_pairs(statements):
+        s1, s2 = statements[i], statements[j]
 
-            key = tuple(sorted([json.dumps(s1, sort_keys=True), json.dumps(s2, sort_keys=True)]))
-            if key in checked_pairs:
-                continue
+        key = tuple(sorted([fingerprints[i], fingerprints[j]]))
+        if key in checked_pairs:
+            continue
 
-            checked_pairs.add(key)
+        checked_pairs.add(key)
 
-            if s1 == s2:
-                match_type = "ExactMatch"
-            elif statements_match(s1, s2):
-                match_type = "WildcardMatch"
-            else:
-                continue
+        if fingerprints[i] == fingerprints[j]:
+            match_type = "ExactMatch"
+        elif match_cache.match(fingerprints[i], s1, fingerprints[j], s2):
+            match_type = "WildcardMatch"
+        else:
+            continue
 
-            duplicates.append((match_type, s1, s2))
+        duplicates.append((match_type, s1, s2))
 
     return duplicates
 
 
-def main():
+def analyze_permission_set(permission_set):
+    """Find the duplicate statements of one (name, inline policy) pair.
+
+    Runs in a worker process when main() uses a process pool, so it also
+    returns the worker's match-cache hit/miss deltas for the final summary.
+    """
+    name, inline_policy = permission_set
+    hits, misses = statement_match_cache.hits, statement_match_cache.misses
+    duplicates = find_duplicate_statements(inline_policy)
+    return (
+        name,
+        duplicates,
+        statement_match_cache.hits - hits,
+        statement_match_cache.misses - misses,
+    )
+
+
+def main(workers=1, max_workers=DEFAULT_MAX_WORKERS):
+    """Write the duplicate statements of every permission set to a CSV.
+
+    Policies are fetched concurrently (``max_workers`` threads); with
+    ``workers`` > 1 the analysis runs in a process pool. Results are written
+    in permission set order either way, so the output is identical between runs.
+    """
     today = datetime.today().strftime("%Y-%m-%d")
     output_dir = "outputs"
     os.makedirs(output_dir, exist_ok=True)
     output_filename = os.path.join(output_dir, f"duplicate_inline_statements_{today}.csv")
 
-    sso_client = boto3.client("sso-admin")
-    instance_arn = sso_client.list_instances()["Instances"][0]["InstanceArn"]
+    # With a fresh stored snapshot, no AWS call is made (not even list_instances)
+    store = open_snapshot_store()
+    instance_arn = get_instance_arn(store=store)
 
-    permission_sets = list_permission_sets(sso_client, instance_arn)
+    snapshot = load_permission_set_snapshot(
+        instance_arn,
+        max_workers=max_workers,
+        store=store,
+    )
     print(f"[+] Using Instance ARN: {instance_arn}")
-    print(f"[+] Found {len(permission_sets)} permission sets.")
+    print(f"[+] Found {len(snapshot)} permission sets.")
+
+    permission_sets = [
+        (permission_set.name, permission_set.inline_policy)
+        for permission_set in snapshot
+        if permission_set.inline_policy
+    ]
+    cache_hits = cache_misses = 0
 
     with open(output_filename, "w", newline="") as csvfile:
         fieldnames = ["PermissionSetName", "MatchType", "DuplicateStatement1", "DuplicateStatement2"]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
 
-        for permission_set_arn in permission_sets:
-            permission_set_name = get_permission_set_name(sso_client, instance_arn, permission_set_arn)
-            inline_policy = get_inline_policy(sso_client, instance_arn, permission_set_arn)
-
-            if not inline_policy:
-                continue
-
-            duplicates = find_duplicate_statements(inline_policy)
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            if executor is not None:
+                print(f"[+] Analyzing with {workers} worker processes.")
+                chunksize = max(1, len(permission_sets) // (workers * 4))
+                results = executor.map(analyze_permission_set, permission_sets, chunksize=chunksize)
+            else:
+                results = map(analyze_permission_set, permission_sets)
+
+            # map() yields in submission order, so rows stream out deterministically
+            with phase("analyze"):
+                for permission_set_name, duplicates, hits, misses in results:
+                    cache_hits += hits
+                    cache_misses += misses
+                    for match_type, dup1, dup2 in duplicates:
+                        writer.writerow({
+                            "PermissionSetName": permission_set_name,
+                            "MatchType": match_type,
+                            "DuplicateStatement1": json.dumps(dup1),
+                            "DuplicateStatement2": json.dumps(dup2),
+                        })
+                    csvfile.flush()
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    lookups = cache_hits + cache_misses
+    hit_rate = cache_hits / lookups * 100 if lookups else 0.0
+    print(f"[+] Duplicates saved to {output_filename}")
+    print(
+        f"[+] Statement match cache: {cache_hits} hits, {cache_misses} misses "
+        f"({hit_rate:.1f}% hit rate)"
+    )
 
-            for match_type, dup1, dup2 in duplicates:
-                writer.writerow({
-                    "PermissionSetName": permission_set_name,
-                    "MatchType": match_type,
-                    "DuplicateStatement1": json.dumps(dup1),
-                    "DuplicateStatement2": json.dumps(dup2),
-                })
 
-    print(f"[+] Duplicates saved to {output_filename}")
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Find duplicate statements inside each permission set's inline policy"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes analyzing policies (default: 1, in-process)",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(
+        lambda: main(workers=parse_arguments().workers),
+        "find_duplicate_inline_statement",
+    )
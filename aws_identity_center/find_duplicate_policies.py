@@ -1,16 +1,23 @@
-import boto3
+import argparse
 import csv
+import hashlib
 import json
 import os
-import hashlib
 from datetime import datetime
 from collections import defaultdict
 from itertools import combinations
 
+from aws_clients import get_client
+from coverage_index import StatementCoverageIndex
+from permission_set_utils import load_permission_set_snapshot
+from policy_canonical import policy_fingerprint, statement_fingerprint
+from profiling import phase, run_with_profiling
+from snapshot_store import open_snapshot_store
+
 
 def list_permission_sets(instance_arn):
     """List all permission sets in the AWS IAM Identity Center."""
-    client = boto3.client('sso-admin')
+    client = get_client('sso-admin')
     permission_sets = []
     next_token = None
 
@@ -29,19 +36,9 @@ def list_permission_sets(instance_arn):
     return permission_sets
 
 
-def get_permission_set_name(instance_arn, permission_set_arn):
-    """Get the name of a permission set."""
-    client = boto3.client('sso-admin')
-    response = client.describe_permission_set(
-        InstanceArn=instance_arn,
-        PermissionSetArn=permission_set_arn
-    )
-    return response['PermissionSet'].get('Name', 'Unknown')
-
-
 def get_inline_policy(instance_arn, permission_set_arn):
     """Retrieve the inline policy document (text) for a permission set."""
-    client = boto3.client('sso-admin')
+    client = get_client('sso-admin')
 
     try:
         response = client.get_inline_policy_for_permission_set(
@@ -55,7 +52,7 @@ def get_inline_policy(instance_arn, permission_set_arn):
 
 def get_managed_policies(instance_arn, permission_set_arn):
     """Retrieve managed policies attached to a permission set."""
-    client = boto3.client('sso-admin')
+    client = get_client('sso-admin')
     managed_policies = []
 
     try:
@@ -75,7 +72,7 @@ def save_duplicates_to_csv(data, filename, headers):
     os.makedirs("outputs", exist_ok=True)
     filepath = os.path.join("outputs", filename)
 
-    with open(filepath, "w", newline="") as csvfile:
+    with phase("write"), open(filepath, "w", newline="") as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=headers)
         writer.writeheader()
         writer.writerows(data)
@@ -96,14 +93,49 @@ def extract_statements(policy_text):
         return []
 
 
+def extract_version(policy_text):
+    """Return the Version element of a policy text, or None if it has none or does not parse."""
+    try:
+        policy_data = json.loads(policy_text)
+    except json.JSONDecodeError:
+        return None
+    return policy_data.get('Version') if isinstance(policy_data, dict) else None
+
+
+def get_policy_fingerprint(pdata):
+    """Return the full-match hash of a policy_data_map entry.
+
+    Policies with statements are hashed canonically (with their Version);
+    a policy without any parsed statement, e.g. one that is not valid JSON,
+    falls back to a hash of its raw text so unrelated ones never match.
+    """
+    statement_fingerprints = get_statement_fingerprints(pdata)
+    if not statement_fingerprints:
+        return hashlib.sha256(pdata["policy_text"].encode("utf-8")).hexdigest()
+    return policy_fingerprint(statement_fingerprints, extract_version(pdata["policy_text"]))
+
+
+def get_statement_fingerprints(pdata):
+    """Return the canonical statement fingerprints of a policy_data_map entry, computing them once."""
+    if "statement_fingerprints" not in pdata:
+        pdata["statement_fingerprints"] = [
+            statement_fingerprint(stmt) for stmt in pdata["statements"]
+        ]
+    return pdata["statement_fingerprints"]
+
+
 def detect_full_matches(policy_data_map):
-    """Detect full matches between permission sets based on full inline policy hash."""
+    """Detect full matches between permission sets based on the canonical policy fingerprint.
+
+    Policies that only differ in statement order, key order, whitespace or the
+    order of Action/Resource lists are reported as full matches.
+    """
     seen_hashes = defaultdict(list)
     full_matches = []
     full_match_pairs = set()
 
     for ps_name, pdata in policy_data_map.items():
-        seen_hashes[pdata["policy_hash"]].append(ps_name)
+        seen_hashes[get_policy_fingerprint(pdata)].append(ps_name)
 
     for policy_hash, ps_names in seen_hashes.items():
         if len(ps_names) > 1:
@@ -120,66 +152,131 @@ def detect_full_matches(policy_data_map):
 
 
 def detect_partial_matches(policy_data_map, full_match_pairs):
-    """Detect partial matches between permission sets based on common statements."""
+    """Detect partial matches between permission sets based on common statements.
+
+    Statements are indexed by canonical fingerprint (statement -> permission
+    sets using it), so only pairs of permission sets that actually share a
+    statement are visited.
+    """
     partial_matches = []
-    checked_pairs = set()
     ps_names_list = list(policy_data_map.keys())
-
-    for ps1, ps2 in combinations(ps_names_list, 2):
-        pair = tuple(sorted([ps1, ps2]))
-        if pair in checked_pairs or pair in full_match_pairs:
+    statement_keys = [
+        get_statement_fingerprints(policy_data_map[ps_name])
+        for ps_name in ps_names_list
+    ]
+
+    # statement fingerprint -> positions (in ps_names_list) of permission sets containing it
+    postings = defaultdict(list)
+    for index, keys in enumerate(statement_keys):
+        for key in dict.fromkeys(keys):
+            postings[key].append(index)
+
+    # (i, j) -> fingerprints of the statements shared by permission sets i and j
+    shared_keys = defaultdict(set)
+    for key, indices in postings.items():
+        for pair in combinations(indices, 2):
+            shared_keys[pair].add(key)
+
+    # Sorted pairs reproduce the order of combinations(ps_names_list, 2)
+    for i, j in sorted(shared_keys):
+        ps1, ps2 = ps_names_list[i], ps_names_list[j]
+        if tuple(sorted([ps1, ps2])) in full_match_pairs:
             continue
 
-        stmts1 = policy_data_map[ps1]["statements"]
-        stmts2 = policy_data_map[ps2]["statements"]
+        keys = shared_keys[(i, j)]
+        common_statements = [
+            stmt
+            for stmt, key in zip(policy_data_map[ps1]["statements"], statement_keys[i])
+            if key in keys
+        ]
 
-        common_statements = [stmt for stmt in stmts1 if stmt in stmts2]
+        partial_matches.append({
+            "MatchType": "partialMatch",
+            "PolicyHash": f"{ps1}_{ps2}_partial",
+            "PermissionSets": f"{ps1}, {ps2}",
+            "PolicyContent": json.dumps(common_statements, indent=2)
+        })
 
-        if common_statements:
-            partial_matches.append({
-                "MatchType": "partialMatch",
-                "PolicyHash": f"{ps1}_{ps2}_partial",
-                "PermissionSets": f"{ps1}, {ps2}",
-                "PolicyContent": json.dumps(common_statements, indent=2)
-            })
+    return partial_matches
 
-        checked_pairs.add(pair)
 
-    return partial_matches
+def detect_subsumptions(policy_data_map):
+    """Detect statements of one permission set fully covered by a statement of another.
+
+    Every statement of the instance is indexed once (by effect, service and
+    resource prefix) and each statement is looked up against that index.
+    Exact copies are skipped, since fullMatch/partialMatch already report them.
+    """
+    index = StatementCoverageIndex()
+    for ps_name, pdata in policy_data_map.items():
+        for stmt, fingerprint in zip(pdata["statements"], get_statement_fingerprints(pdata)):
+            index.add(ps_name, stmt, fingerprint)
+
+    subsumptions = []
+    for ps_name, pdata in policy_data_map.items():
+        for stmt, fingerprint in zip(pdata["statements"], get_statement_fingerprints(pdata)):
+            covering_sets = set()
+            for owner, covering_stmt, covering_fingerprint in index.covering(stmt):
+                if owner == ps_name or owner in covering_sets or covering_fingerprint == fingerprint:
+                    continue
+                covering_sets.add(owner)
+                subsumptions.append({
+                    "MatchType": "subsumption",
+                    "PermissionSet": ps_name,
+                    "Statement": json.dumps(stmt),
+                    "CoveredByPermissionSet": owner,
+                    "CoveringStatement": json.dumps(covering_stmt)
+                })
+
+    return subsumptions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Detect duplicate inline and managed policies across permission sets"
+    )
+    parser.add_argument(
+        "--subsumption",
+        action="store_true",
+        help="Also report statements fully covered by a statement of another permission set",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_arguments()
     instance_arn = "arn:aws:sso:::instance/ssoins-xxxxxxxxxxxx"
 
-    permission_sets = list_permission_sets(instance_arn)
+    snapshot = load_permission_set_snapshot(instance_arn, store=open_snapshot_store())
 
-    policy_data_map = {}  # ps_name -> { 'policy_text': str, 'policy_hash': str, 'statements': list }
+    policy_data_map = {}  # ps_name -> { 'policy_text', 'policy_hash', 'statements', 'statement_fingerprints' }
     managed_policy_mapping = defaultdict(list)
 
-    for ps in permission_sets:
-        ps_name = get_permission_set_name(instance_arn, ps)
+    for ps in snapshot:
+        ps_name = ps.name
 
         # Get inline policy
-        policy_text = get_inline_policy(instance_arn, ps)
+        policy_text = ps.inline_policy
         if policy_text:
-            policy_hash = hashlib.md5(policy_text.encode('utf-8')).hexdigest()
             statements = extract_statements(policy_text)
             policy_data_map[ps_name] = {
                 "policy_text": policy_text,
-                "policy_hash": policy_hash,
-                "statements": statements
+                "statements": statements,
+                "statement_fingerprints": [statement_fingerprint(stmt) for stmt in statements],
             }
+            policy_data_map[ps_name]["policy_hash"] = get_policy_fingerprint(policy_data_map[ps_name])
 
         # Get managed policies
-        managed_policies = get_managed_policies(instance_arn, ps)
+        managed_policies = [p['Arn'] for p in ps.managed_policies]
         for managed_policy_arn in managed_policies:
             managed_policy_mapping[managed_policy_arn].append(ps_name)
 
-    # Detect full matches first
-    full_matches, full_match_pairs = detect_full_matches(policy_data_map)
+    with phase("analyze"):
+        # Detect full matches first
+        full_matches, full_match_pairs = detect_full_matches(policy_data_map)
 
-    # Then detect partial matches
-    partial_matches = detect_partial_matches(policy_data_map, full_match_pairs)
+        # Then detect partial matches
+        partial_matches = detect_partial_matches(policy_data_map, full_match_pairs)
 
     # Prepare duplicate managed policies
     duplicate_managed_data = []
@@ -211,6 +308,18 @@ def main():
     else:
         print("No duplicate managed policies found.")
 
+    if args.subsumption:
+        with phase("analyze"):
+            subsumptions = detect_subsumptions(policy_data_map)
+        if subsumptions:
+            save_duplicates_to_csv(
+                subsumptions,
+                f"statement_subsumptions_{today}.csv",
+                headers=["MatchType", "PermissionSet", "Statement", "CoveredByPermissionSet", "CoveringStatement"]
+            )
+        else:
+            print("No subsumed statements found.")
+
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "find_duplicate_policies")
@@ -1,10 +1,13 @@
-import boto3
 import csv
 import json
 import os
 import argparse
 from datetime import datetime
 
+from aws_clients import get_client
+from profiling import phase, run_with_profiling
+from statement_matching import statement_covers
+
 
 def fetch_managed_policies_for_group(iam_client, group_name):
     """Fetch managed policy ARNs for a specific IAM group."""
@@ -85,7 +88,7 @@ def save_results_to_csv(results, permission_set_name):
 
     filename = os.path.join(output_dir, f"missing_policies_{permission_set_name}_{today}.csv")
 
-    with open(filename, "w", newline="") as csvfile:
+    with phase("write"), open(filename, "w", newline="") as csvfile:
         fieldnames = ["GroupName", "Type", "PolicyNameOrArn"]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
@@ -121,28 +124,29 @@ def main():
 
     print(f"[*] Groups to compare: {group_names}")
 
-    # IAM session
-    iam_session = boto3.Session(profile_name=args.profile)
-    iam_client = iam_session.client("iam")
+    # IAM client for the groups' account
+    iam_client = get_client("iam", profile=args.profile)
 
     # SSO Admin client
-    sso_admin_client = boto3.client("sso-admin")
+    sso_admin_client = get_client("sso-admin")
 
     # Get Instance ARN
     instance_arn = sso_admin_client.list_instances()["Instances"][0]["InstanceArn"]
     print(f"[*] Using Identity Center Instance ARN: {instance_arn}")
 
     # Fetch permission set details
-    permission_set_arn = load_permission_set_arn(
-        sso_admin_client, instance_arn, args.permission_set_name
-    )
+    with phase("enumerate"):
+        permission_set_arn = load_permission_set_arn(
+            sso_admin_client, instance_arn, args.permission_set_name
+        )
 
-    ps_managed_policies = fetch_permission_set_managed_policies(
-        sso_admin_client, instance_arn, permission_set_arn
-    )
-    ps_inline_policy = fetch_permission_set_inline_policy(
-        sso_admin_client, instance_arn, permission_set_arn
-    )
+    with phase("fetch policies"):
+        ps_managed_policies = fetch_permission_set_managed_policies(
+            sso_admin_client, instance_arn, permission_set_arn
+        )
+        ps_inline_policy = fetch_permission_set_inline_policy(
+            sso_admin_client, instance_arn, permission_set_arn
+        )
 
     ps_inline_statements = []
     if ps_inline_policy:
@@ -156,8 +160,9 @@ def main():
     for group_name in group_names:
         print(f"\n[*] Checking group: {group_name}")
 
-        group_managed_policies = fetch_managed_policies_for_group(iam_client, group_name)
-        group_inline_policies = fetch_inline_policies_for_group(iam_client, group_name)
+        with phase("fetch group policies"):
+            group_managed_policies = fetch_managed_policies_for_group(iam_client, group_name)
+            group_inline_policies = fetch_inline_policies_for_group(iam_client, group_name)
 
         # Managed policies
         for policy_arn in group_managed_policies:
@@ -175,7 +180,8 @@ def main():
                 group_statements = [group_statements]
 
             for stmt in group_statements:
-                if stmt not in ps_inline_statements:
+                # Missing unless some permission set statement grants at least as much
+                if not any(statement_covers(ps_stmt, stmt) for ps_stmt in ps_inline_statements):
                     results.append({
                         "GroupName": group_name,
                         "Type": "InlinePolicy",
@@ -187,4 +193,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "find_missing_permissionset_access")
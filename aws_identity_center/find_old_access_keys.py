@@ -0,0 +1,254 @@
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from aws_clients import get_client
+from credential_cache import get_profile_account_id
+from list_users_iamv2 import (
+    get_credential_report,
+    iter_credential_report,
+    list_iam_users,
+    list_profiles,
+    parse_report_date,
+)
+from permission_set_utils import CsvRowWriter
+from profiling import phase, run_with_profiling
+
+# Matches the 90-day rotation enforced by the iam_90_day_key_rotation Terraform module
+DEFAULT_MAX_AGE_DAYS = 90
+
+# Scans mostly wait on credential report generation, so more profiles run at once
+# than the API-bound scanners use.
+DEFAULT_PROFILE_WORKERS = 32
+
+FIELDNAMES = [
+    "Profile",
+    "AccountId",
+    "UserName",
+    "AccessKeyId",
+    "Status",
+    "CreateDate",
+    "LastUsedDate",
+    "AgeDays",
+]
+
+
+def format_date(value):
+    return value.strftime("%Y-%m-%dT%H:%M:%S") if value else "Never"
+
+
+def keys_from_credential_report(content):
+    """Yield {"UserName", "AccountId", "Status", "CreateDate", "LastUsedDate"} per access key in a report.
+
+    The report has two key slots per user; ``access_key_N_last_rotated`` is the
+    key's creation date and is N/A for an empty slot.
+    """
+    for row in iter_credential_report(content):
+        if row["user"] == "<root_account>":
+            continue
+        for n in (1, 2):
+            create_date = parse_report_date(row.get(f"access_key_{n}_last_rotated", "N/A"))
+            if create_date is None:
+                continue
+            yield {
+                "UserName": row["user"],
+                "AccountId": row["arn"].split(":")[4],
+                "Status": "Active" if row.get(f"access_key_{n}_active") == "true" else "Inactive",
+                "CreateDate": create_date,
+                "LastUsedDate": parse_report_date(row.get(f"access_key_{n}_last_used_date", "N/A")),
+            }
+
+
+def keys_from_api(iam_client, account_id):
+    """Yield the same key records as keys_from_credential_report using per-user API calls."""
+    for user in list_iam_users(iam_client):
+        user_name = user["UserName"]
+        access_keys = iam_client.list_access_keys(UserName=user_name).get(
+            "AccessKeyMetadata", []
+        )
+        for key in access_keys:
+            last_used = iam_client.get_access_key_last_used(AccessKeyId=key["AccessKeyId"])
+            yield {
+                "UserName": user_name,
+                "AccountId": account_id,
+                "AccessKeyId": key["AccessKeyId"],
+                "Status": key["Status"],
+                "CreateDate": key["CreateDate"],
+                "LastUsedDate": last_used["AccessKeyLastUsed"].get("LastUsedDate"),
+            }
+
+
+def add_access_key_ids(iam_client, keys):
+    """Fill in AccessKeyId for report keys by matching their creation dates.
+
+    The credential report has no key IDs, so ListAccessKeys is called, but
+    only for the users that have a key past the threshold.
+    """
+    key_ids = {}  # user name -> {creation date (to the second): key ID}
+    for key in keys:
+        if "AccessKeyId" in key:
+            continue
+        user_name = key["UserName"]
+        if user_name not in key_ids:
+            try:
+                metadata = iam_client.list_access_keys(UserName=user_name).get(
+                    "AccessKeyMetadata", []
+                )
+            except Exception as e:
+                print(f"    Warning: Could not list access keys of {user_name}: {e}")
+                metadata = []
+            key_ids[user_name] = {
+                item["CreateDate"].replace(microsecond=0): item["AccessKeyId"]
+                for item in metadata
+            }
+        key["AccessKeyId"] = key_ids[user_name].get(
+            key["CreateDate"].replace(microsecond=0), "Unknown"
+        )
+    return keys
+
+
+def scan_profile(profile, max_age_days, now=None):
+    """Return the rows of every access key in a profile's account older than max_age_days."""
+    now = now or datetime.now(timezone.utc)
+    iam_client = get_client("iam", profile=profile)
+
+    try:
+        with phase("fetch credential report"):
+            keys = list(keys_from_credential_report(get_credential_report(iam_client)))
+    except Exception as e:
+        print(f"    Warning: credential report unavailable for {profile}, using per-user calls: {e}")
+        with phase("fetch access keys"):
+            keys = list(keys_from_api(iam_client, get_profile_account_id(profile)))
+
+    old_keys = [key for key in keys if (now - key["CreateDate"]).days > max_age_days]
+    with phase("fetch access keys"):
+        add_access_key_ids(iam_client, old_keys)
+
+    return [
+        {
+            "Profile": profile,
+            "AccountId": key["AccountId"],
+            "UserName": key["UserName"],
+            "AccessKeyId": key["AccessKeyId"],
+            "Status": key["Status"],
+            "CreateDate": format_date(key["CreateDate"]),
+            "LastUsedDate": format_date(key["LastUsedDate"]),
+            "AgeDays": (now - key["CreateDate"]).days,
+        }
+        for key in old_keys
+    ]
+
+
+def group_profiles_by_account(profiles, max_workers=DEFAULT_PROFILE_WORKERS):
+    """Resolve each profile's account ID concurrently, always asking STS.
+
+    Several profiles (e.g. SSO roles) often point at the same account. The
+    grouping decides which accounts get scanned at all, so a cached identity
+    is never trusted here. Returns ({account ID: [profiles, in config order]},
+    [(profile, error)]).
+    """
+    def resolve(profile):
+        try:
+            return profile, get_profile_account_id(profile, fresh=True), None
+        except Exception as e:
+            return profile, None, e
+
+    profiles_by_account = {}
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for profile, account_id, error in executor.map(resolve, profiles):
+            if error is not None:
+                failures.append((profile, error))
+            else:
+                profiles_by_account.setdefault(account_id, []).append(profile)
+    return profiles_by_account, failures
+
+
+def scan_account(profiles, max_age_days, now):
+    """Scan an account through the first of its profiles that works; returns (profile, rows)."""
+    for profile in profiles[:-1]:
+        try:
+            return profile, scan_profile(profile, max_age_days, now)
+        except Exception as e:
+            print(f"    Warning: could not scan with {profile}, trying another profile of the account: {e}")
+    return profiles[-1], scan_profile(profiles[-1], max_age_days, now)
+
+
+def scan_profiles(profiles, max_age_days, max_workers=DEFAULT_PROFILE_WORKERS):
+    """Scan each account once, yielding (profile, rows, error) as each one completes.
+
+    Profiles are grouped by account ID first, so an account reachable through
+    several profiles is not scanned (and reported) more than once.
+    """
+    now = datetime.now(timezone.utc)
+    with phase("enumerate"):
+        profiles_by_account, failures = group_profiles_by_account(profiles, max_workers)
+    for profile, error in failures:
+        yield profile, [], error
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(scan_account, account_profiles, max_age_days, now): account_profiles
+            for account_profiles in profiles_by_account.values()
+        }
+        for future in as_completed(futures):
+            try:
+                profile, rows = future.result()
+                yield profile, rows, None
+            except Exception as e:
+                yield futures[future][-1], [], e
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="Report IAM access keys older than a threshold in every profile of ~/.aws/config"
+    )
+    parser.add_argument(
+        "--max-age-days",
+        type=int,
+        default=DEFAULT_MAX_AGE_DAYS,
+        help=f"Report keys created more than this many days ago (default: {DEFAULT_MAX_AGE_DAYS})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_PROFILE_WORKERS,
+        help=f"Number of profiles scanned concurrently (default: {DEFAULT_PROFILE_WORKERS})",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+
+    with phase("enumerate"):
+        profiles = list_profiles()
+    print(f"Scanning access keys in {len(profiles)} profiles with {args.workers} workers...")
+
+    today = datetime.today().strftime("%Y-%m-%d")
+    os.makedirs("outputs", exist_ok=True)
+    filename = os.path.join(
+        "outputs", f"iam_access_keys_older_than_{args.max_age_days}_days_{today}.csv"
+    )
+
+    failed_profiles = []
+    with CsvRowWriter(filename, fieldnames=FIELDNAMES) as writer:
+        for profile, rows, error in scan_profiles(profiles, args.max_age_days, args.workers):
+            if error is not None:
+                failed_profiles.append((profile, error))
+                continue
+            for row in rows:
+                writer.write(row)
+            print(f"Profile {profile}: {len(rows)} keys older than {args.max_age_days} days")
+
+    print(f"\n✅ {writer.rows_written} access keys older than {args.max_age_days} days exported to {filename}")
+
+    if failed_profiles:
+        print(f"\n[!] Failed to scan access keys in {len(failed_profiles)} profiles:")
+        for profile, error in sorted(failed_profiles, key=lambda failure: failure[0]):
+            print(f"  - {profile}: {error}")
+
+
+if __name__ == "__main__":
+    run_with_profiling(main, "find_old_access_keys")
@@ -1,10 +1,13 @@
-import boto3
 import botocore
 import csv
 import os
 from datetime import datetime
 import configparser
 
+from aws_clients import get_client
+from credential_cache import default_credential_cache
+from profiling import phase, run_with_profiling
+
 
 def list_profiles():
     config_path = os.path.expanduser("~/.aws/config")
@@ -20,16 +23,15 @@ def list_profiles():
     return profiles
 
 
-def is_s3_client_valid(session, profile):
+def is_s3_client_valid(profile):
     try:
-        s3_client = session.client("s3")
+        s3_client = get_client("s3", profile=profile)
 
         # Test list buckets
         s3_client.list_buckets()
 
         # Verify identity
-        sts_client = session.client("sts")
-        identity = sts_client.get_caller_identity()
+        identity = default_credential_cache().caller_identity(profile)
         print(f"[+] Authenticated as: {identity['Arn']}")
 
         return s3_client
@@ -48,8 +50,7 @@ def is_s3_client_valid(session, profile):
 
 def check_s3_public_access(profile):
     print(f"[*] Creating session for profile: {profile}")
-    session = boto3.Session(profile_name=profile)
-    s3_client = is_s3_client_valid(session, profile)
+    s3_client = is_s3_client_valid(profile)
 
     if not s3_client:
         print(f"[!] Skipping profile {profile} due to client issues.")
@@ -103,7 +104,7 @@ def check_s3_public_access(profile):
 def save_to_csv(results):
     os.makedirs("outputs", exist_ok=True)
     filename = f"outputs/public_s3_buckets_{datetime.today().strftime('%Y-%m-%d')}.csv"
-    with open(filename, "w", newline="") as csvfile:
+    with phase("write"), open(filename, "w", newline="") as csvfile:
         fieldnames = ["Account", "BucketArn", "BlockPublicAccess"]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
@@ -114,12 +115,14 @@ def save_to_csv(results):
 
 def main():
     print("[*] Checking all profiles for S3 public access issues...")
-    profiles = list_profiles()
+    with phase("enumerate"):
+        profiles = list_profiles()
     all_results = []
 
     for profile in profiles:
         print(f"\n--> Checking profile: {profile}")
-        results = check_s3_public_access(profile)
+        with phase("scan buckets"):
+            results = check_s3_public_access(profile)
         all_results.extend(results)
 
     if all_results:
@@ -129,4 +132,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "find_s3_buckets_public_access")
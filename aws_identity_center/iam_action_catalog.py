@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import botocore.loaders
+
+from iam_patterns import action_pattern_trie, compile_action_pattern
+
+# Permission-only actions that have no matching API operation in botocore.
+EXTRA_ACTIONS_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "iam_extra_actions.json"
+)
+
+# IAM service prefixes whose actions come from differently named botocore models.
+SERVICE_ALIASES = {
+    "apigateway": ["apigateway", "apigatewayv2"],
+    "aws-marketplace": ["marketplace-catalog", "marketplace-entitlement", "meteringmarketplace"],
+    "bedrock": ["bedrock", "bedrock-agent", "bedrock-agent-runtime", "bedrock-runtime"],
+    "cloudsearch": ["cloudsearch", "cloudsearchdomain"],
+    "dynamodb": ["dynamodb", "dynamodbstreams"],
+    "elasticloadbalancing": ["elb", "elbv2"],
+    "es": ["es", "opensearch"],
+    "iot": ["iot", "iot-data", "iot-jobs-data"],
+    "lex": ["lex-models", "lex-runtime", "lexv2-models", "lexv2-runtime"],
+    "mobiletargeting": ["pinpoint"],
+    "s3": ["s3", "s3control"],
+    "sagemaker": ["sagemaker", "sagemaker-runtime"],
+    "ses": ["ses", "sesv2"],
+    "sso": ["sso", "sso-admin"],
+    "states": ["stepfunctions"],
+    "tag": ["resourcegroupstaggingapi"],
+}
+
+
+def _has_wildcard(text):
+    return "*" in text or "?" in text
+
+
+@dataclass(frozen=True)
+class ActionSet:
+    """A list of Action patterns expanded to a bitset over the action catalog.
+
+    ``mask`` holds every catalog action the patterns match and ``literal_mask``
+    only the literal actions; ``everything`` is set for "*" and ``wildcards``
+    keeps the patterns containing "*" or "?".
+    """
+
+    patterns: tuple
+    mask: int
+    literal_mask: int = 0
+    everything: bool = False
+    wildcards: tuple = ()
+
+    def covers(self, other):
+        """Return True if every action in ``other`` is also in this set.
+
+        Literals are compared as bitsets. A wildcard in ``other`` may match
+        actions the catalog does not know yet, so it is only covered by a
+        pattern that covers it as a glob (s3:Get* covers s3:GetObject*, but
+        an explicit list of every known s3:Get action does not cover s3:Get*).
+        """
+        if self.everything:
+            return True
+        if other.everything:
+            return False
+        if other.literal_mask & ~self.mask:
+            return False
+        if other.wildcards:
+            trie = action_pattern_trie(self.wildcards)
+            return all(trie.covers(pattern) for pattern in other.wildcards)
+        return True
+
+    def overlaps(self, other):
+        """Return True if the two sets share at least one action."""
+        return self.everything or other.everything or bool(self.mask & other.mask)
+
+
+class IamActionCatalog:
+    """Offline catalog of IAM actions, assigning every action a bit position.
+
+    A service's actions are loaded on first use from the API models bundled
+    with botocore (plus iam_extra_actions.json). Literal actions missing from
+    the catalog are added as they are seen, so they still compare correctly.
+    """
+
+    def __init__(self, extra_actions_path=EXTRA_ACTIONS_PATH, loader=None):
+        self._loader = loader or botocore.loaders.create_loader()
+        self._available_services = None
+        with open(extra_actions_path) as f:
+            self._extra_actions = {
+                service.lower(): [action.lower() for action in actions]
+                for service, actions in json.load(f).items()
+            }
+        self._bits = {}  # lowercase action -> bit position
+        self._service_actions = {}  # service -> lowercase actions
+        self._loaded_services = set()
+        self._pattern_masks = {}  # pattern -> (catalog size of its service, mask)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._bits)
+
+    def _load_service(self, service):
+        if service in self._loaded_services:
+            return
+        self._loaded_services.add(service)
+
+        if self._available_services is None:
+            self._available_services = set(
+                self._loader.list_available_services("service-2")
+            )
+
+        operations = []
+        for name in SERVICE_ALIASES.get(service, [service]):
+            if name in self._available_services:
+                model = self._loader.load_service_model(name, "service-2")
+                operations.extend(model.get("operations", {}))
+        operations.extend(self._extra_actions.get(service, []))
+
+        for operation in operations:
+            self._add(f"{service}:{operation.lower()}")
+
+    def _add(self, action):
+        if action not in self._bits:
+            self._bits[action] = len(self._bits)
+            self._service_actions.setdefault(action.split(":", 1)[0], []).append(action)
+
+    def intern(self, actions):
+        """Load the catalog of every service used by ``actions`` and add unknown literals."""
+        with self._lock:
+            for action in actions:
+                action = action.lower()
+                service = action.split(":", 1)[0]
+                if _has_wildcard(service):
+                    continue
+                self._load_service(service)
+                if not _has_wildcard(action):
+                    self._add(action)
+
+    def _pattern_mask(self, pattern, service):
+        if _has_wildcard(service):
+            candidates = self._bits
+        else:
+            candidates = self._service_actions.get(service, [])
+
+        cached = self._pattern_masks.get(pattern)
+        if cached is not None and cached[0] == len(candidates):
+            return cached[1]
+
+        regex = compile_action_pattern(pattern)
+        mask = 0
+        for action in candidates:
+            if regex.fullmatch(action):
+                mask |= 1 << self._bits[action]
+        self._pattern_masks[pattern] = (len(candidates), mask)
+        return mask
+
+    def _build(self, actions):
+        patterns = tuple(sorted({action.lower() for action in actions}))
+        mask = 0
+        literal_mask = 0
+        everything = False
+        wildcards = []
+
+        for pattern in patterns:
+            if pattern == "*":
+                everything = True
+                continue
+            if not _has_wildcard(pattern):
+                literal_mask |= 1 << self._bits[pattern]
+                continue
+
+            wildcards.append(pattern)
+            mask |= self._pattern_mask(pattern, pattern.split(":", 1)[0])
+
+        return ActionSet(patterns, mask | literal_mask, literal_mask, everything, tuple(wildcards))
+
+    def action_sets(self, *action_lists):
+        """Expand several Action/NotAction values against the same catalog state.
+
+        All literals are interned before any bitset is built, so the returned
+        sets can be compared with each other.
+        """
+        action_lists = [
+            actions if isinstance(actions, list) else [actions]
+            for actions in action_lists
+        ]
+        with self._lock:
+            for actions in action_lists:
+                self.intern(actions)
+            return [self._build(actions) for actions in action_lists]
+
+
+_default_catalog = None
+_default_catalog_lock = threading.Lock()
+
+
+def default_catalog():
+    """Return the process-wide IamActionCatalog, creating it on first use."""
+    global _default_catalog
+    with _default_catalog_lock:
+        if _default_catalog is None:
+            _default_catalog = IamActionCatalog()
+        return _default_catalog
+
+
+def clear_default_catalog():
+    """Drop the process-wide catalog, so the next use reloads it (used by the benchmark)."""
+    global _default_catalog
+    with _default_catalog_lock:
+        _default_catalog = None
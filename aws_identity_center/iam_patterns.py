@@ -0,0 +1,180 @@
+import re
+from functools import lru_cache
+
+# Marks the end of a pattern inside an ActionPatternTrie node.
+_END = ""
+
+
+# Number of colon-separated parts of an ARN: arn:partition:service:region:account:resource
+ARN_SEGMENTS = 6
+
+
+def _glob_regex(pattern):
+    parts = []
+    for char in pattern:
+        if char == "*":
+            parts.append(".*")
+        elif char == "?":
+            parts.append("[^*]")
+        else:
+            parts.append(re.escape(char))
+    return re.compile("".join(parts), re.DOTALL)
+
+
+@lru_cache(maxsize=8192)
+def compile_action_pattern(pattern):
+    """Compile an IAM action pattern into a case-insensitive regex.
+
+    ``*`` matches any run of characters and ``?`` exactly one. The text being
+    matched may itself be a pattern: its ``*`` can only be matched by a ``*``
+    and its ``?`` by a ``?`` or ``*``, so a full match means ``pattern`` covers
+    every action the other pattern can match.
+    """
+    return _glob_regex(pattern.lower())
+
+
+@lru_cache(maxsize=8192)
+def compile_resource_pattern(pattern):
+    """Compile one resource pattern (or ARN segment) into a case-sensitive regex.
+
+    Same glob rules as ``compile_action_pattern``, but resource names keep their case.
+    """
+    return _glob_regex(pattern)
+
+
+def action_pattern_covers(pattern, action):
+    """Return True if the action pattern covers the action (or action pattern)."""
+    return compile_action_pattern(pattern).fullmatch(action.lower()) is not None
+
+
+class ActionPatternTrie:
+    """Prefix trie of action patterns, to test coverage against many patterns at once.
+
+    Literal prefixes shared by the patterns (``ec2:describe`` ...) are walked
+    once per lookup instead of once per pattern.
+    """
+
+    def __init__(self, patterns):
+        self.root = {}
+        for pattern in patterns:
+            node = self.root
+            for char in pattern.lower():
+                node = node.setdefault(char, {})
+            node[_END] = True
+
+    def covers(self, action):
+        """Return True if any pattern in the trie covers the action (or action pattern)."""
+        text = action.lower()
+        length = len(text)
+        stack = [(self.root, 0)]
+        seen = set()
+
+        while stack:
+            node, position = stack.pop()
+            state = (id(node), position)
+            if state in seen:
+                continue
+            seen.add(state)
+
+            if position == length and _END in node:
+                return True
+
+            star = node.get("*")
+            if star is not None:
+                # '*' consumes any number of characters, including wildcards
+                for end in range(position, length + 1):
+                    stack.append((star, end))
+
+            if position < length:
+                char = text[position]
+                if char == "*":
+                    continue  # only a pattern '*' can cover a '*'
+                if "?" in node:
+                    stack.append((node["?"], position + 1))
+                if char != "?" and char in node:
+                    stack.append((node[char], position + 1))
+
+        return False
+
+
+@lru_cache(maxsize=4096)
+def action_pattern_trie(patterns):
+    """Return the (cached) ActionPatternTrie for a tuple of action patterns."""
+    return ActionPatternTrie(patterns)
+
+
+def split_arn(resource):
+    """Return the six segments of an ARN as a tuple, or None if it is not an ARN."""
+    segments = resource.split(":", ARN_SEGMENTS - 1)
+    if len(segments) != ARN_SEGMENTS or segments[0] != "arn":
+        return None
+    return tuple(segments)
+
+
+def resource_pattern_covers(pattern, resource):
+    """Return True if the resource pattern covers the resource (or resource pattern).
+
+    Two ARNs are compared segment by segment (partition, service, region,
+    account, resource), so a wildcard never spills into a neighbouring segment;
+    anything else, e.g. "*", is matched as a whole string.
+    """
+    pattern_segments = split_arn(pattern)
+    resource_segments = split_arn(resource)
+    if pattern_segments is None or resource_segments is None:
+        return compile_resource_pattern(pattern).fullmatch(resource) is not None
+
+    return all(
+        compile_resource_pattern(p).fullmatch(r) is not None
+        for p, r in zip(pattern_segments, resource_segments)
+    )
+
+
+class ResourcePatternTrie:
+    """Trie of resource patterns keyed by ARN segment.
+
+    Literal segments are looked up directly; only the wildcard segments met
+    on the way are matched as globs. Non-ARN patterns are matched as a whole.
+    """
+
+    def __init__(self, patterns):
+        self.root = {}  # segment -> child node, always ARN_SEGMENTS levels deep
+        self.other_patterns = []
+        for pattern in patterns:
+            segments = split_arn(pattern)
+            if segments is None:
+                self.other_patterns.append(pattern)
+                continue
+            node = self.root
+            for segment in segments:
+                node = node.setdefault(segment, {})
+
+    def covers(self, resource):
+        """Return True if any pattern in the trie covers the resource (or resource pattern)."""
+        if any(resource_pattern_covers(p, resource) for p in self.other_patterns):
+            return True
+
+        segments = split_arn(resource)
+        if segments is None:
+            return False
+
+        nodes = [self.root]
+        for segment in segments:
+            next_nodes = []
+            for node in nodes:
+                for key, child in node.items():
+                    if key == segment or (
+                        ("*" in key or "?" in key)
+                        and compile_resource_pattern(key).fullmatch(segment)
+                    ):
+                        next_nodes.append(child)
+            if not next_nodes:
+                return False
+            nodes = next_nodes
+
+        return True
+
+
+@lru_cache(maxsize=4096)
+def resource_pattern_trie(patterns):
+    """Return the (cached) ResourcePatternTrie for a tuple of resource patterns."""
+    return ResourcePatternTrie(patterns)
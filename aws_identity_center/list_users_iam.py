@@ -1,10 +1,17 @@
+import argparse
 import boto3
 import csv
-from botocore.config import Config
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_metrics import instrument_client
+from aws_clients import CLIENT_CONFIG, DEFAULT_MAX_WORKERS, get_client
+from credential_cache import default_credential_cache
+from profiling import phase, run_with_profiling
 
 def list_accounts():
     """List all active accounts in AWS Organizations."""
-    org_client = boto3.client('organizations')
+    org_client = get_client('organizations')
     accounts = []
     paginator = org_client.get_paginator('list_accounts')
 
@@ -16,7 +23,7 @@ def list_accounts():
 
 def get_sso_role_name():
     """Dynamically retrieve the SSO role name from the current caller identity."""
-    sts_client = boto3.client('sts')
+    sts_client = get_client('sts')
     identity = sts_client.get_caller_identity()
     arn = identity['Arn']
 
@@ -29,25 +36,35 @@ def get_sso_role_name():
         raise Exception("Could not detect SSO assumed role automatically.")
 
 
-def assume_role_in_account(account_id, role_name):
-    """Assume the correct role into the target account."""
-    sts_client = boto3.client('sts')
-    role_arn = f"arn:aws:iam::{account_id}:role/{role_name}"
+# (account ID, role name, access key ID) -> IAM client built from those credentials
+_assumed_clients = {}
+_assumed_clients_lock = threading.Lock()
 
-    response = sts_client.assume_role(
-        RoleArn=role_arn,
-        RoleSessionName="ListIAMUsersSession"
-    )
 
-    credentials = response['Credentials']
-
-    session = boto3.Session(
-        aws_access_key_id=credentials['AccessKeyId'],
-        aws_secret_access_key=credentials['SecretAccessKey'],
-        aws_session_token=credentials['SessionToken']
+def assume_role_in_account(account_id, role_name):
+    """Assume the correct role into the target account.
+
+    Credentials come from the shared credential cache, so AssumeRole is only
+    called again shortly before they expire; the IAM client built from them
+    is reused as long as the credentials are.
+    """
+    credentials = default_credential_cache().assume_role(
+        account_id, role_name, session_name="ListIAMUsersSession"
     )
+    key = (account_id, role_name, credentials['AccessKeyId'])
 
-    return session.client("iam")
+    with _assumed_clients_lock:
+        iam_client = _assumed_clients.get(key)
+        if iam_client is None:
+            session = boto3.Session(
+                aws_access_key_id=credentials['AccessKeyId'],
+                aws_secret_access_key=credentials['SecretAccessKey'],
+                aws_session_token=credentials['SessionToken']
+            )
+            iam_client = instrument_client(session.client("iam", config=CLIENT_CONFIG))
+            _assumed_clients[key] = iam_client
+
+    return iam_client
 
 
 def list_iam_users(iam_client):
@@ -61,38 +78,86 @@ def list_iam_users(iam_client):
     return users
 
 
+def scan_account(account_id, role_name):
+    """Assume the role in one account and return its IAM users as CSV rows."""
+    iam_client = assume_role_in_account(account_id, role_name)
+    return [
+        {
+            "AccountId": account_id,
+            "UserName": user['UserName'],
+            "CreateDate": user['CreateDate'].strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        for user in list_iam_users(iam_client)
+    ]
+
+
+def scan_accounts(accounts, role_name, max_workers=DEFAULT_MAX_WORKERS):
+    """Scan accounts concurrently, yielding (account_id, rows, error) as each one completes."""
+    # Every worker assumes roles through the shared STS client, so size its pool for them
+    get_client('sts', max_workers=max_workers)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            executor.submit(scan_account, account_id, role_name): account_id
+            for account_id in accounts
+        }
+        for future in as_completed(futures):
+            account_id = futures[future]
+            try:
+                yield account_id, future.result(), None
+            except Exception as e:
+                yield account_id, [], e
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="List IAM users in every active account of the organization"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_MAX_WORKERS,
+        help=f"Number of accounts scanned concurrently (default: {DEFAULT_MAX_WORKERS})",
+    )
+    return parser.parse_args()
+
+
 def main():
-    accounts = list_accounts()
-    role_name = get_sso_role_name()
-    all_users_data = []
-
-    for account_id in accounts:
-        print(f"\n--- Fetching IAM users from Account {account_id} ---")
-        try:
-            iam_client = assume_role_in_account(account_id, role_name)
-            users = list_iam_users(iam_client)
-
-            for user in users:
-                print(f"User: {user['UserName']}")
-                all_users_data.append({
-                    "AccountId": account_id,
-                    "UserName": user['UserName'],
-                    "CreateDate": user['CreateDate'].strftime("%Y-%m-%dT%H:%M:%S")
-                })
-
-        except Exception as e:
-            print(f"Failed to fetch users in account {account_id}: {e}")
-
-    # Save everything into CSV
-    if all_users_data:
-        with open("iam_users_all_accounts.csv", "w", newline="") as csvfile:
-            fieldnames = ["AccountId", "UserName", "CreateDate"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(all_users_data)
-
-        print("\n✅ IAM users list exported to iam_users_all_accounts.csv")
+    args = parse_arguments()
+
+    with phase("enumerate"):
+        accounts = list_accounts()
+        role_name = get_sso_role_name()
+    print(f"Scanning {len(accounts)} accounts with {args.workers} workers...")
+
+    failed_accounts = []
+    user_count = 0
+    output_filename = "iam_users_all_accounts.csv"
+
+    # Rows are written (and flushed) as each account completes
+    with open(output_filename, "w", newline="") as csvfile:
+        fieldnames = ["AccountId", "UserName", "CreateDate"]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+
+        with phase("fetch users"):
+            for account_id, rows, error in scan_accounts(accounts, role_name, args.workers):
+                if error is not None:
+                    failed_accounts.append((account_id, error))
+                    continue
+
+                with phase("write"):
+                    writer.writerows(rows)
+                    csvfile.flush()
+                user_count += len(rows)
+                print(f"Account {account_id}: {len(rows)} users")
+
+    print(f"\n✅ {user_count} IAM users from {len(accounts) - len(failed_accounts)} accounts exported to {output_filename}")
+
+    if failed_accounts:
+        print(f"\n[!] Failed to fetch users in {len(failed_accounts)} accounts:")
+        for account_id, error in sorted(failed_accounts, key=lambda failure: failure[0]):
+            print(f"  - {account_id}: {error}")
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "list_users_iam")
@@ -1,11 +1,15 @@
-import boto3
+import argparse
 import csv
+import io
 import os
 import configparser
 import time
-from botocore.config import Config
 from datetime import datetime, timedelta, timezone
 
+from aws_clients import get_client
+from credential_cache import get_profile_account_id
+from profiling import phase, run_with_profiling
+
 
 def list_profiles():
     """List AWS profiles from ~/.aws/config."""
@@ -23,9 +27,8 @@ def list_profiles():
     return profiles
 
 
-def list_iam_users(session):
-    """List all IAM users using the provided boto3 session."""
-    iam_client = session.client("iam")
+def list_iam_users(iam_client):
+    """List all IAM users using the provided IAM client."""
     users = []
     paginator = iam_client.get_paginator("list_users")
 
@@ -58,34 +61,153 @@ def get_user_access_keys_last_used(iam_client, user_name):
         return None
 
 
+# Backoff between polling rounds of service-last-accessed jobs (seconds)
+JOB_POLL_INITIAL_DELAY = 1
+JOB_POLL_MAX_DELAY = 16
+JOB_POLL_TIMEOUT = 600
+
+
+def find_codecommit_last_authenticated(iam_client, job_id, first_page):
+    """Return CodeCommit's LastAuthenticated date from a completed job, following pagination."""
+    page = first_page
+    while True:
+        for service in page.get("ServicesLastAccessed", []):
+            if service["ServiceName"] == "AWS CodeCommit":
+                return service.get("LastAuthenticated")
+        if not page.get("IsTruncated"):
+            return None
+        page = iam_client.get_service_last_accessed_details(
+            JobId=job_id, Marker=page["Marker"]
+        )
+
+
+def get_codecommit_last_used_batch(
+    iam_client,
+    user_arns,
+    initial_delay=JOB_POLL_INITIAL_DELAY,
+    max_delay=JOB_POLL_MAX_DELAY,
+    timeout=JOB_POLL_TIMEOUT,
+):
+    """Return {user ARN: CodeCommit LastAuthenticated date or None} for many users at once.
+
+    One service-last-accessed job is submitted per user up front; the pending
+    jobs are then polled together, sleeping with exponential backoff between
+    rounds, so the total wait is bounded by the slowest job.
+    """
+    results = {arn: None for arn in user_arns}
+    pending = {}  # job ID -> user ARN
+
+    for user_arn in user_arns:
+        try:
+            job_response = iam_client.generate_service_last_accessed_details(Arn=user_arn)
+            pending[job_response["JobId"]] = user_arn
+        except Exception as e:
+            print(f"Warning: Error getting CodeCommit usage for {user_arn}: {e}")
+
+    delay = initial_delay
+    deadline = time.monotonic() + timeout
+    while pending:
+        for job_id, user_arn in list(pending.items()):
+            try:
+                status_response = iam_client.get_service_last_accessed_details(JobId=job_id)
+                if status_response["JobStatus"] == "IN_PROGRESS":
+                    continue
+
+                del pending[job_id]
+                if status_response["JobStatus"] == "FAILED":
+                    print(f"Warning: Service access report generation failed for {user_arn}")
+                    continue
+
+                results[user_arn] = find_codecommit_last_authenticated(
+                    iam_client, job_id, status_response
+                )
+            except Exception as e:
+                pending.pop(job_id, None)
+                print(f"Warning: Error getting CodeCommit usage for {user_arn}: {e}")
+
+        if not pending:
+            break
+        if time.monotonic() + delay > deadline:
+            for user_arn in pending.values():
+                print(f"Warning: Timed out waiting for the service access report of {user_arn}")
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+    return results
+
+
 def get_codecommit_last_used(iam_client, user_arn):
     """Retrieve the LastAccessed date for AWS CodeCommit service for a user."""
-    try:
-        # Start the report generation
-        job_response = iam_client.generate_service_last_accessed_details(Arn=user_arn)
-        job_id = job_response["JobId"]
-
-        # Poll until job is ready
-        while True:
-            status_response = iam_client.get_service_last_accessed_details(JobId=job_id)
-            if status_response["JobStatus"] in ["COMPLETED", "FAILED"]:
-                break
-            time.sleep(1)
-
-        if status_response["JobStatus"] == "FAILED":
-            print(f"Warning: Service access report generation failed for {user_arn}")
-            return None
+    return get_codecommit_last_used_batch(iam_client, [user_arn])[user_arn]
 
-        # Parse the services used
-        for service in status_response.get("ServicesLastAccessed", []):
-            if service["ServiceName"] == "AWS CodeCommit":
-                last_authenticated = service.get("LastAuthenticated")
-                return last_authenticated
 
-    except Exception as e:
-        print(f"Warning: Error getting CodeCommit usage for {user_arn}: {e}")
+# Credential report values meaning "no date"
+CREDENTIAL_REPORT_EMPTY_VALUES = {"", "N/A", "no_information", "not_supported"}
+
 
-    return None
+def get_credential_report(
+    iam_client,
+    initial_delay=JOB_POLL_INITIAL_DELAY,
+    max_delay=JOB_POLL_MAX_DELAY,
+    timeout=JOB_POLL_TIMEOUT,
+):
+    """Generate the account's IAM credential report (if needed) and return its CSV content as bytes."""
+    delay = initial_delay
+    deadline = time.monotonic() + timeout
+    while iam_client.generate_credential_report()["State"] != "COMPLETE":
+        if time.monotonic() + delay > deadline:
+            raise TimeoutError("Timed out waiting for the IAM credential report")
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+    return iam_client.get_credential_report()["Content"]
+
+
+def parse_report_date(value):
+    """Parse a credential report timestamp, or return None for N/A-style values."""
+    if value in CREDENTIAL_REPORT_EMPTY_VALUES:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def iter_credential_report(content):
+    """Yield the rows of a credential report one at a time, without decoding it all up front."""
+    reader = csv.DictReader(io.TextIOWrapper(io.BytesIO(content), encoding="utf-8"))
+    yield from reader
+
+
+def collect_user_activity_from_report(iam_client):
+    """Return {user name: {"PasswordLastUsed", "AccessKeyLastUsed"}} from one credential report."""
+    activity = {}
+    for row in iter_credential_report(get_credential_report(iam_client)):
+        if row["user"] == "<root_account>":
+            continue
+        key_dates = [
+            parse_report_date(row.get(f"access_key_{n}_last_used_date", "N/A"))
+            for n in (1, 2)
+        ]
+        key_dates = [date for date in key_dates if date]
+        activity[row["user"]] = {
+            "PasswordLastUsed": parse_report_date(row.get("password_last_used", "N/A")),
+            "AccessKeyLastUsed": max(key_dates) if key_dates else None,
+        }
+    return activity
+
+
+def get_user_last_activity(iam_client, user, report_activity):
+    """Return (console last login, access key last used) for a user from list_users.
+
+    Both come from the credential report when it has the user; otherwise the
+    console date comes from list_users and the key date from per-user calls.
+    """
+    activity = report_activity.get(user["UserName"])
+    if activity is not None:
+        return activity["PasswordLastUsed"], activity["AccessKeyLastUsed"]
+
+    with phase("fetch activity"):
+        access_key_last_used = get_user_access_keys_last_used(iam_client, user["UserName"])
+    return user.get("PasswordLastUsed"), access_key_last_used
 
 
 def is_user_active(console_last_login, access_key_last_used, codecommit_last_used):
@@ -103,11 +225,11 @@ def is_user_active(console_last_login, access_key_last_used, codecommit_last_use
 
 def list_identity_store_usernames():
     """Fetch all SSO usernames from Identity Store (only the part before @), stored in lowercase."""
-    client = boto3.client("sso-admin")
+    client = get_client("sso-admin")
     instances = client.list_instances()
     identity_store_id = instances["Instances"][0]["IdentityStoreId"]
 
-    identitystore_client = boto3.client("identitystore")
+    identitystore_client = get_client("identitystore")
     usernames = set()
     next_token = None
 
@@ -133,15 +255,33 @@ def list_identity_store_usernames():
     return usernames
 
 
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description="List IAM users of every profile in ~/.aws/config with their last activity"
+    )
+    parser.add_argument(
+        "--credential-report",
+        action="store_true",
+        help="Read access key activity from one IAM credential report per account "
+        "instead of per-user API calls",
+    )
+    return parser.parse_args()
+
+
 def main():
-    profiles = list_profiles()
+    args = parse_arguments()
+    use_credential_report = args.credential_report
+
+    with phase("enumerate"):
+        profiles = list_profiles()
 
     print("\nProfiles to work on:")
     for profile in profiles:
         print(f"  - {profile}")
 
     print("\nFetching SSO usernames to determine migration...")
-    sso_usernames = list_identity_store_usernames()
+    with phase("fetch sso users"):
+        sso_usernames = list_identity_store_usernames()
     print(f"Collected {len(sso_usernames)} SSO usernames.\n")
 
     all_users_data = []
@@ -150,16 +290,28 @@ def main():
         print(f"\nFetching IAM users for profile: {profile}")
 
         try:
-            # Create session for that profile
-            session = boto3.Session(profile_name=profile)
-
-            # Get the account ID
-            sts_client = session.client("sts")
-            account_id = sts_client.get_caller_identity()["Account"]
+            # Get the account ID (cached per profile)
+            account_id = get_profile_account_id(profile)
 
             # List IAM users
-            iam_users = list_iam_users(session)
-            iam_client = session.client("iam")
+            iam_client = get_client("iam", profile=profile)
+            with phase("fetch users"):
+                iam_users = list_iam_users(iam_client)
+
+            # One credential report per account replaces the per-user key lookups
+            report_activity = {}
+            if use_credential_report:
+                with phase("fetch credential report"):
+                    try:
+                        report_activity = collect_user_activity_from_report(iam_client)
+                    except Exception as e:
+                        print(f"    Warning: credential report unavailable, using per-user calls: {e}")
+
+            # Service-last-accessed jobs for every user of the account run together
+            with phase("fetch activity"):
+                codecommit_by_arn = get_codecommit_last_used_batch(
+                    iam_client, [user["Arn"] for user in iam_users]
+                )
 
             if iam_users:
                 for user in iam_users:
@@ -167,13 +319,10 @@ def main():
                     user_arn = user["Arn"]
                     print(f"    Found user: {user_name}")
 
-                    console_last_login = user.get("PasswordLastUsed")
-                    access_key_last_used = get_user_access_keys_last_used(
-                        iam_client, user_name
-                    )
-                    codecommit_last_used = get_codecommit_last_used(
-                        iam_client, user_arn
+                    console_last_login, access_key_last_used = get_user_last_activity(
+                        iam_client, user, report_activity
                     )
+                    codecommit_last_used = codecommit_by_arn.get(user_arn)
 
                     is_migrated = "Yes" if user_name.lower() in sso_usernames else "No"
 
@@ -217,7 +366,7 @@ def main():
         today = datetime.today().strftime("%Y-%m-%d")
         csv_filename = f"iam_users_all_profiles_{today}.csv"
 
-        with open(csv_filename, "w", newline="") as csvfile:
+        with phase("write"), open(csv_filename, "w", newline="") as csvfile:
             fieldnames = [
                 "Profile",
                 "AccountId",
@@ -239,4 +388,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "list_users_iamv2")
@@ -1,19 +1,21 @@
-import boto3
 import csv
 import sys
 from datetime import datetime
 
+from aws_clients import get_client
+from profiling import phase, run_with_profiling
+
 
 def get_identity_store_id():
     """Retrieve the IdentityStoreId from the active SSO instance."""
-    client = boto3.client("sso-admin")
+    client = get_client("sso-admin")
     instances = client.list_instances()
     return instances["Instances"][0]["IdentityStoreId"]
 
 
 def list_users(identity_store_id, manual_only=True):
     """List all users, filtering for manually created users if manual_only is True."""
-    client = boto3.client("identitystore")
+    client = get_client("identitystore")
     users = []
     next_token = None
 
@@ -66,13 +68,15 @@ def main():
     if len(sys.argv) > 1 and sys.argv[1].lower() == "manual=false":
         manual_only = False
 
-    identity_store_id = get_identity_store_id()
-    # manual_users = list_manual_users(identity_store_id)
-    users = list_users(identity_store_id, manual_only=manual_only)
+    with phase("enumerate"):
+        identity_store_id = get_identity_store_id()
+        # manual_users = list_manual_users(identity_store_id)
+        users = list_users(identity_store_id, manual_only=manual_only)
 
-    write_users_to_csv(users, manual_only=manual_only)
+    with phase("write"):
+        write_users_to_csv(users, manual_only=manual_only)
     print(f"Exported {len(users)} users to CSV with today's date")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    run_with_profiling(main, "list_users_sso")
\ No newline at end of file
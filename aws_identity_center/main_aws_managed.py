@@ -5,19 +5,28 @@
 
 import sys
 import ast
+from contextlib import ExitStack
+
 from permission_set_utils import (
-    list_permission_sets,
-    get_permission_set_name,
-    get_permission_set_policies,
+    ASSIGNMENT_FIELDNAMES,
+    DEFAULT_MAX_WORKERS,
+    NORMALIZED_FIELDNAMES,
+    CsvRowWriter,
+    PolicyTableWriter,
+    get_identity_store_id,
+    load_permission_set_snapshot,
+    PrincipalDirectory,
     list_permission_set_assignments,
-    write_to_csv,
+    pop_normalized_flag,
 )
+from profiling import run_with_profiling
+from snapshot_store import open_snapshot_store
 
 
 def parse_policy_list():
     """Parse and validate the list of policies from CLI arguments."""
     if len(sys.argv) < 2:
-        print("Usage: python main_aws_managed.py ['policy1', 'policy2']")
+        print("Usage: python main_aws_managed.py ['policy1', 'policy2'] [--normalized]")
         sys.exit(1)
 
     try:
@@ -30,13 +39,31 @@ def parse_policy_list():
         sys.exit(1)
 
 
-def collect_permission_set_data(instance_arn, input_policies):
-    """Collect relevant permission set assignment data for matched managed policies."""
-    permission_sets = list_permission_sets(instance_arn)
-    results_by_policy = {policy: [] for policy in input_policies}
-
-    for ps in permission_sets:
-        managed_policies, inline_policy = get_permission_set_policies(instance_arn, ps)
+def collect_permission_set_data(
+    instance_arn,
+    input_policies,
+    snapshot=None,
+    principal_directory=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    store=None,
+):
+    """Yield (matched policy, row) for each assignment of a permission set using a matched managed policy.
+
+    Rows are produced one permission set at a time, so they can be written
+    out as they are found instead of being held in memory.
+    """
+    if snapshot is None:
+        snapshot = load_permission_set_snapshot(instance_arn, store=store)
+    if principal_directory is None:
+        identity_store_id = get_identity_store_id(instance_arn, store=store)
+        principal_directory = PrincipalDirectory(identity_store_id).load(
+            store=store
+        )
+
+    for permission_set in snapshot:
+        ps = permission_set.arn
+        managed_policies = permission_set.managed_policies
+        inline_policy = permission_set.inline_policy
         matched_policy_names = [
             input_policy
             for input_policy in input_policies
@@ -46,56 +73,63 @@ def collect_permission_set_data(instance_arn, input_policies):
         ]
 
         if matched_policy_names:
-            ps_name = get_permission_set_name(instance_arn, ps)
-            assignments = list_permission_set_assignments(instance_arn, ps)
+            ps_name = permission_set.name
+            assignments = list_permission_set_assignments(
+                instance_arn,
+                ps,
+                principal_directory=principal_directory,
+                max_workers=max_workers,
+                store=store,
+            )
+            base_row = {
+                "PermissionSetName": ps_name,
+                "PermissionSetArn": ps,
+                "ManagedPolicies": ", ".join([p["Name"] for p in managed_policies]),
+                "InlinePolicy": inline_policy if inline_policy else "None",
+            }
 
             if not assignments:
                 for matched_policy in matched_policy_names:
-                    results_by_policy[matched_policy].append(
-                        {
-                            "PermissionSetName": ps_name,
-                            "PermissionSetArn": ps,
-                            "ManagedPolicies": ", ".join(
-                                [p["Name"] for p in managed_policies]
-                            ),
-                            "InlinePolicy": inline_policy if inline_policy else "None",
-                            "PrincipalType": "",
-                            "PrincipalName": "",
-                            "AccountId": "",
-                        }
-                    )
+                    yield matched_policy, {
+                        **base_row,
+                        "PrincipalType": "",
+                        "PrincipalName": "",
+                        "AccountId": "",
+                    }
             else:
                 for assignment in assignments:
                     for matched_policy in matched_policy_names:
-                        results_by_policy[matched_policy].append(
-                            {
-                                "PermissionSetName": ps_name,
-                                "PermissionSetArn": ps,
-                                "ManagedPolicies": ", ".join(
-                                    [p["Name"] for p in managed_policies]
-                                ),
-                                "InlinePolicy": (
-                                    inline_policy if inline_policy else "None"
-                                ),
-                                "PrincipalType": assignment["PrincipalType"],
-                                "PrincipalName": assignment["PrincipalName"],
-                                "AccountId": assignment["AccountId"],
-                            }
-                        )
-
-    return results_by_policy
+                        yield matched_policy, {
+                            **base_row,
+                            "PrincipalType": assignment["PrincipalType"],
+                            "PrincipalName": assignment["PrincipalName"],
+                            "AccountId": assignment["AccountId"],
+                        }
 
 
 def main():
     """Main script for listing permission set assignments based on AWS managed policies."""
     instance_arn = "arn:aws:sso:::instance/ssoins-xxxxxxxxxxxx"
+    normalized = pop_normalized_flag()
     input_policies = parse_policy_list()
-    results_by_policy = collect_permission_set_data(instance_arn, input_policies)
+    fieldnames = NORMALIZED_FIELDNAMES if normalized else ASSIGNMENT_FIELDNAMES
 
     print("Filtered Permission Sets (matching input policies):")
-    for policy, rows in results_by_policy.items():
-        write_to_csv(f"{policy}.csv", rows)
+    with ExitStack() as stack:
+        # With --normalized, policy content goes to policies.csv once and rows reference its hash
+        policy_table = stack.enter_context(PolicyTableWriter()) if normalized else None
+        # One file per input policy, created up front so unmatched policies still get a header
+        writers = {
+            policy: stack.enter_context(CsvRowWriter(f"{policy}.csv", fieldnames))
+            for policy in input_policies
+        }
+        for policy, row in collect_permission_set_data(
+            instance_arn, input_policies, store=open_snapshot_store()
+        ):
+            if policy_table is not None:
+                row = policy_table.normalize(row)
+            writers[policy].write(row)
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "main_aws_managed")
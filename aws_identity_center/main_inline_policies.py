@@ -3,19 +3,28 @@
 
 import sys
 import ast
+from contextlib import ExitStack
+
 from permission_set_utils import (
-    list_permission_sets,
-    get_permission_set_name,
-    get_permission_set_policies,
+    ASSIGNMENT_FIELDNAMES,
+    DEFAULT_MAX_WORKERS,
+    NORMALIZED_FIELDNAMES,
+    CsvRowWriter,
+    PolicyTableWriter,
+    get_identity_store_id,
+    load_permission_set_snapshot,
+    PrincipalDirectory,
     list_permission_set_assignments,
-    write_to_csv,
+    pop_normalized_flag,
 )
+from profiling import run_with_profiling
+from snapshot_store import open_snapshot_store
 
 
 def parse_inline_filter():
     """Parse and validate the list of keywords to search inside inline policies."""
     if len(sys.argv) < 2:
-        print("Usage: python main_aws_inline.py ['keyword1', 'keyword2']")
+        print("Usage: python main_aws_inline.py ['keyword1', 'keyword2'] [--normalized]")
         sys.exit(1)
 
     try:
@@ -38,63 +47,92 @@ def inline_policy_matches(inline_policy, keywords):
     return any(keyword in policy_str for keyword in keywords)
 
 
-def collect_inline_permission_set_data(instance_arn, keywords):
-    """Collect data for permission sets where inline policy matches any of the keywords."""
-    permission_sets = list_permission_sets(instance_arn)
-    results = []
+def collect_inline_permission_set_data(
+    instance_arn,
+    keywords,
+    snapshot=None,
+    principal_directory=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    store=None,
+):
+    """Yield a row per assignment of each permission set whose inline policy matches any of the keywords.
+
+    Rows are produced one permission set at a time, so they can be written
+    out as they are found instead of being held in memory.
+    """
+    if snapshot is None:
+        snapshot = load_permission_set_snapshot(instance_arn, store=store)
+    if principal_directory is None:
+        identity_store_id = get_identity_store_id(instance_arn, store=store)
+        principal_directory = PrincipalDirectory(identity_store_id).load(
+            store=store
+        )
 
-    for ps in permission_sets:
-        managed_policies, inline_policy = get_permission_set_policies(instance_arn, ps)
+    for permission_set in snapshot:
+        ps = permission_set.arn
+        managed_policies = permission_set.managed_policies
+        inline_policy = permission_set.inline_policy
         if inline_policy_matches(inline_policy, keywords):
-            ps_name = get_permission_set_name(instance_arn, ps)
-            assignments = list_permission_set_assignments(instance_arn, ps)
+            ps_name = permission_set.name
+            assignments = list_permission_set_assignments(
+                instance_arn,
+                ps,
+                principal_directory=principal_directory,
+                max_workers=max_workers,
+                store=store,
+            )
+            base_row = {
+                "PermissionSetName": ps_name,
+                "PermissionSetArn": ps,
+                "ManagedPolicies": ", ".join([p["Name"] for p in managed_policies]),
+                "InlinePolicy": inline_policy,
+            }
 
             if not assignments:
-                results.append(
-                    {
-                        "PermissionSetName": ps_name,
-                        "PermissionSetArn": ps,
-                        "ManagedPolicies": ", ".join(
-                            [p["Name"] for p in managed_policies]
-                        ),
-                        "InlinePolicy": inline_policy,
-                        "PrincipalType": "",
-                        "PrincipalName": "",
-                        "AccountId": "",
-                    }
-                )
+                yield {
+                    **base_row,
+                    "PrincipalType": "",
+                    "PrincipalName": "",
+                    "AccountId": "",
+                }
             else:
                 for assignment in assignments:
-                    results.append(
-                        {
-                            "PermissionSetName": ps_name,
-                            "PermissionSetArn": ps,
-                            "ManagedPolicies": ", ".join(
-                                [p["Name"] for p in managed_policies]
-                            ),
-                            "InlinePolicy": inline_policy,
-                            "PrincipalType": assignment["PrincipalType"],
-                            "PrincipalName": assignment["PrincipalName"],
-                            "AccountId": assignment["AccountId"],
-                        }
-                    )
-
-    return results
+                    yield {
+                        **base_row,
+                        "PrincipalType": assignment["PrincipalType"],
+                        "PrincipalName": assignment["PrincipalName"],
+                        "AccountId": assignment["AccountId"],
+                    }
 
 
 def main():
     """Main script for listing permission set assignments based on keywords in inline policies."""
     instance_arn = "arn:aws:sso:::instance/ssoins-xxxxxxxxxxxx"
+    normalized = pop_normalized_flag()
     keywords = parse_inline_filter()
-    data = collect_inline_permission_set_data(instance_arn, keywords)
+    fieldnames = NORMALIZED_FIELDNAMES if normalized else ASSIGNMENT_FIELDNAMES
 
     print("Filtered Permission Sets (matching inline policy keywords):")
-    for keyword in keywords:
-        filtered = [row for row in data if keyword in str(row["InlinePolicy"]).lower()]
-        # print(filtered)
-        safe_keyword = keyword.replace(":", "_").replace("*", "star")
-        write_to_csv(f"inline_{safe_keyword}.csv", filtered)
+    with ExitStack() as stack:
+        # With --normalized, policy content goes to policies.csv once and rows reference its hash
+        policy_table = stack.enter_context(PolicyTableWriter()) if normalized else None
+        # One file per keyword, created up front so unmatched keywords still get a header
+        writers = {}
+        for keyword in keywords:
+            safe_keyword = keyword.replace(":", "_").replace("*", "star")
+            writers[keyword] = stack.enter_context(
+                CsvRowWriter(f"inline_{safe_keyword}.csv", fieldnames)
+            )
+
+        for row in collect_inline_permission_set_data(
+            instance_arn, keywords, store=open_snapshot_store()
+        ):
+            inline_policy = str(row["InlinePolicy"]).lower()
+            output_row = policy_table.normalize(row) if policy_table is not None else row
+            for keyword, writer in writers.items():
+                if keyword in inline_policy:
+                    writer.write(output_row)
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "main_inline_policies")
@@ -1,10 +1,51 @@
-import boto3
 import csv
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Optional
 
+from aws_clients import DEFAULT_MAX_WORKERS, get_client
+from profiling import phase
 
-def list_permission_sets(instance_arn):
+
+@dataclass
+class PermissionSetDetails:
+    """Name and policies of a single permission set, as fetched from AWS."""
+
+    arn: str
+    name: str
+    inline_policy: Optional[str] = None
+    managed_policies: list = field(default_factory=list)
+
+
+@dataclass
+class PermissionSetSnapshot:
+    """In-memory view of every permission set in an Identity Center instance."""
+
+    instance_arn: str
+    permission_sets: list = field(default_factory=list)
+    _by_arn: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._by_arn = {details.arn: details for details in self.permission_sets}
+
+    def __iter__(self):
+        return iter(self.permission_sets)
+
+    def __len__(self):
+        return len(self.permission_sets)
+
+    def get(self, permission_set_arn):
+        """Return the details for a permission set ARN, or None if unknown."""
+        return self._by_arn.get(permission_set_arn)
+
+
+def list_permission_sets(instance_arn, sso_client=None):
     """List all permission sets in the AWS IAM Identity Center"""
-    client = boto3.client("sso-admin")
+    client = sso_client or get_client("sso-admin")
     permission_sets = []
     next_token = None
 
@@ -21,18 +62,9 @@ def list_permission_sets(instance_arn):
     return permission_sets
 
 
-def get_permission_set_name(instance_arn, permission_set_arn):
-    """Get the human-readable name of a permission set given its ARN."""
-    client = boto3.client("sso-admin")
-    response = client.describe_permission_set(
-        InstanceArn=instance_arn, PermissionSetArn=permission_set_arn
-    )
-    return response["PermissionSet"].get("Name", "Unknown")
-
-
-def get_principal_name(identity_store_id, principal_id, principal_type):
+def get_principal_name(identity_store_id, principal_id, principal_type, client=None):
     """Resolve a principal ID (user or group) to its display name."""
-    client = boto3.client("identitystore")
+    client = client or get_client("identitystore")
     try:
         if principal_type == "GROUP":
             response = client.describe_group(
@@ -48,47 +80,178 @@ def get_principal_name(identity_store_id, principal_id, principal_type):
         return f"Error retrieving name: {e}"
 
 
-def get_permission_set_policies(instance_arn, permission_set_arn):
-    """Get managed and inline policies attached to a permission set."""
-    client = boto3.client("sso-admin")
-    managed_policies = []
-    inline_policy = None
+class PrincipalDirectory:
+    """Principal ID -> display name index for one identity store.
+
+    ``load`` pages ``list_users`` and ``list_groups`` once per run; IDs missing
+    from the index fall back to a single, memoized describe call.
+    """
+
+    def __init__(self, identity_store_id, identitystore_client=None):
+        self.identity_store_id = identity_store_id
+        self.client = identitystore_client or get_client("identitystore")
+        self.names = {}
+
+    def load(self, store=None):
+        """Index every user and group of the identity store by ID.
+
+        With a ``SnapshotStore``, a fresh stored index is reused instead of
+        paging the identity store, and a fetched one is saved.
+        """
+        if store is not None:
+            names = store.load_principals(self.identity_store_id)
+            if names is not None:
+                self.names.update(names)
+                return self
+
+        with phase("fetch principals"):
+            paginator = self.client.get_paginator("list_users")
+            for page in paginator.paginate(IdentityStoreId=self.identity_store_id):
+                for user in page.get("Users", []):
+                    self.names[user["UserId"]] = user.get("UserName", "Unknown User")
+
+            paginator = self.client.get_paginator("list_groups")
+            for page in paginator.paginate(IdentityStoreId=self.identity_store_id):
+                for group in page.get("Groups", []):
+                    self.names[group["GroupId"]] = group.get(
+                        "DisplayName", "Unknown Group"
+                    )
+
+        if store is not None:
+            store.save_principals(self.identity_store_id, self.names)
+
+        return self
+
+    def get_name(self, principal_id, principal_type):
+        """Return the display name of a principal, describing it on a cache miss."""
+        name = self.names.get(principal_id)
+        if name is None:
+            name = get_principal_name(
+                self.identity_store_id, principal_id, principal_type, self.client
+            )
+            # Lookup errors are not memoized so a later call can still succeed
+            if name is not None and not name.startswith("Error retrieving name"):
+                self.names[principal_id] = name
+        return name
+
+
+def fetch_permission_set_details(sso_client, instance_arn, permission_set_arn):
+    """Fetch name, inline policy and managed policies of one permission set."""
+    response = sso_client.describe_permission_set(
+        InstanceArn=instance_arn, PermissionSetArn=permission_set_arn
+    )
+    name = response["PermissionSet"].get("Name", "Unknown")
 
     try:
-        response = client.list_managed_policies_in_permission_set(
+        response = sso_client.get_inline_policy_for_permission_set(
             InstanceArn=instance_arn, PermissionSetArn=permission_set_arn
         )
-        managed_policies = response.get("AttachedManagedPolicies", [])
-    except Exception as e:
-        print(f"Error retrieving managed policies: {e}")
+        inline_policy = response.get("InlinePolicy") or None
+    except sso_client.exceptions.ResourceNotFoundException:
+        inline_policy = None
 
+    managed_policies = []
     try:
-        response = client.get_inline_policy_for_permission_set(
+        response = sso_client.list_managed_policies_in_permission_set(
             InstanceArn=instance_arn, PermissionSetArn=permission_set_arn
         )
-        inline_policy = response.get("InlinePolicy")
-    except client.exceptions.ResourceNotFoundException:
-        inline_policy = None
+        managed_policies = list(response.get("AttachedManagedPolicies", []))
+    except Exception as e:
+        print(f"Error retrieving managed policies for {permission_set_arn}: {e}")
+
+    return PermissionSetDetails(
+        arn=permission_set_arn,
+        name=name,
+        inline_policy=inline_policy,
+        managed_policies=managed_policies,
+    )
 
-    return managed_policies, inline_policy
 
+def get_instance_arn(sso_client=None, store=None):
+    """Return the ARN of the Identity Center instance.
 
-def list_permission_set_assignments(instance_arn, permission_set_arn):
-    """List all account assignments (users/groups) for a given permission set across all provisioned accounts."""
-    sso_client = boto3.client("sso-admin")
-    identitystore_client = boto3.client("identitystore")
-    assignments = []
+    With a ``SnapshotStore`` holding a fresh snapshot, its instance is used
+    without any AWS call, so analyses can be re-run offline.
+    """
+    if store is not None:
+        instance_arn = store.load_instance_arn()
+        if instance_arn is not None:
+            return instance_arn
 
+    sso_client = sso_client or get_client("sso-admin")
+    return sso_client.list_instances()["Instances"][0]["InstanceArn"]
+
+
+def load_permission_set_snapshot(
+    instance_arn, sso_client=None, max_workers=DEFAULT_MAX_WORKERS, store=None
+):
+    """Fetch every permission set with its policies through a bounded thread pool.
+
+    The describe / inline policy / managed policy calls for each permission set
+    are issued concurrently (at most ``max_workers`` in flight), and the result
+    keeps the order returned by ``list_permission_sets``. With a
+    ``SnapshotStore``, a fresh stored snapshot is returned without any AWS call.
+    """
+    if store is not None:
+        snapshot = store.load_permission_set_snapshot(instance_arn)
+        if snapshot is not None:
+            return snapshot
+
+    client = sso_client or get_client("sso-admin", max_workers=max_workers)
+    with phase("enumerate"):
+        permission_set_arns = list_permission_sets(instance_arn, sso_client=client)
+
+    with phase("fetch policies"):
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            permission_sets = list(
+                executor.map(
+                    lambda arn: fetch_permission_set_details(client, instance_arn, arn),
+                    permission_set_arns,
+                )
+            )
+
+    snapshot = PermissionSetSnapshot(
+        instance_arn=instance_arn, permission_sets=permission_sets
+    )
+    if store is not None:
+        store.save_permission_set_snapshot(snapshot)
+    return snapshot
+
+
+# instance ARN -> IdentityStoreId, resolved once per process
+_identity_store_ids = {}
+
+
+def clear_identity_store_ids():
+    """Forget the resolved IdentityStoreIds (used by the tests)."""
+    _identity_store_ids.clear()
+
+
+def get_identity_store_id(instance_arn, sso_client=None, store=None):
+    """Return the IdentityStoreId backing the given Identity Center instance."""
+    if instance_arn in _identity_store_ids:
+        return _identity_store_ids[instance_arn]
+
+    if store is not None:
+        identity_store_id = store.load_identity_store_id(instance_arn)
+        if identity_store_id is not None:
+            _identity_store_ids[instance_arn] = identity_store_id
+            return identity_store_id
+
+    sso_client = sso_client or get_client("sso-admin")
     instances = sso_client.list_instances()
-    identity_store_id = None
     for inst in instances["Instances"]:
         if inst["InstanceArn"] == instance_arn:
-            identity_store_id = inst["IdentityStoreId"]
-            break
+            _identity_store_ids[instance_arn] = inst["IdentityStoreId"]
+            if store is not None:
+                store.save_identity_store_id(instance_arn, inst["IdentityStoreId"])
+            return inst["IdentityStoreId"]
 
-    if identity_store_id is None:
-        raise ValueError(f"IdentityStoreId not found for instance ARN: {instance_arn}")
+    raise ValueError(f"IdentityStoreId not found for instance ARN: {instance_arn}")
 
+
+def list_accounts_for_permission_set(sso_client, instance_arn, permission_set_arn):
+    """List the account IDs a permission set is provisioned into."""
     account_ids = []
     next_token = None
     while True:
@@ -108,53 +271,249 @@ def list_permission_set_assignments(instance_arn, permission_set_arn):
         if not next_token:
             break
 
-    for account_id in account_ids:
-        next_token = None
-        while True:
-            response = (
-                sso_client.list_account_assignments(
-                    InstanceArn=instance_arn,
-                    PermissionSetArn=permission_set_arn,
-                    AccountId=account_id,
-                    NextToken=next_token,
-                )
-                if next_token
-                else sso_client.list_account_assignments(
-                    InstanceArn=instance_arn,
-                    PermissionSetArn=permission_set_arn,
-                    AccountId=account_id,
-                )
+    return account_ids
+
+
+def list_account_assignments(
+    sso_client, instance_arn, permission_set_arn, account_id, principal_directory
+):
+    """List the assignments of a permission set in one account, with principal names."""
+    assignments = []
+    next_token = None
+    while True:
+        response = (
+            sso_client.list_account_assignments(
+                InstanceArn=instance_arn,
+                PermissionSetArn=permission_set_arn,
+                AccountId=account_id,
+                NextToken=next_token,
             )
-            for assignment in response.get("AccountAssignments", []):
-                principal_name = get_principal_name(
-                    identity_store_id,
-                    assignment["PrincipalId"],
-                    assignment["PrincipalType"],
-                )
-                assignment["PrincipalName"] = principal_name
-                assignment["AccountId"] = account_id
-                assignments.append(assignment)
+            if next_token
+            else sso_client.list_account_assignments(
+                InstanceArn=instance_arn,
+                PermissionSetArn=permission_set_arn,
+                AccountId=account_id,
+            )
+        )
+        for assignment in response.get("AccountAssignments", []):
+            principal_name = principal_directory.get_name(
+                assignment["PrincipalId"],
+                assignment["PrincipalType"],
+            )
+            assignment["PrincipalName"] = principal_name
+            assignment["AccountId"] = account_id
+            assignments.append(assignment)
 
-            next_token = response.get("NextToken")
-            if not next_token:
-                break
+        next_token = response.get("NextToken")
+        if not next_token:
+            break
 
     return assignments
 
 
+def iter_permission_set_assignments(
+    instance_arn,
+    permission_set_arn,
+    principal_directory=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    sso_client=None,
+    store=None,
+):
+    """Yield the account assignments of a permission set as they are fetched.
+
+    Accounts are paged concurrently by up to ``max_workers`` threads sharing a
+    single sso-admin client; with ``max_workers=1`` they are paged in order.
+    With a ``SnapshotStore``, fresh stored assignments are yielded instead and
+    fetched ones are saved once the permission set is complete.
+    """
+    if store is not None:
+        assignments = store.load_assignments(instance_arn, permission_set_arn)
+        if assignments is not None:
+            yield from assignments
+            return
+
+        assignments = []
+        for assignment in iter_permission_set_assignments(
+            instance_arn,
+            permission_set_arn,
+            principal_directory=principal_directory,
+            max_workers=max_workers,
+            sso_client=sso_client,
+        ):
+            assignments.append(assignment)
+            yield assignment
+        store.save_assignments(instance_arn, permission_set_arn, assignments)
+        return
+
+    sso_client = sso_client or get_client("sso-admin", max_workers=max_workers)
+
+    if principal_directory is None:
+        identity_store_id = get_identity_store_id(instance_arn, sso_client)
+        principal_directory = PrincipalDirectory(identity_store_id)
+
+    account_ids = list_accounts_for_permission_set(
+        sso_client, instance_arn, permission_set_arn
+    )
+
+    def fetch(account_id):
+        return list_account_assignments(
+            sso_client, instance_arn, permission_set_arn, account_id, principal_directory
+        )
+
+    if max_workers <= 1 or len(account_ids) <= 1:
+        for account_id in account_ids:
+            yield from fetch(account_id)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(account_ids))) as executor:
+        futures = [executor.submit(fetch, account_id) for account_id in account_ids]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def list_permission_set_assignments(
+    instance_arn,
+    permission_set_arn,
+    principal_directory=None,
+    max_workers=1,
+    store=None,
+):
+    """List all account assignments (users/groups) for a given permission set across all provisioned accounts.
+
+    Pass a loaded ``PrincipalDirectory`` to resolve principal names without
+    per-assignment Identity Store calls, and ``max_workers`` > 1 to page the
+    accounts concurrently (rows are then returned in completion order).
+    """
+    with phase("fetch assignments"):
+        return list(
+            iter_permission_set_assignments(
+                instance_arn,
+                permission_set_arn,
+                principal_directory=principal_directory,
+                max_workers=max_workers,
+                store=store,
+            )
+        )
+
+
+ASSIGNMENT_FIELDNAMES = [
+    "PermissionSetName",
+    "PermissionSetArn",
+    "ManagedPolicies",
+    "InlinePolicy",
+    "PrincipalType",
+    "PrincipalName",
+    "AccountId",
+]
+
+
+class CsvRowWriter:
+    """CSV file written row by row as results arrive.
+
+    The header is written on open, so a file exists even when no row matches,
+    and the buffer is flushed every ``flush_every`` rows so partial results
+    are on disk if the run dies. With ``append``, rows are added to an
+    existing file and the header is only written if the file is empty.
+    """
+
+    def __init__(self, filename, fieldnames=ASSIGNMENT_FIELDNAMES, flush_every=100, append=False):
+        self.filename = filename
+        self.flush_every = flush_every
+        self.rows_written = 0
+        has_rows = append and os.path.exists(filename) and os.path.getsize(filename) > 0
+        self._file = open(filename, "a" if has_rows else "w", newline="")
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames)
+        if not has_rows:
+            self._writer.writeheader()
+            self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, row):
+        with phase("write"):
+            self._writer.writerow(row)
+            self.rows_written += 1
+            if self.rows_written % self.flush_every == 0:
+                self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
 def write_to_csv(filename, rows):
-    """Write the collected assignment details into a CSV file."""
-    fieldnames = [
-        "PermissionSetName",
-        "PermissionSetArn",
-        "ManagedPolicies",
-        "InlinePolicy",
-        "PrincipalType",
-        "PrincipalName",
-        "AccountId",
-    ]
-    with open(filename, "w", newline="") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        if rows:
-            writer.writerows(rows)
+    """Write the collected assignment details into a CSV file.
+
+    ``rows`` may be any iterable (e.g. a collector generator); rows are
+    written as they are produced.
+    """
+    with CsvRowWriter(filename) as writer:
+        for row in rows or ():
+            writer.write(row)
+
+
+# Normalized output: slim assignment rows referencing a shared policies.csv
+NORMALIZED_FLAG = "--normalized"
+POLICY_TABLE_FILENAME = "policies.csv"
+POLICY_TABLE_FIELDNAMES = ["PolicyHash", "ManagedPolicies", "InlinePolicy"]
+NORMALIZED_FIELDNAMES = [
+    "PermissionSetName",
+    "PermissionSetArn",
+    "PolicyHash",
+    "PrincipalType",
+    "PrincipalName",
+    "AccountId",
+]
+
+
+def pop_normalized_flag(argv=None):
+    """Remove --normalized from argv (sys.argv by default) and return whether it was there."""
+    argv = sys.argv if argv is None else argv
+    found = NORMALIZED_FLAG in argv[1:]
+    argv[1:] = [arg for arg in argv[1:] if arg != NORMALIZED_FLAG]
+    return found
+
+
+def policy_content_hash(managed_policies, inline_policy):
+    """Return a stable hash of a permission set's managed policy list and inline policy text."""
+    content = json.dumps([managed_policies, inline_policy], separators=(",", ":"))
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class PolicyTableWriter(CsvRowWriter):
+    """policies.csv (policy hash -> managed policies and inline policy), one row per distinct content.
+
+    ``normalize`` records a full assignment row's policy content once and
+    returns the slim row that references it by hash. An existing table is
+    appended to, skipping hashes it already holds, so the runs of several
+    scripts can share it without invalidating each other's hashes.
+    """
+
+    def __init__(self, filename=POLICY_TABLE_FILENAME, flush_every=100):
+        self._seen = set()
+        if os.path.exists(filename):
+            with open(filename, newline="") as f:
+                self._seen.update(row["PolicyHash"] for row in csv.DictReader(f))
+        super().__init__(filename, POLICY_TABLE_FIELDNAMES, flush_every, append=True)
+        self._hash_by_permission_set = {}  # content is hashed once per permission set
+
+    def normalize(self, row):
+        policy_hash = self._hash_by_permission_set.get(row["PermissionSetArn"])
+        if policy_hash is None:
+            policy_hash = policy_content_hash(row["ManagedPolicies"], row["InlinePolicy"])
+            self._hash_by_permission_set[row["PermissionSetArn"]] = policy_hash
+        if policy_hash not in self._seen:
+            self._seen.add(policy_hash)
+            self.write({
+                "PolicyHash": policy_hash,
+                "ManagedPolicies": row["ManagedPolicies"],
+                "InlinePolicy": row["InlinePolicy"],
+            })
+        return {
+            field: policy_hash if field == "PolicyHash" else row[field]
+            for field in NORMALIZED_FIELDNAMES
+        }
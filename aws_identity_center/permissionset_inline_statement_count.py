@@ -1,47 +1,11 @@
-import boto3
 import json
 import os
 import csv
 from datetime import datetime
 
-
-def list_permission_sets(sso_client, instance_arn):
-    permission_sets = []
-    next_token = None
-
-    while True:
-        if next_token:
-            response = sso_client.list_permission_sets(
-                InstanceArn=instance_arn,
-                NextToken=next_token
-            )
-        else:
-            response = sso_client.list_permission_sets(
-                InstanceArn=instance_arn
-            )
-
-        permission_sets.extend(response.get("PermissionSets", []))
-        next_token = response.get("NextToken")
-        if not next_token:
-            break
-
-    return permission_sets
-
-
-def get_permission_set_name(sso_client, instance_arn, permission_set_arn):
-    response = sso_client.describe_permission_set(
-        InstanceArn=instance_arn,
-        PermissionSetArn=permission_set_arn,
-    )
-    return response["PermissionSet"]["Name"]
-
-
-def get_inline_policy(sso_client, instance_arn, permission_set_arn):
-    response = sso_client.get_inline_policy_for_permission_set(
-        InstanceArn=instance_arn,
-        PermissionSetArn=permission_set_arn,
-    )
-    return response.get("InlinePolicy")
+from permission_set_utils import get_instance_arn, load_permission_set_snapshot
+from profiling import phase, run_with_profiling
+from snapshot_store import open_snapshot_store
 
 
 def calculate_comparisons(statement_count):
@@ -57,20 +21,21 @@ def main():
     os.makedirs(output_dir, exist_ok=True)
     output_filename = os.path.join(output_dir, f"inline_policy_statements_count_{today}.csv")
 
-    sso_client = boto3.client("sso-admin")
-    instance_arn = sso_client.list_instances()["Instances"][0]["InstanceArn"]
+    # With a fresh stored snapshot, no AWS call is made (not even list_instances)
+    store = open_snapshot_store()
+    instance_arn = get_instance_arn(store=store)
 
-    permission_sets = list_permission_sets(sso_client, instance_arn)
+    snapshot = load_permission_set_snapshot(instance_arn, store=store)
     print(f"[+] Using Instance ARN: {instance_arn}")
-    print(f"[+] Found {len(permission_sets)} permission sets.\n")
+    print(f"[+] Found {len(snapshot)} permission sets.\n")
 
     total_statements = 0
     total_comparisons = 0
     detailed_counts = []
 
-    for permission_set_arn in permission_sets:
-        permission_set_name = get_permission_set_name(sso_client, instance_arn, permission_set_arn)
-        inline_policy = get_inline_policy(sso_client, instance_arn, permission_set_arn)
+    for permission_set in snapshot:
+        permission_set_name = permission_set.name
+        inline_policy = permission_set.inline_policy
 
         statement_count = 0
 
@@ -100,7 +65,7 @@ def main():
     print(f"✅ Total comparisons needed manually: {total_comparisons}")
 
     # Save to CSV
-    with open(output_filename, "w", newline="") as csvfile:
+    with phase("write"), open(output_filename, "w", newline="") as csvfile:
         fieldnames = ["PermissionSetName", "StatementCount", "ComparisonCount"]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
@@ -110,4 +75,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    run_with_profiling(main, "permissionset_inline_statement_count")
@@ -0,0 +1,110 @@
+import hashlib
+import json
+
+# IAM evaluates a policy without a Version element as the original 2008 language
+DEFAULT_POLICY_VERSION = "2008-10-17"
+
+ACTION_KEYS = ("Action", "NotAction")
+RESOURCE_KEYS = ("Resource", "NotResource")
+PRINCIPAL_KEYS = ("Principal", "NotPrincipal")
+
+
+def _value_to_str(value):
+    """Render a JSON scalar the way IAM compares it (true/false, not True/False)."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _sorted_values(value, lower=False):
+    """Wrap a singleton in a list, drop duplicates and sort."""
+    values = value if isinstance(value, list) else [value]
+    values = {_value_to_str(v) for v in values}
+    if lower:
+        values = {v.lower() for v in values}
+    return sorted(values)
+
+
+def canonicalize_condition(condition):
+    """Return a Condition block with lowercased, sorted operators and keys and sorted value lists.
+
+    Condition operators and keys are case-insensitive in IAM; values are not.
+    """
+    merged = {}
+    for operator, block in condition.items():
+        merged_block = merged.setdefault(operator.lower(), {})
+        for key, values in block.items():
+            merged_block[key.lower()] = values
+    return {
+        operator: {key: _sorted_values(values) for key, values in sorted(block.items())}
+        for operator, block in sorted(merged.items())
+    }
+
+
+def freeze_condition(condition):
+    """Return a hashable form of a Condition block.
+
+    The result is a frozenset of (operator, key, frozenset of values) with the
+    operator and key lowercased, so it can be compared and used as a cache key.
+    """
+    if not condition:
+        return frozenset()
+    return frozenset(
+        (operator.lower(), key.lower(), frozenset(_sorted_values(values)))
+        for operator, block in condition.items()
+        for key, values in block.items()
+    )
+
+
+def canonicalize_principal(principal):
+    """Return a Principal block with every principal list sorted."""
+    if isinstance(principal, dict):
+        return {kind: _sorted_values(values) for kind, values in sorted(principal.items())}
+    return principal
+
+
+def canonicalize_statement(statement):
+    """Return an order-insensitive, normalized copy of a policy statement.
+
+    Actions are lowercased (IAM action names are case-insensitive), every
+    Action/Resource/Principal/Condition value becomes a sorted list, and the Sid
+    is dropped since it does not change what the statement grants.
+    """
+    canonical = {}
+    for key, value in statement.items():
+        if key == "Sid":
+            continue
+        if key in ACTION_KEYS:
+            canonical[key] = _sorted_values(value, lower=True)
+        elif key in RESOURCE_KEYS:
+            canonical[key] = _sorted_values(value)
+        elif key in PRINCIPAL_KEYS:
+            canonical[key] = canonicalize_principal(value)
+        elif key == "Condition" and isinstance(value, dict):
+            canonical[key] = canonicalize_condition(value)
+        else:
+            canonical[key] = value
+    return canonical
+
+
+def statement_fingerprint(statement):
+    """Return a stable hash of the canonical form of a statement."""
+    canonical_json = json.dumps(
+        canonicalize_statement(statement), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha256(canonical_json.encode("utf-8")).hexdigest()
+
+
+def normalize_policy_version(version):
+    """Return the policy language version, defaulting to 2008-10-17 when it is missing."""
+    return str(version).strip() if version else DEFAULT_POLICY_VERSION
+
+
+def policy_fingerprint(statement_fingerprints, version=None):
+    """Return a hash of a whole policy that ignores statement order and repeats.
+
+    The Version is part of the hash: it changes how ${...} policy variables
+    are read, so the same statements under 2008-10-17 and 2012-10-17 differ.
+    """
+    joined = "\n".join([normalize_policy_version(version)] + sorted(set(statement_fingerprints)))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()
@@ -0,0 +1,116 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Stripped from sys.argv before a script parses its own arguments.
+PROFILE_FLAG = "--profile"  # phase timings
+CPROFILE_FLAG = "--cprofile"  # phase timings + cProfile hot-function report
+CPROFILE_TOP_FUNCTIONS = 40
+
+
+class PhaseTimer:
+    """Accumulated wall time per named phase (enumerate, fetch policies, analyze, ...).
+
+    Phases may repeat (time is summed) and may nest, in which case the outer
+    phase includes the inner one.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+                self.calls[name] = self.calls.get(name, 0) + 1
+
+    def format_table(self):
+        total = time.perf_counter() - self._started
+        width = max([len("total")] + [len(name) for name in self.seconds])
+        lines = [f"{'phase'.ljust(width)}  {'seconds':>10}  {'share':>6}  calls"]
+        for name, seconds in self.seconds.items():
+            share = seconds / total * 100 if total else 0.0
+            lines.append(
+                f"{name.ljust(width)}  {seconds:>10.3f}  {share:>5.1f}%  {self.calls[name]}"
+            )
+        lines.append(f"{'total'.ljust(width)}  {total:>10.3f}  {100.0:>5.1f}%  1")
+        return "\n".join(lines)
+
+
+_active_timer = None
+
+
+@contextmanager
+def phase(name):
+    """Time a block as ``name`` when the script runs with --profile; a no-op otherwise."""
+    if _active_timer is None:
+        yield
+        return
+    with _active_timer.phase(name):
+        yield
+
+
+def _pop_flags(argv):
+    flags = {arg for arg in argv[1:] if arg in (PROFILE_FLAG, CPROFILE_FLAG)}
+    argv[1:] = [arg for arg in argv[1:] if arg not in (PROFILE_FLAG, CPROFILE_FLAG)]
+    return flags
+
+
+def write_profile_report(script_name, timer, profiler=None, output_dir="outputs"):
+    """Write the phase table (and cProfile stats) to outputs/; returns the report path."""
+    today = datetime.today().strftime("%Y-%m-%d")
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, f"{script_name}_profile_{today}.txt")
+
+    sections = ["Phase timings", timer.format_table()]
+    if profiler is not None:
+        profiler.dump_stats(os.path.join(output_dir, f"{script_name}_{today}.prof"))
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(CPROFILE_TOP_FUNCTIONS)
+        sections += ["", "Hot functions (cumulative time)", stream.getvalue()]
+
+    with open(report_path, "w") as f:
+        f.write("\n".join(sections) + "\n")
+    return report_path
+
+
+def run_with_profiling(main, script_name, argv=None):
+    """Run a script's main(), honouring --profile / --cprofile on the command line.
+
+    The flags are removed from argv first, so the script's own argument
+    parsing is unchanged. Without them main() runs as before.
+    """
+    global _active_timer
+    argv = sys.argv if argv is None else argv
+    flags = _pop_flags(argv)
+    if not flags:
+        return main()
+
+    _active_timer = timer = PhaseTimer()
+    profiler = cProfile.Profile() if CPROFILE_FLAG in flags else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        return main()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        _active_timer = None
+        report_path = write_profile_report(script_name, timer, profiler)
+        print(f"\n[*] Phase timings:\n{timer.format_table()}")
+        print(f"[+] Profile report saved to {report_path}")
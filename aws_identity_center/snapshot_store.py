@@ -0,0 +1,300 @@
+import os
+import sqlite3
+import threading
+import time
+
+from permission_set_utils import PermissionSetDetails, PermissionSetSnapshot
+
+# The store is opt-in: scripts only read/write it when a TTL is configured.
+SNAPSHOT_DB_ENV = "IDENTITY_CENTER_SNAPSHOT_DB"
+SNAPSHOT_TTL_ENV = "IDENTITY_CENTER_SNAPSHOT_TTL"
+DEFAULT_DB_PATH = os.path.join("outputs", "identity_center_snapshot.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_arn TEXT PRIMARY KEY,
+    identity_store_id TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    section TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (section, scope)
+);
+CREATE TABLE IF NOT EXISTS permission_sets (
+    instance_arn TEXT NOT NULL,
+    arn TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (instance_arn, arn)
+);
+CREATE TABLE IF NOT EXISTS inline_policies (
+    instance_arn TEXT NOT NULL,
+    permission_set_arn TEXT NOT NULL,
+    policy TEXT,
+    PRIMARY KEY (instance_arn, permission_set_arn)
+);
+CREATE TABLE IF NOT EXISTS managed_policies (
+    instance_arn TEXT NOT NULL,
+    permission_set_arn TEXT NOT NULL,
+    name TEXT,
+    arn TEXT
+);
+CREATE TABLE IF NOT EXISTS account_assignments (
+    instance_arn TEXT NOT NULL,
+    permission_set_arn TEXT NOT NULL,
+    account_id TEXT NOT NULL,
+    principal_type TEXT NOT NULL,
+    principal_id TEXT NOT NULL,
+    principal_name TEXT
+);
+CREATE TABLE IF NOT EXISTS principals (
+    identity_store_id TEXT NOT NULL,
+    principal_id TEXT NOT NULL,
+    name TEXT,
+    PRIMARY KEY (identity_store_id, principal_id)
+);
+CREATE INDEX IF NOT EXISTS managed_policies_by_ps
+    ON managed_policies (instance_arn, permission_set_arn);
+CREATE INDEX IF NOT EXISTS account_assignments_by_ps
+    ON account_assignments (instance_arn, permission_set_arn);
+"""
+
+PERMISSION_SET_SECTIONS = ("permission_sets", "inline_policies", "managed_policies")
+
+
+class SnapshotStore:
+    """Local SQLite copy of Identity Center state, with a fetched-at time per section.
+
+    Every ``load_*`` method returns None when the section is missing or older
+    than ``ttl_seconds``, in which case the caller fetches from AWS and saves.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, ttl_seconds=0):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def is_fresh(self, section, scope):
+        """Return True if the section was fetched less than ttl_seconds ago."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at FROM sections WHERE section = ? AND scope = ?",
+                (section, scope),
+            ).fetchone()
+        return row is not None and time.time() - row[0] < self.ttl_seconds
+
+    def _mark_fetched(self, section, scope):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sections (section, scope, fetched_at) VALUES (?, ?, ?)",
+            (section, scope, time.time()),
+        )
+
+    def load_identity_store_id(self, instance_arn):
+        """Return the stored IdentityStoreId of an instance, or None if stale."""
+        if not self.is_fresh("instances", instance_arn):
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT identity_store_id FROM instances WHERE instance_arn = ?",
+                (instance_arn,),
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_identity_store_id(self, instance_arn, identity_store_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO instances (instance_arn, identity_store_id) "
+                "VALUES (?, ?)",
+                (instance_arn, identity_store_id),
+            )
+            self._mark_fetched("instances", instance_arn)
+
+    def load_instance_arn(self):
+        """Return the instance ARN of the most recent fresh permission set snapshot, or None."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT scope FROM sections WHERE section = 'permission_sets' "
+                "ORDER BY fetched_at DESC"
+            ).fetchall()
+        for (instance_arn,) in rows:
+            if all(self.is_fresh(s, instance_arn) for s in PERMISSION_SET_SECTIONS):
+                return instance_arn
+        return None
+
+    def load_permission_set_snapshot(self, instance_arn):
+        """Return the stored PermissionSetSnapshot for an instance, or None if stale."""
+        if not all(self.is_fresh(s, instance_arn) for s in PERMISSION_SET_SECTIONS):
+            return None
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT p.arn, p.name, i.policy FROM permission_sets p "
+                "LEFT JOIN inline_policies i "
+                "ON i.instance_arn = p.instance_arn AND i.permission_set_arn = p.arn "
+                "WHERE p.instance_arn = ? ORDER BY p.position",
+                (instance_arn,),
+            ).fetchall()
+            managed_rows = self._conn.execute(
+                "SELECT permission_set_arn, name, arn FROM managed_policies "
+                "WHERE instance_arn = ? ORDER BY rowid",
+                (instance_arn,),
+            ).fetchall()
+
+        managed_by_ps = {}
+        for permission_set_arn, name, arn in managed_rows:
+            managed_by_ps.setdefault(permission_set_arn, []).append(
+                {"Name": name, "Arn": arn}
+            )
+
+        return PermissionSetSnapshot(
+            instance_arn=instance_arn,
+            permission_sets=[
+                PermissionSetDetails(
+                    arn=arn,
+                    name=name,
+                    inline_policy=policy,
+                    managed_policies=managed_by_ps.get(arn, []),
+                )
+                for arn, name, policy in rows
+            ],
+        )
+
+    def save_permission_set_snapshot(self, snapshot):
+        """Replace the stored permission sets, inline and managed policies of an instance."""
+        instance_arn = snapshot.instance_arn
+        with self._lock, self._conn:
+            for table in PERMISSION_SET_SECTIONS:
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE instance_arn = ?", (instance_arn,)
+                )
+            self._conn.executemany(
+                "INSERT INTO permission_sets (instance_arn, arn, name, position) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (instance_arn, ps.arn, ps.name, position)
+                    for position, ps in enumerate(snapshot)
+                ],
+            )
+            self._conn.executemany(
+                "INSERT INTO inline_policies (instance_arn, permission_set_arn, policy) "
+                "VALUES (?, ?, ?)",
+                [(instance_arn, ps.arn, ps.inline_policy) for ps in snapshot],
+            )
+            self._conn.executemany(
+                "INSERT INTO managed_policies (instance_arn, permission_set_arn, name, arn) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (instance_arn, ps.arn, policy.get("Name"), policy.get("Arn"))
+                    for ps in snapshot
+                    for policy in ps.managed_policies
+                ],
+            )
+            for section in PERMISSION_SET_SECTIONS:
+                self._mark_fetched(section, instance_arn)
+
+    def load_assignments(self, instance_arn, permission_set_arn):
+        """Return the stored assignments of a permission set, or None if stale."""
+        if not self.is_fresh("account_assignments", permission_set_arn):
+            return None
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT account_id, principal_type, principal_id, principal_name "
+                "FROM account_assignments "
+                "WHERE instance_arn = ? AND permission_set_arn = ? ORDER BY rowid",
+                (instance_arn, permission_set_arn),
+            ).fetchall()
+
+        return [
+            {
+                "AccountId": account_id,
+                "PermissionSetArn": permission_set_arn,
+                "PrincipalType": principal_type,
+                "PrincipalId": principal_id,
+                "PrincipalName": principal_name,
+            }
+            for account_id, principal_type, principal_id, principal_name in rows
+        ]
+
+    def save_assignments(self, instance_arn, permission_set_arn, assignments):
+        """Replace the stored assignments of a permission set."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM account_assignments "
+                "WHERE instance_arn = ? AND permission_set_arn = ?",
+                (instance_arn, permission_set_arn),
+            )
+            self._conn.executemany(
+                "INSERT INTO account_assignments (instance_arn, permission_set_arn, "
+                "account_id, principal_type, principal_id, principal_name) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        instance_arn,
+                        permission_set_arn,
+                        a["AccountId"],
+                        a["PrincipalType"],
+                        a["PrincipalId"],
+                        a.get("PrincipalName"),
+                    )
+                    for a in assignments
+                ],
+            )
+            self._mark_fetched("account_assignments", permission_set_arn)
+
+    def load_principals(self, identity_store_id):
+        """Return the stored principal ID -> name index, or None if stale."""
+        if not self.is_fresh("principals", identity_store_id):
+            return None
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT principal_id, name FROM principals WHERE identity_store_id = ?",
+                (identity_store_id,),
+            ).fetchall()
+        return dict(rows)
+
+    def save_principals(self, identity_store_id, names):
+        """Replace the stored principal index of an identity store."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM principals WHERE identity_store_id = ?",
+                (identity_store_id,),
+            )
+            self._conn.executemany(
+                "INSERT INTO principals (identity_store_id, principal_id, name) "
+                "VALUES (?, ?, ?)",
+                [(identity_store_id, pid, name) for pid, name in names.items()],
+            )
+            self._mark_fetched("principals", identity_store_id)
+
+
+def open_snapshot_store(path=None, ttl_seconds=None):
+    """Open the snapshot store configured through the environment.
+
+    Returns None (caching disabled) unless a positive TTL is passed or set in
+    IDENTITY_CENTER_SNAPSHOT_TTL; the database path defaults to
+    IDENTITY_CENTER_SNAPSHOT_DB or outputs/identity_center_snapshot.sqlite.
+    """
+    if ttl_seconds is None:
+        try:
+            ttl_seconds = float(os.environ.get(SNAPSHOT_TTL_ENV, 0))
+        except ValueError:
+            print(f"[!] Ignoring invalid {SNAPSHOT_TTL_ENV} value")
+            ttl_seconds = 0
+
+    if ttl_seconds <= 0:
+        return None
+
+    path = path or os.environ.get(SNAPSHOT_DB_ENV) or DEFAULT_DB_PATH
+    return SnapshotStore(path, ttl_seconds)
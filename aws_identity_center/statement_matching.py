@@ -0,0 +1,201 @@
+import json
+from functools import lru_cache
+
+from iam_action_catalog import default_catalog
+from iam_patterns import (
+    action_pattern_covers,
+    compile_resource_pattern,
+    resource_pattern_trie,
+)
+from policy_canonical import freeze_condition
+
+
+def action_includes(action1, action2):
+    """Return True if action1 covers action2 (IAM globs: '*' and '?' anywhere, case-insensitive).
+
+    Examples: s3:* covers s3:GetObject, s3:Get* covers s3:GetObjectAcl and
+    ec2:Describe* covers ec2:DescribeInstance?, but s3:GetObject does not cover s3:*.
+    """
+    return action_pattern_covers(action1, action2)
+
+
+def actions_cover_each_other(actions1, actions2):
+    """Return True if every action in actions2 is covered by some action in actions1.
+
+    Literal actions are compared as bitsets over the IAM action catalog;
+    wildcards in actions2 must be covered by a wildcard in actions1.
+    """
+    set1, set2 = default_catalog().action_sets(actions1, actions2)
+    return set1.covers(set2)
+
+
+def resource_covers(resource1, resource2):
+    """Return True if every resource in resource2 is covered by a pattern in resource1.
+
+    ARNs are matched segment by segment with '*' and '?' globs, e.g.
+    arn:aws:s3:::logs-* covers arn:aws:s3:::logs-prod/*.
+    """
+    if resource1 == "*":
+        return True
+
+    if isinstance(resource1, str):
+        resource1 = [resource1]
+    if isinstance(resource2, str):
+        resource2 = [resource2]
+    if not isinstance(resource1, list) or not isinstance(resource2, list):
+        return False
+
+    trie = resource_pattern_trie(tuple(resource1))
+    return all(trie.covers(r2) for r2 in resource2)
+
+
+# Operators whose values are globs, and the operators they can cover
+GLOB_OPERATORS = {
+    "stringlike": ("stringequals", "stringlike"),
+    "arnlike": ("arnequals", "arnlike"),
+    "arnequals": ("arnequals", "arnlike"),
+}
+
+
+def _split_operator(operator):
+    """Split 'ForAnyValue:StringLikeIfExists' into ('foranyvalue:', 'stringlike', 'ifexists')."""
+    prefix, _, base = operator.rpartition(":")
+    prefix = f"{prefix}:" if prefix else ""
+    suffix = ""
+    if base.endswith("ifexists"):
+        base, suffix = base[: -len("ifexists")], "ifexists"
+    return prefix, base, suffix
+
+
+@lru_cache(maxsize=65536)
+def constraint_covers(constraint1, constraint2):
+    """Return True if condition constraint1 is implied by constraint2.
+
+    Each constraint is an (operator, key, frozenset of values) tuple from
+    ``freeze_condition``. The key must match; then constraint2 must allow a
+    subset of constraint1's values (a superset for negated operators), and
+    StringLike/ArnLike globs may cover the values of a StringEquals/ArnEquals.
+    """
+    if constraint1 == constraint2:
+        return True
+
+    operator1, key1, values1 = constraint1
+    operator2, key2, values2 = constraint2
+    if key1 != key2:
+        return False
+
+    prefix1, base1, suffix1 = _split_operator(operator1)
+    prefix2, base2, suffix2 = _split_operator(operator2)
+    if prefix1 != prefix2 or suffix1 != suffix2:
+        return False
+
+    if base1 in GLOB_OPERATORS and base2 in GLOB_OPERATORS[base1]:
+        return all(
+            any(compile_resource_pattern(v1).fullmatch(v2) for v1 in values1)
+            for v2 in values2
+        )
+
+    if base1 != base2:
+        return False
+    if "not" in base1:
+        return values1 <= values2  # excluding fewer values is wider
+    return values2 <= values1
+
+
+@lru_cache(maxsize=65536)
+def frozen_condition_covers(frozen1, frozen2):
+    """Return True if every constraint of frozen1 is implied by some constraint of frozen2."""
+    return all(
+        any(constraint_covers(c1, c2) for c2 in frozen2)
+        for c1 in frozen1
+    )
+
+
+def condition_covers(cond1, cond2):
+    """
+    Check if cond1 is equal to or more permissive (covers) cond2.
+    - If cond1 is None: cond1 covers cond2 (less restrictive)
+    - If cond2 is None and cond1 exists: cond1 does NOT cover cond2 (more restrictive)
+    - If both exist: each constraint of cond1 must be implied by one of cond2,
+      comparing lowercased operators/keys and value sets (see constraint_covers)
+    """
+    if not cond1:
+        return True
+    if not cond2:
+        return False
+
+    return frozen_condition_covers(freeze_condition(cond1), freeze_condition(cond2))
+
+
+def extract_action_or_notaction(statement):
+    """Return tuple (key_type, actions), where key_type is 'Action' or 'NotAction'."""
+    if "Action" in statement:
+        return "Action", statement.get("Action")
+    elif "NotAction" in statement:
+        return "NotAction", statement.get("NotAction")
+    else:
+        return None, None
+
+
+def statement_covers(s1, s2):
+    """Return True if statement s1 covers statement s2 (same effect, wider or equal scope)."""
+    if s1.get("Effect") != s2.get("Effect"):
+        return False
+
+    key1, actions1 = extract_action_or_notaction(s1)
+    key2, actions2 = extract_action_or_notaction(s2)
+
+    if key1 is None or key2 is None or key1 != key2:
+        return False  # Cannot match Action with NotAction
+
+    if key1 == "NotAction":
+        # A NotAction statement is wider when it excludes fewer actions
+        actions_ok = actions_cover_each_other(actions2, actions1)
+    else:
+        actions_ok = actions_cover_each_other(actions1, actions2)
+
+    return (
+        actions_ok
+        and resource_covers(s1.get("Resource"), s2.get("Resource"))
+        and condition_covers(s1.get("Condition"), s2.get("Condition"))
+    )
+
+
+def statements_match(s1, s2):
+    try:
+        if s1.get("Effect") != s2.get("Effect"):
+            return False
+
+        key1, _ = extract_action_or_notaction(s1)
+        key2, _ = extract_action_or_notaction(s2)
+
+        if key1 is None or key2 is None:
+            print(f"[!] Warning: One of the statements is missing both Action and NotAction. Skipping.")
+            return False
+
+        # Either statement covers the other
+        return statement_covers(s1, s2) or statement_covers(s2, s1)
+
+    except Exception as e:
+        print("\n⚠️ Error while matching two statements!")
+        print(f"Statement 1: {json.dumps(s1, indent=2)}")
+        print(f"Statement 2: {json.dumps(s2, indent=2)}")
+        raise e
+
+
+def statement_services(actions):
+    """Return the set of service prefixes used by an Action/NotAction value.
+
+    Returns None when the value can match any service ("*", or a wildcard in
+    the service prefix), so the statement must be compared with everything.
+    """
+    if not isinstance(actions, list):
+        actions = [actions]
+
+    services = set()
+    for action in actions:
+        service = action.split(":", 1)[0].lower()
+        if "*" in service or "?" in service:
+            return None
+        services.add(service)
+    return frozenset(services)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# The scripts import their siblings as top-level modules (they are meant to be
+# run from inside aws_identity_center/), so expose that directory to the tests.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aws_clients import clear_client_cache  # noqa: E402
+from credential_cache import clear_credential_cache  # noqa: E402
+import permission_set_utils  # noqa: E402
+from aws_identity_center import permission_set_utils as package_permission_set_utils  # noqa: E402
+
+
+def clear_identity_store_ids():
+    # Tests import the package module while the scripts import the top-level
+    # one, so each holds its own IdentityStoreId cache.
+    permission_set_utils.clear_identity_store_ids()
+    package_permission_set_utils.clear_identity_store_ids()
+
+
+@pytest.fixture(autouse=True)
+def fresh_aws_clients():
+    """Make sure no client (or mocked client), cached credential or identity store ID leaks from one test into another."""
+    clear_client_cache()
+    clear_credential_cache()
+    clear_identity_store_ids()
+    yield
+    clear_client_cache()
+    clear_credential_cache()
+    clear_identity_store_ids()
@@ -0,0 +1,93 @@
+import json
+
+import boto3
+import pytest
+from botocore.config import Config
+from botocore.exceptions import EndpointConnectionError
+from moto import mock_aws
+
+from aws_identity_center import api_metrics
+from aws_identity_center.api_metrics import ApiCallMetrics, percentile
+
+
+def test_percentile_nearest_rank():
+    values = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    assert percentile(values, 0.5) == 0.5
+    assert percentile(values, 0.9) == 0.9
+    assert percentile(values, 0.99) == 1.0
+    assert percentile([], 0.5) == 0.0
+
+
+@mock_aws
+def test_instrumented_client_records_calls_per_operation(tmp_path):
+    metrics = ApiCallMetrics()
+    client = metrics.instrument(boto3.client("iam", region_name="us-east-1"))
+
+    client.create_user(UserName="alice")
+    for _ in range(3):
+        client.list_users()
+    try:
+        client.get_user(UserName="missing")
+    except client.exceptions.NoSuchEntityException:
+        pass
+
+    rows = {(row["Service"], row["Operation"]): row for row in metrics.summary()}
+    assert rows[("iam", "ListUsers")]["Calls"] == 3
+    assert rows[("iam", "CreateUser")]["Calls"] == 1
+    assert rows[("iam", "GetUser")]["Errors"] == 1
+    assert metrics.summary()[0]["Operation"] == "ListUsers"  # sorted by call count
+
+    assert "ListUsers" in metrics.format_table()
+    output = tmp_path / "api_calls.json"
+    metrics.write_json(str(output))
+    assert json.loads(output.read_text())[0]["Calls"] == 3
+
+
+def test_needs_retry_counts_throttled_attempts():
+    metrics = ApiCallMetrics()
+    context = {}
+    metrics.before_call(context=context)
+    throttled = (None, {"Error": {"Code": "ThrottlingException"}})
+    metrics.needs_retry(response=throttled, request_dict={"context": context})
+    metrics.needs_retry(response=throttled, request_dict={"context": context})
+
+    class Model:
+        name = "ListAccountAssignments"
+
+        class service_model:
+            service_name = "sso-admin"
+
+    metrics.after_call(
+        model=Model, parsed={"ResponseMetadata": {"RetryAttempts": 2}}, context=context
+    )
+
+    (row,) = metrics.summary()
+    assert (row["Calls"], row["Retries"], row["Throttles"], row["Errors"]) == (1, 2, 2, 0)
+
+
+def test_connection_errors_are_counted():
+    metrics = ApiCallMetrics()
+    client = metrics.instrument(boto3.client(
+        "iam",
+        region_name="us-east-1",
+        endpoint_url="http://127.0.0.1:9",  # nothing listens on the discard port
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        config=Config(retries={"total_max_attempts": 1}, connect_timeout=1),
+    ))
+
+    with pytest.raises(EndpointConnectionError):
+        client.list_users()
+
+    (row,) = metrics.summary()
+    assert (row["Service"], row["Operation"], row["Calls"], row["Errors"]) == ("iam", "ListUsers", 1, 1)
+
+
+def test_metrics_are_disabled_unless_requested(monkeypatch):
+    monkeypatch.delenv(api_metrics.API_METRICS_ENV, raising=False)
+    monkeypatch.setattr(api_metrics, "_configured", False)
+    monkeypatch.setattr(api_metrics, "_metrics", None)
+
+    client = object()
+    assert api_metrics.instrument_client(client) is client
+    assert api_metrics.get_api_metrics() is None
@@ -0,0 +1,46 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from aws_identity_center.aws_clients import DEFAULT_MAX_WORKERS, get_client
+
+
+@patch("boto3.client")
+def test_get_client_is_cached_per_service_and_region(mock_boto_client):
+    mock_boto_client.side_effect = lambda *args, **kwargs: object()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        clients = list(executor.map(lambda _: get_client("sso-admin"), range(50)))
+
+    assert len({id(client) for client in clients}) == 1
+    assert get_client("identitystore") is not clients[0]
+    assert get_client("sso-admin", region="eu-west-1") is not clients[0]
+    assert mock_boto_client.call_count == 3
+
+    config = mock_boto_client.call_args.kwargs["config"]
+    assert config.max_pool_connections == DEFAULT_MAX_WORKERS
+    assert config.retries["mode"] == "adaptive"
+
+
+@patch("boto3.Session")
+def test_get_client_reuses_profile_sessions(mock_session):
+    iam_client = get_client("iam", profile="dev")
+    get_client("sts", profile="dev")
+
+    assert get_client("iam", profile="dev") is iam_client
+    assert mock_session.return_value.client.call_count == 2
+    mock_session.assert_called_once_with(profile_name="dev")
+
+
+@patch("boto3.client")
+def test_get_client_sizes_the_pool_for_the_workers(mock_boto_client):
+    mock_boto_client.side_effect = lambda *args, **kwargs: object()
+
+    default = get_client("sts")
+    wide = get_client("sts", max_workers=64)
+
+    assert wide is not default
+    assert mock_boto_client.call_args.kwargs["config"].max_pool_connections == 64
+    # fewer workers share the larger pool instead of shrinking it
+    assert get_client("sts") is wide
+    assert get_client("sts", max_workers=32) is wide
+    assert mock_boto_client.call_count == 2
@@ -0,0 +1,60 @@
+import json
+
+from aws_identity_center import benchmark_policy_analysis
+from aws_identity_center.benchmark_policy_analysis import (
+    ANALYZERS,
+    SyntheticInstanceGenerator,
+    clear_analysis_caches,
+    run_benchmarks,
+    sample_statement_pairs,
+    save_report,
+)
+
+
+def test_generator_is_deterministic_for_a_seed():
+    first = SyntheticInstanceGenerator(seed=7, shared_ratio=0.5).instance(5, 10)
+    second = SyntheticInstanceGenerator(seed=7, shared_ratio=0.5).instance(5, 10)
+
+    assert first == second
+    assert len(first) == 5
+    assert all(len(json.loads(p)["Statement"]) == 10 for p in first.values())
+
+
+def test_run_benchmarks_writes_json_and_csv_report(tmp_path):
+    rows = run_benchmarks([3, 6], 5, wildcard_ratio=0.5, shared_ratio=0.5, repeat=1)
+
+    assert {row["Analyzer"] for row in rows} == set(ANALYZERS)
+    assert {row["PermissionSets"] for row in rows} == {3, 6}
+
+    json_path, csv_path = save_report(rows, output_dir=str(tmp_path))
+    with open(json_path) as f:
+        assert json.load(f) == rows
+    with open(csv_path) as f:
+        assert f.readline().startswith("Analyzer,PermissionSets")
+
+
+def test_statement_pairs_grow_with_the_instance():
+    statements = [{"Sid": str(i)} for i in range(50)]
+
+    assert len(sample_statement_pairs(statements[:10], 100)) == 100
+    assert len(sample_statement_pairs(statements, 500)) == 500
+    assert sample_statement_pairs(statements, 20, seed=1) == sample_statement_pairs(statements, 20, seed=1)
+    assert all(s1 is not s2 for s1, s2 in sample_statement_pairs(statements, 200))
+    assert sample_statement_pairs(statements[:1], 10) == []
+
+
+def test_clear_analysis_caches_starts_runs_cold():
+    # the benchmark uses the top-level modules, as the scripts do
+    import iam_action_catalog
+
+    statement = {"Effect": "Allow", "Action": "s3:Get*", "Resource": "*"}
+    benchmark_policy_analysis.statements_match(statement, dict(statement, Sid="copy"))
+    catalog = iam_action_catalog.default_catalog()
+    assert benchmark_policy_analysis.compile_action_pattern.cache_info().currsize > 0
+
+    clear_analysis_caches()
+
+    assert benchmark_policy_analysis.compile_action_pattern.cache_info().currsize == 0
+    assert benchmark_policy_analysis.constraint_covers.cache_info().currsize == 0
+    assert benchmark_policy_analysis.statement_match_cache.misses == 0
+    assert iam_action_catalog.default_catalog() is not catalog
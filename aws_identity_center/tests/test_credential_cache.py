@@ -0,0 +1,118 @@
+import os
+import stat
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+from aws_identity_center import credential_cache
+from aws_identity_center.credential_cache import CredentialCache
+
+
+def make_sts_client():
+    sts_client = MagicMock()
+    sts_client.assume_role.side_effect = lambda **kwargs: {
+        "Credentials": {
+            "AccessKeyId": f"ASIA{sts_client.assume_role.call_count}",
+            "SecretAccessKey": "secret",
+            "SessionToken": "token",
+            "Expiration": datetime.now(timezone.utc) + timedelta(hours=1),
+        }
+    }
+    sts_client.get_caller_identity.return_value = {
+        "Account": "123456789012",
+        "Arn": "arn:aws:sts::123456789012:assumed-role/Admin/me",
+        "UserId": "AROA:me",
+    }
+    return sts_client
+
+
+@patch("boto3.client")
+def test_assume_role_is_cached_per_account_and_role(mock_boto_client):
+    sts_client = mock_boto_client.return_value = make_sts_client()
+    cache = CredentialCache()
+
+    first = cache.assume_role("111111111111", "Auditor")
+    assert cache.assume_role("111111111111", "Auditor") == first
+    cache.assume_role("222222222222", "Auditor")
+
+    assert sts_client.assume_role.call_count == 2
+    assert sts_client.assume_role.call_args.kwargs["RoleArn"] == (
+        "arn:aws:iam::222222222222:role/Auditor"
+    )
+
+
+@patch("boto3.client")
+def test_credentials_are_refreshed_ahead_of_expiry(mock_boto_client):
+    sts_client = mock_boto_client.return_value = make_sts_client()
+    cache = CredentialCache(refresh_margin=timedelta(hours=2))
+
+    cache.assume_role("111111111111", "Auditor")
+    cache.assume_role("111111111111", "Auditor")
+
+    # credentials valid for 1h are always inside the 2h refresh margin
+    assert sts_client.assume_role.call_count == 2
+
+
+@patch("boto3.client")
+def test_disk_cache_is_private_and_shared_between_runs(mock_boto_client, tmp_path):
+    sts_client = mock_boto_client.return_value = make_sts_client()
+    cache_dir = tmp_path / "credentials"
+
+    CredentialCache(str(cache_dir)).caller_identity()
+    identity = CredentialCache(str(cache_dir)).caller_identity()  # a later run
+
+    assert identity["Account"] == "123456789012"
+    assert sts_client.get_caller_identity.call_count == 1
+
+    assert stat.S_IMODE(os.stat(cache_dir).st_mode) == 0o700
+    (cache_file,) = list(cache_dir.iterdir())
+    assert stat.S_IMODE(os.stat(cache_file).st_mode) == 0o600
+
+
+@patch("boto3.client")
+def test_assumed_roles_are_cached_per_source_credentials(mock_boto_client, tmp_path):
+    sts_client = mock_boto_client.return_value = make_sts_client()
+    cache_dir = str(tmp_path / "credentials")
+
+    with patch.object(credential_cache, "source_access_key_id", return_value="ASIAPROFILEA"):
+        first = CredentialCache(cache_dir).assume_role("111111111111", "Auditor")
+        assert CredentialCache(cache_dir).assume_role("111111111111", "Auditor") == first
+    with patch.object(credential_cache, "source_access_key_id", return_value="ASIAPROFILEB"):
+        # same account and role, but assumed from other credentials: not reused from disk
+        second = CredentialCache(cache_dir).assume_role("111111111111", "Auditor")
+
+    assert second != first
+    assert sts_client.assume_role.call_count == 2
+
+
+@patch("boto3.client")
+def test_fresh_caller_identity_skips_the_disk_cache(mock_boto_client, tmp_path):
+    sts_client = mock_boto_client.return_value = make_sts_client()
+    cache_dir = str(tmp_path / "credentials")
+    CredentialCache(cache_dir).caller_identity()
+
+    # the default credentials now belong to another account
+    sts_client.get_caller_identity.return_value = dict(
+        sts_client.get_caller_identity.return_value, Account="999999999999"
+    )
+    cache = CredentialCache(cache_dir)
+
+    assert cache.caller_identity()["Account"] == "123456789012"
+    assert cache.caller_identity(fresh=True)["Account"] == "999999999999"
+    assert CredentialCache(cache_dir).caller_identity()["Account"] == "999999999999"
+
+
+@patch("boto3.client")
+def test_profile_identity_is_cached_per_source_credentials(mock_boto_client, tmp_path):
+    sts_client = mock_boto_client.return_value = make_sts_client()
+    cache_dir = str(tmp_path / "credentials")
+
+    with patch.object(credential_cache, "source_access_key_id", return_value="ASIAOLDLOGIN"):
+        assert CredentialCache(cache_dir).caller_identity()["Account"] == "123456789012"
+
+    # logged in to another account: the new credentials are not matched to the old identity
+    sts_client.get_caller_identity.return_value = dict(
+        sts_client.get_caller_identity.return_value, Account="999999999999"
+    )
+    with patch.object(credential_cache, "source_access_key_id", return_value="ASIANEWLOGIN"):
+        assert CredentialCache(cache_dir).caller_identity()["Account"] == "999999999999"
+    assert sts_client.get_caller_identity.call_count == 2
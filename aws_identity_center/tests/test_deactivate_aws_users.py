@@ -75,7 +75,7 @@ def test_process_users(iam_setup):
         def __init__(self, profile_name=None):
             pass
 
-        def client(self, service_name):
+        def client(self, service_name, **kwargs):
             if service_name == "iam":
                 return iam_setup
             raise Exception(f"Unsupported client {service_name}")
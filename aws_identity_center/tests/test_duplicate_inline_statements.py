@@ -5,9 +5,12 @@ import pytest
 from unittest.mock import patch, MagicMock
 from datetime import datetime
 from aws_identity_center.find_duplicate_inline_statement import (
+    candidate_pairs,
+    StatementMatchCache,
     find_duplicate_statements,
     main,
 )
+from aws_identity_center.statement_matching import condition_covers
 
 
 @pytest.fixture
@@ -140,3 +143,113 @@ def test_main_creates_enhanced_csv():
     assert "WildcardMatch" in match_types
 
     print(f"✅ CSV generated with {len(rows)} duplicate rows.")
+
+
+def test_candidate_pairs_skip_statements_that_cannot_match():
+    statements = [
+        {"Effect": "Allow", "Action": "s3:GetObject", "Resource": "*"},           # 0
+        {"Effect": "Allow", "Action": ["s3:*", "ec2:*"], "Resource": "*"},        # 1
+        {"Effect": "Allow", "Action": "ec2:StartInstances", "Resource": "*"},     # 2
+        {"Effect": "Deny", "Action": "s3:GetObject", "Resource": "*"},            # 3
+        {"Effect": "Allow", "NotAction": "s3:GetObject", "Resource": "*"},        # 4
+        {"Effect": "Allow", "Action": "*", "Resource": "*"},                      # 5
+        {"Effect": "Allow", "Action": ["s3:PutObject", "iam:PassRole"], "Resource": "*"},  # 6
+    ]
+
+    assert candidate_pairs(statements) == [
+        (0, 1), (0, 5), (0, 6), (1, 2), (1, 5), (2, 5), (5, 6),
+    ]
+
+
+def test_find_duplicate_statements_with_many_services():
+    statements = [
+        {"Effect": "Allow", "Action": f"service{i}:Describe", "Resource": "*"}
+        for i in range(200)
+    ]
+    statements.append({"Effect": "Allow", "Action": "service7:*", "Resource": "*"})
+    statements.append({"Effect": "Allow", "Action": "service42:Describe", "Resource": "*"})
+
+    duplicates = find_duplicate_statements(json.dumps({"Statement": statements}))
+
+    assert [(match_type, s1["Action"], s2["Action"]) for match_type, s1, s2 in duplicates] == [
+        ("WildcardMatch", "service7:Describe", "service7:*"),
+        ("ExactMatch", "service42:Describe", "service42:Describe"),
+    ]
+
+
+def test_condition_covers_normalizes_and_compares_value_sets():
+    narrow = {"StringEquals": {"aws:RequestedRegion": "eu-west-1"}}
+    wide = {"stringequals": {"AWS:RequestedRegion": ["us-east-1", "eu-west-1"]}}
+
+    # single value vs list, key casing and value order do not matter
+    assert condition_covers({"StringEquals": {"aws:RequestedRegion": ["eu-west-1"]}}, narrow)
+    assert condition_covers(wide, narrow)
+    assert not condition_covers(narrow, wide)
+
+    # StringLike globs cover StringEquals values
+    like = {"StringLike": {"iam:PassedToService": "*.amazonaws.com"}}
+    equals = {"StringEquals": {"iam:PassedToService": ["glue.amazonaws.com", "ec2.amazonaws.com"]}}
+    assert condition_covers(like, equals)
+    assert not condition_covers(equals, like)
+
+    # negated operators: excluding fewer values is wider
+    assert condition_covers(
+        {"StringNotEquals": {"aws:PrincipalTag/team": "ops"}},
+        {"StringNotEquals": {"aws:PrincipalTag/team": ["ops", "dev"]}},
+    )
+
+    # a condition on another key is not implied
+    assert not condition_covers(
+        {"StringEquals": {"aws:PrincipalAccount": "123456789012"}}, narrow
+    )
+    assert condition_covers(None, narrow)
+    assert not condition_covers(narrow, None)
+
+
+def test_match_cache_evaluates_each_pair_once_across_policies():
+    policy = json.dumps({
+        "Statement": [
+            {"Effect": "Allow", "Action": "s3:Get*", "Resource": "*"},
+            {"Effect": "Allow", "Action": "s3:GetObject", "Resource": "*"},
+        ]
+    })
+    reordered = json.dumps({
+        "Statement": [
+            {"Effect": "Allow", "Action": ["s3:GetObject"], "Resource": "*"},
+            {"Effect": "Allow", "Action": "s3:Get*", "Resource": ["*"]},
+        ]
+    })
+    cache = StatementMatchCache(maxsize=10)
+
+    first = find_duplicate_statements(policy, match_cache=cache)
+    second = find_duplicate_statements(reordered, match_cache=cache)
+
+    assert [m[0] for m in first] == ["WildcardMatch"]
+    assert [m[0] for m in second] == ["WildcardMatch"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_match_cache_is_bounded():
+    cache = StatementMatchCache(maxsize=2)
+    statement = {"Effect": "Allow", "Action": "s3:GetObject", "Resource": "*"}
+    for fingerprint in ["a", "b", "c"]:
+        cache.match(fingerprint, statement, "z", statement)
+
+    assert len(cache) == 2
+    cache.match("a", statement, "z", statement)
+    assert cache.misses == 4
+
+
+@pytest.mark.usefixtures("mock_sso_admin_client")
+def test_main_with_worker_processes_matches_sequential_output(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    today = datetime.today().strftime("%Y-%m-%d")
+    output_file = tmp_path / "outputs" / f"duplicate_inline_statements_{today}.csv"
+
+    main(workers=1)
+    sequential = output_file.read_text()
+    main(workers=2)
+    parallel = output_file.read_text()
+
+    assert parallel == sequential
+    assert "WildcardMatch" in parallel
@@ -7,6 +7,7 @@ import hashlib
 from unittest.mock import patch
 from collections import defaultdict
 from datetime import datetime
+from itertools import combinations
 from aws_identity_center.find_duplicate_policies import (
     list_permission_sets,
     get_inline_policy,
@@ -15,6 +16,7 @@ from aws_identity_center.find_duplicate_policies import (
     extract_statements,
     detect_full_matches,
     detect_partial_matches,
+    detect_subsumptions,
 )
 
 # -------------------------------
@@ -157,3 +159,153 @@ def test_detect_full_and_partial_duplicates(mock_boto_client):
 
     print("\nTest passed: Full matches and partial matches detected correctly, CSV created successfully.")
 
+
+
+def test_full_match_ignores_ordering_and_formatting():
+    """Policies that only differ in key/list/statement order or whitespace are full matches."""
+    policy_a = {
+        "Version": "2012-10-17",
+        "Statement": [
+            {"Effect": "Allow", "Action": ["s3:GetObject", "s3:PutObject"], "Resource": "*"},
+            {"Effect": "Allow", "Action": "ec2:DescribeInstances", "Resource": ["*"]},
+        ],
+    }
+    policy_b = {
+        "Statement": [
+            {"Resource": "*", "Action": ["ec2:describeinstances"], "Effect": "Allow"},
+            {"Sid": "S3", "Effect": "Allow", "Action": ["s3:PutObject", "s3:GetObject"], "Resource": "*"},
+        ],
+        "Version": "2012-10-17",
+    }
+    policy_c = {
+        "Statement": [
+            {"Effect": "Allow", "Resource": "*", "Action": ["s3:GetObject", "s3:PutObject"]},
+        ],
+    }
+
+    policy_data_map = {}
+    for name, policy, indent in [("A", policy_a, None), ("B", policy_b, 4), ("C", policy_c, 2)]:
+        policy_text = json.dumps(policy, indent=indent)
+        policy_data_map[name] = {
+            "policy_text": policy_text,
+            "policy_hash": hashlib.md5(policy_text.encode("utf-8")).hexdigest(),
+            "statements": extract_statements(policy_text),
+        }
+
+    full_matches, full_match_pairs = detect_full_matches(policy_data_map)
+    partial_matches = detect_partial_matches(policy_data_map, full_match_pairs)
+
+    assert [m["PermissionSets"] for m in full_matches] == ["A, B"]
+    assert full_match_pairs == {("A", "B")}
+    assert [m["PermissionSets"] for m in partial_matches] == ["A, C", "B, C"]
+    assert json.loads(partial_matches[1]["PolicyContent"])[0]["Sid"] == "S3"
+
+
+def test_detect_subsumptions_across_permission_sets():
+    policy_data_map = {
+        "Admins": {"statements": [
+            {"Effect": "Allow", "Action": "s3:*", "Resource": "*"},
+            {"Effect": "Allow", "Action": "ec2:Describe*", "Resource": "*"},
+        ]},
+        "Developers": {"statements": [
+            {"Effect": "Allow", "Action": ["s3:GetObject", "s3:PutObject"], "Resource": "arn:aws:s3:::app/*"},
+            {"Effect": "Allow", "Action": "ec2:Describe*", "Resource": "*"},  # exact copy, not a subsumption
+            {"Effect": "Allow", "Action": "lambda:InvokeFunction", "Resource": "*"},
+        ]},
+        "Auditors": {"statements": [
+            {"Effect": "Allow", "Action": "ec2:DescribeInstances", "Resource": "*"},
+            {"Effect": "Deny", "Action": "s3:GetObject", "Resource": "*"},
+        ]},
+    }
+
+    rows = detect_subsumptions(policy_data_map)
+
+    found = {(row["PermissionSet"], row["CoveredByPermissionSet"], row["Statement"]) for row in rows}
+    assert found == {
+        ("Developers", "Admins", json.dumps(policy_data_map["Developers"]["statements"][0])),
+        ("Auditors", "Admins", json.dumps(policy_data_map["Auditors"]["statements"][0])),
+        ("Auditors", "Developers", json.dumps(policy_data_map["Auditors"]["statements"][0])),
+    }
+
+
+def all_pairs_partial_matches(policy_data_map, full_match_pairs):
+    """The all-pairs scan detect_partial_matches replaced, kept as a reference."""
+    partial_matches = []
+    for ps1, ps2 in combinations(list(policy_data_map.keys()), 2):
+        if tuple(sorted([ps1, ps2])) in full_match_pairs:
+            continue
+        stmts2 = policy_data_map[ps2]["statements"]
+        common_statements = [stmt for stmt in policy_data_map[ps1]["statements"] if stmt in stmts2]
+        if common_statements:
+            partial_matches.append({
+                "MatchType": "partialMatch",
+                "PolicyHash": f"{ps1}_{ps2}_partial",
+                "PermissionSets": f"{ps1}, {ps2}",
+                "PolicyContent": json.dumps(common_statements, indent=2)
+            })
+    return partial_matches
+
+
+def test_indexed_partial_matches_equal_the_all_pairs_scan(tmp_path, monkeypatch):
+    shared = [
+        {"Effect": "Allow", "Action": "s3:GetObject", "Resource": "arn:aws:s3:::shared/*"},
+        {"Effect": "Allow", "Action": ["logs:PutLogEvents", "logs:CreateLogStream"], "Resource": "*"},
+        {"Effect": "Deny", "Action": "iam:*", "Resource": "*"},
+        {"Effect": "Allow", "Action": "kms:Decrypt", "Resource": "*",
+         "Condition": {"StringEquals": {"aws:PrincipalAccount": "111111111111"}}},
+    ]
+    own = [{"Effect": "Allow", "Action": "sqs:SendMessage", "Resource": f"arn:aws:sqs:::q{i}"} for i in range(6)]
+    policies = {
+        "Zeta": [shared[0], shared[1], own[0]],
+        "Alpha": [shared[1], shared[0], shared[0], own[1]],  # repeated statement
+        "Mid": [dict(reversed(list(shared[2].items()))), shared[3], own[2]],  # key order differs
+        "Beta": [shared[2], shared[3], shared[0]],
+        "Copy": [shared[2], shared[3], shared[0]],  # full match of Beta
+        "Loner": [own[3], own[4]],
+        "Last": [own[5], shared[1], shared[3], own[5]],
+    }
+    policy_data_map = {}
+    for name, statements in policies.items():
+        policy_text = json.dumps({"Version": "2012-10-17", "Statement": statements})
+        policy_data_map[name] = {
+            "policy_text": policy_text,
+            "policy_hash": hashlib.md5(policy_text.encode("utf-8")).hexdigest(),
+            "statements": extract_statements(policy_text),
+        }
+
+    _, full_match_pairs = detect_full_matches(policy_data_map)
+    assert ("Beta", "Copy") in full_match_pairs
+
+    indexed = detect_partial_matches(policy_data_map, full_match_pairs)
+    reference = all_pairs_partial_matches(policy_data_map, full_match_pairs)
+    assert indexed == reference
+    assert len(indexed) > 5
+
+    # and the CSV written from both is byte-for-byte identical
+    monkeypatch.chdir(tmp_path)
+    headers = ["MatchType", "PolicyHash", "PermissionSets", "PolicyContent"]
+    save_duplicates_to_csv(indexed, "indexed.csv", headers)
+    save_duplicates_to_csv(reference, "reference.csv", headers)
+    assert (tmp_path / "outputs" / "indexed.csv").read_bytes() == (tmp_path / "outputs" / "reference.csv").read_bytes()
+
+
+def test_full_match_needs_parsed_statements_and_the_same_version():
+    statements = [{"Effect": "Allow", "Action": "s3:GetObject", "Resource": "arn:aws:s3:::${aws:username}/*"}]
+    texts = {
+        "Broken1": "not json",
+        "Broken2": "{bad",
+        "New": json.dumps({"Version": "2012-10-17", "Statement": statements}),
+        "NewCopy": json.dumps({"Statement": statements, "Version": " 2012-10-17"}),
+        "Old": json.dumps({"Version": "2008-10-17", "Statement": statements}),
+        "NoVersion": json.dumps({"Statement": statements}),
+    }
+    policy_data_map = {
+        name: {"policy_text": text, "statements": extract_statements(text)}
+        for name, text in texts.items()
+    }
+
+    full_matches, full_match_pairs = detect_full_matches(policy_data_map)
+
+    # undecodable policies never match each other; a missing Version means 2008-10-17
+    assert full_match_pairs == {("New", "NewCopy"), ("NoVersion", "Old")}
+    assert len(full_matches) == 2
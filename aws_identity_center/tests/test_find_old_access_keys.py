@@ -0,0 +1,149 @@
+import boto3
+from datetime import datetime, timedelta, timezone
+from moto import mock_aws
+from unittest.mock import MagicMock, patch
+
+from aws_identity_center import find_old_access_keys
+
+REPORT = (
+    "user,arn,access_key_1_active,access_key_1_last_rotated,access_key_1_last_used_date,"
+    "access_key_2_active,access_key_2_last_rotated,access_key_2_last_used_date\n"
+    "<root_account>,arn:aws:iam::111111111111:root,false,N/A,N/A,false,N/A,N/A\n"
+    "alice,arn:aws:iam::111111111111:user/alice,true,2024-01-01T00:00:00+00:00,"
+    "2024-06-01T00:00:00+00:00,false,2024-05-01T00:00:00+00:00,N/A\n"
+    "bob,arn:aws:iam::111111111111:user/bob,false,N/A,N/A,false,N/A,N/A\n"
+).encode("utf-8")
+
+
+def test_keys_from_credential_report_skips_empty_slots():
+    keys = list(find_old_access_keys.keys_from_credential_report(REPORT))
+
+    assert [(key["UserName"], key["Status"]) for key in keys] == [
+        ("alice", "Active"),
+        ("alice", "Inactive"),
+    ]
+    assert keys[0]["AccountId"] == "111111111111"
+    assert keys[0]["LastUsedDate"] == datetime(2024, 6, 1, tzinfo=timezone.utc)
+    assert keys[1]["LastUsedDate"] is None
+
+
+def test_scan_profile_only_lists_keys_of_users_over_the_threshold():
+    iam_client = MagicMock()
+    iam_client.generate_credential_report.return_value = {"State": "COMPLETE"}
+    iam_client.get_credential_report.return_value = {"Content": REPORT}
+    iam_client.list_access_keys.return_value = {
+        "AccessKeyMetadata": [
+            {"AccessKeyId": "AKIAOLD", "CreateDate": datetime(2024, 1, 1, 0, 0, 0, 500, tzinfo=timezone.utc)},
+            {"AccessKeyId": "AKIANEW", "CreateDate": datetime(2024, 5, 1, tzinfo=timezone.utc)},
+        ]
+    }
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+    with patch.object(find_old_access_keys, "get_client", return_value=iam_client):
+        rows = find_old_access_keys.scan_profile("dev", 90, now)
+
+    assert [(row["AccessKeyId"], row["AgeDays"]) for row in rows] == [("AKIAOLD", 152)]
+    assert rows[0]["Profile"] == "dev"
+    assert rows[0]["LastUsedDate"] == "2024-06-01T00:00:00"
+    iam_client.list_access_keys.assert_called_once_with(UserName="alice")
+    iam_client.get_access_key_last_used.assert_not_called()
+
+
+@mock_aws
+def test_scan_profile_reads_moto_credential_report():
+    iam = boto3.client("iam", region_name="us-east-1")
+    iam.create_user(UserName="carol")
+    key_id = iam.create_access_key(UserName="carol")["AccessKey"]["AccessKeyId"]
+    later = datetime.now(timezone.utc) + timedelta(days=120)
+
+    with patch.object(find_old_access_keys, "get_client", return_value=iam), \
+            patch("aws_identity_center.list_users_iamv2.time.sleep"):
+        rows = find_old_access_keys.scan_profile("dev", 90, later)
+
+    assert [(row["UserName"], row["AccessKeyId"], row["Status"]) for row in rows] == [
+        ("carol", key_id, "Active")
+    ]
+
+
+def test_scan_profile_falls_back_to_per_user_calls():
+    iam_client = MagicMock()
+    iam_client.generate_credential_report.side_effect = Exception("AccessDenied")
+    iam_client.get_paginator.return_value.paginate.return_value = [
+        {"Users": [{"UserName": "dave"}]}
+    ]
+    iam_client.list_access_keys.return_value = {
+        "AccessKeyMetadata": [
+            {"AccessKeyId": "AKIADAVE", "Status": "Active", "CreateDate": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+        ]
+    }
+    iam_client.get_access_key_last_used.return_value = {"AccessKeyLastUsed": {}}
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+    with patch.object(find_old_access_keys, "get_client", return_value=iam_client), \
+            patch.object(find_old_access_keys, "get_profile_account_id", return_value="222222222222"):
+        rows = find_old_access_keys.scan_profile("prod", 90, now)
+
+    assert rows == [{
+        "Profile": "prod",
+        "AccountId": "222222222222",
+        "UserName": "dave",
+        "AccessKeyId": "AKIADAVE",
+        "Status": "Active",
+        "CreateDate": "2024-01-01T00:00:00",
+        "LastUsedDate": "Never",
+        "AgeDays": 152,
+    }]
+
+
+def test_scan_profiles_reports_failures_separately():
+    def fake_scan_profile(profile, max_age_days, now):
+        if profile == "broken":
+            raise RuntimeError("expired token")
+        return [{"Profile": profile}]
+
+    accounts = {"dev": "111111111111", "broken": "222222222222"}
+    with patch.object(find_old_access_keys, "scan_profile", side_effect=fake_scan_profile), \
+            patch.object(find_old_access_keys, "get_profile_account_id",
+                         side_effect=lambda profile, fresh=False: accounts[profile]):
+        results = {
+            profile: (rows, error)
+            for profile, rows, error in find_old_access_keys.scan_profiles(["dev", "broken"], 90, 4)
+        }
+
+    assert results["dev"] == ([{"Profile": "dev"}], None)
+    assert results["broken"][0] == []
+    assert str(results["broken"][1]) == "expired token"
+
+
+def test_scan_profiles_scans_each_account_once():
+    accounts = {
+        "prod-admin": "111111111111",
+        "prod-readonly": "111111111111",
+        "dev": "222222222222",
+        "dev-admin": "222222222222",
+        "gone": None,
+    }
+
+    def fake_account_id(profile, fresh=False):
+        assert fresh  # grouping never trusts a cached identity
+        if accounts[profile] is None:
+            raise RuntimeError("profile not found")
+        return accounts[profile]
+
+    def fake_scan_profile(profile, max_age_days, now):
+        if profile == "dev":
+            raise RuntimeError("AccessDenied")
+        return [{"Profile": profile}]
+
+    with patch.object(find_old_access_keys, "scan_profile", side_effect=fake_scan_profile) as scan, \
+            patch.object(find_old_access_keys, "get_profile_account_id", side_effect=fake_account_id):
+        results = {
+            profile: (rows, error)
+            for profile, rows, error in find_old_access_keys.scan_profiles(list(accounts), 90, 4)
+        }
+
+    # one scan per account; dev's account falls back to its other profile
+    assert sorted(call.args[0] for call in scan.call_args_list) == ["dev", "dev-admin", "prod-admin"]
+    assert results["prod-admin"] == ([{"Profile": "prod-admin"}], None)
+    assert results["dev-admin"] == ([{"Profile": "dev-admin"}], None)
+    assert str(results["gone"][1]) == "profile not found"
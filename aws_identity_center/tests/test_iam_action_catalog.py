@@ -0,0 +1,91 @@
+from aws_identity_center.statement_matching import statement_covers
+from aws_identity_center.iam_action_catalog import IamActionCatalog, default_catalog
+
+
+class FakeLoader:
+    """Stands in for botocore's loader with two tiny service models."""
+
+    MODELS = {
+        "s3": {"operations": {"GetObject": {}, "GetObjectAcl": {}, "PutObject": {}}},
+        "s3control": {"operations": {"GetAccessPoint": {}}},
+    }
+
+    def list_available_services(self, type_name):
+        return list(self.MODELS)
+
+    def load_service_model(self, service_name, type_name):
+        return self.MODELS[service_name]
+
+
+def make_catalog():
+    return IamActionCatalog(loader=FakeLoader())
+
+
+def test_wildcard_expands_to_catalog_actions():
+    catalog = make_catalog()
+    get_all, explicit = catalog.action_sets(
+        ["s3:Get*"], ["s3:GetObject", "s3:GetObjectAcl", "s3:GetAccessPoint", "s3:GetObjectVersion"]
+    )
+
+    # every s3:Get* action in the catalog (incl. s3control and extras) is listed explicitly
+    assert explicit.covers(get_all) is False  # extras also hold e.g. s3:GetBucketPolicy
+    assert get_all.covers(explicit)
+    assert get_all.overlaps(explicit)
+
+
+def test_explicit_list_never_covers_a_wildcard():
+    catalog = make_catalog()
+    (put_all,) = catalog.action_sets(["s3:Put*"])
+    names = [
+        action for action in catalog._service_actions["s3"]
+        if action.startswith("s3:put")
+    ]
+    (explicit,) = catalog.action_sets(names)
+    # s3:Put* also matches actions the catalog does not know about
+    assert not explicit.covers(put_all)
+    assert put_all.covers(explicit)
+
+
+def test_wildcards_are_covered_by_glob_semantics():
+    def covers(actions1, actions2):
+        s1 = {"Effect": "Allow", "Action": actions1, "Resource": "*"}
+        s2 = {"Effect": "Allow", "Action": actions2, "Resource": "*"}
+        return statement_covers(s1, s2)
+
+    assert not covers("iam:PassRole", "iam:Pass*")
+    assert not covers("kms:Decrypt", "kms:Decrypt*")
+    assert not covers("s3:Get*", "s3:G*")
+    assert covers("s3:G*", "s3:Get*")
+    assert covers(["s3:Get*", "s3:Put*"], ["s3:GetObject*", "s3:PutObject"])
+
+
+def test_unknown_service_falls_back_to_glob_matching():
+    catalog = make_catalog()
+    wide, narrow, literal = catalog.action_sets(["foo:*"], ["foo:Bar*"], ["foo:BarBaz"])
+
+    assert wide.covers(narrow)
+    assert narrow.covers(literal)
+    assert not literal.covers(narrow)
+
+
+def test_star_covers_everything():
+    catalog = make_catalog()
+    everything, s3 = catalog.action_sets("*", ["s3:*"])
+    assert everything.covers(s3)
+    assert not s3.covers(everything)
+
+
+def test_not_action_coverage_runs_the_other_way():
+    wide = {"Effect": "Allow", "NotAction": ["iam:*"], "Resource": "*"}
+    narrow = {"Effect": "Allow", "NotAction": ["iam:*", "s3:*"], "Resource": "*"}
+
+    assert statement_covers(wide, narrow)
+    assert not statement_covers(narrow, wide)
+
+
+def test_default_catalog_uses_botocore_models():
+    (ec2,) = default_catalog().action_sets(["ec2:Describe*"])
+    (instances,) = default_catalog().action_sets(["ec2:DescribeInstances"])
+    assert ec2.covers(instances)
+    assert ec2.wildcards == ("ec2:describe*",)
+    assert bin(ec2.mask).count("1") > 100
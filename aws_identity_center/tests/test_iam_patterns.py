@@ -0,0 +1,98 @@
+import pytest
+
+from aws_identity_center.statement_matching import (
+    action_includes,
+    actions_cover_each_other,
+    resource_covers,
+    statements_match,
+)
+from aws_identity_center.iam_patterns import (
+    ActionPatternTrie,
+    ResourcePatternTrie,
+    resource_pattern_covers,
+)
+
+
+@pytest.mark.parametrize(
+    "pattern, action, expected",
+    [
+        ("*", "s3:GetObject", True),
+        ("s3:*", "s3:GetObject", True),
+        ("s3:Get*", "s3:GetObject", True),
+        ("s3:Get*", "S3:getobjectacl", True),
+        ("ec2:Describe*", "ec2:DescribeInstances", True),
+        ("ec2:Describe*", "ec2:Describe*Attribute", True),
+        ("ec2:Describe*", "ec2:RunInstances", False),
+        ("s3:GetObjec?", "s3:GetObject", True),
+        ("s3:GetObjec?", "s3:GetObjec?", True),
+        ("s3:GetObjec?", "s3:GetObjec*", False),
+        ("s3:GetObject", "s3:*", False),
+        ("s3:*Object", "s3:Get*", False),
+        ("s3:*", "ec2:DescribeInstances", False),
+    ],
+)
+def test_action_includes_glob_semantics(pattern, action, expected):
+    assert action_includes(pattern, action) is expected
+
+
+def test_action_pattern_trie_matches_any_pattern():
+    trie = ActionPatternTrie(["ec2:Describe*", "ec2:DescribeInstances", "s3:Get?bject", "iam:*"])
+
+    assert trie.covers("ec2:DescribeVolumes")
+    assert trie.covers("iam:PassRole")
+    assert trie.covers("s3:GetObject")
+    assert not trie.covers("s3:GetObjectAcl")
+    assert not trie.covers("ec2:*")
+
+
+def test_wildcard_prefixes_are_reported_as_duplicates():
+    assert actions_cover_each_other(["s3:Get*", "s3:List*"], ["s3:GetObject", "s3:ListBucket"])
+    assert not actions_cover_each_other(["s3:Get*"], ["s3:GetObject", "s3:PutObject"])
+
+    s1 = {"Effect": "Allow", "Action": "ec2:Describe*", "Resource": "*"}
+    s2 = {"Effect": "Allow", "Action": ["ec2:DescribeInstances", "ec2:DescribeVolumes"], "Resource": "*"}
+    assert statements_match(s1, s2)
+
+
+@pytest.mark.parametrize(
+    "pattern, resource, expected",
+    [
+        ("*", "arn:aws:s3:::logs-prod", True),
+        ("arn:aws:s3:::logs-*", "arn:aws:s3:::logs-prod/*", True),
+        ("arn:aws:s3:::logs-prod/*", "arn:aws:s3:::logs-*", False),
+        ("arn:aws:s3:::Logs-*", "arn:aws:s3:::logs-prod", False),
+        ("arn:aws:iam::*:role/admin", "arn:aws:iam::123456789012:role/admin", True),
+        ("arn:aws:iam::12345678901?:role/*", "arn:aws:iam::123456789012:role/a", True),
+        ("arn:aws:*:us-east-1:*:*", "arn:aws:sqs:us-east-1:123456789012:queue", True),
+        ("arn:aws:*:us-east-1:*:*", "arn:aws:sqs:eu-west-1:123456789012:queue", False),
+        ("arn:aws:logs:*:*:log-group:app:*", "arn:aws:logs:us-east-1:1:log-group:app:log-stream:x", True),
+        ("arn:aws:s3:::bucket", "*", False),
+    ],
+)
+def test_resource_pattern_covers_arn_segments(pattern, resource, expected):
+    assert resource_pattern_covers(pattern, resource) is expected
+
+
+def test_resource_pattern_trie_matches_any_pattern():
+    trie = ResourcePatternTrie([
+        "arn:aws:s3:::logs-*",
+        "arn:aws:iam::123456789012:role/*",
+        "arn:aws:dynamodb:*:123456789012:table/orders",
+    ])
+
+    assert trie.covers("arn:aws:s3:::logs-prod/2024/*")
+    assert trie.covers("arn:aws:iam::123456789012:role/deploy")
+    assert trie.covers("arn:aws:dynamodb:eu-west-1:123456789012:table/orders")
+    assert not trie.covers("arn:aws:dynamodb:eu-west-1:999999999999:table/orders")
+    assert not trie.covers("arn:aws:s3:::data/*")
+    assert not trie.covers("*")
+
+
+def test_resource_covers_lists():
+    assert resource_covers(
+        ["arn:aws:s3:::logs-*", "arn:aws:s3:::data"],
+        ["arn:aws:s3:::logs-prod/*", "arn:aws:s3:::data"],
+    )
+    assert not resource_covers("arn:aws:s3:::logs-*", ["arn:aws:s3:::logs-a", "arn:aws:s3:::data"])
+    assert resource_covers(["arn:aws:s3:::a", "*"], "arn:aws:s3:::b")
+    assert not resource_covers(None, "arn:aws:s3:::a")
@@ -0,0 +1,53 @@
+import boto3
+from datetime import datetime, timedelta, timezone
+from moto import mock_aws
+from unittest.mock import patch
+
+from aws_identity_center import list_users_iam
+from credential_cache import source_access_key_id  # the module list_users_iam uses
+
+
+@mock_aws
+def test_assume_role_in_account_reuses_cached_credentials():
+    list_users_iam._assumed_clients.clear()
+    iam = boto3.client("iam", region_name="us-east-1")
+    iam.create_role(RoleName="Auditor", AssumeRolePolicyDocument="{}")
+
+    with patch("boto3.client", wraps=boto3.client) as client_factory:
+        first = list_users_iam.assume_role_in_account("123456789012", "Auditor")
+        second = list_users_iam.assume_role_in_account("123456789012", "Auditor")
+
+    assert first is second
+    # one shared STS client, one AssumeRole call
+    assert [c.args[0] for c in client_factory.call_args_list] == ["sts"]
+    list_users_iam._assumed_clients.clear()
+
+
+@mock_aws
+def test_assume_role_refreshes_credentials_close_to_expiry():
+    list_users_iam._assumed_clients.clear()
+    first = list_users_iam.assume_role_in_account("123456789012", "Auditor")
+
+    cache = list_users_iam.default_credential_cache()
+    key = ("role", source_access_key_id(), "123456789012", "Auditor")
+    entry = cache.get(key)
+    cache.put(key, dict(entry, Expiration=datetime.now(timezone.utc) + timedelta(minutes=1)))
+
+    assert list_users_iam.assume_role_in_account("123456789012", "Auditor") is not first
+    list_users_iam._assumed_clients.clear()
+
+
+def test_scan_accounts_reports_failures_separately():
+    def fake_scan_account(account_id, role_name):
+        if account_id == "222":
+            raise RuntimeError("AccessDenied")
+        return [{"AccountId": account_id, "UserName": "alice", "CreateDate": "2024-01-01T00:00:00"}]
+
+    with patch.object(list_users_iam, "scan_account", side_effect=fake_scan_account):
+        results = list(list_users_iam.scan_accounts(["111", "222", "333"], "Auditor", max_workers=3))
+
+    by_account = {account_id: (rows, error) for account_id, rows, error in results}
+    assert len(by_account["111"][0]) == 1
+    assert by_account["333"][1] is None
+    assert isinstance(by_account["222"][1], RuntimeError)
+    assert by_account["222"][0] == []
@@ -0,0 +1,149 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import boto3
+from moto import mock_aws
+
+from aws_identity_center.list_users_iamv2 import (
+    collect_user_activity_from_report,
+    get_codecommit_last_used,
+    get_codecommit_last_used_batch,
+    get_user_last_activity,
+    iter_credential_report,
+    parse_report_date,
+)
+
+
+def make_iam_client(rounds_until_done):
+    """IAM client whose job for user N completes after rounds_until_done[N] polls."""
+    iam_client = MagicMock()
+    polls = {}
+
+    def generate(Arn):
+        if Arn.endswith("broken"):
+            raise RuntimeError("AccessDenied")
+        return {"JobId": Arn}
+
+    def get_details(JobId, Marker=None):
+        if Marker:
+            return {
+                "JobStatus": "COMPLETED",
+                "ServicesLastAccessed": [
+                    {"ServiceName": "AWS CodeCommit", "LastAuthenticated": f"date-{JobId}"}
+                ],
+            }
+        polls[JobId] = polls.get(JobId, 0) + 1
+        if polls[JobId] < rounds_until_done[JobId]:
+            return {"JobStatus": "IN_PROGRESS"}
+        if JobId.endswith("failed"):
+            return {"JobStatus": "FAILED"}
+        return {
+            "JobStatus": "COMPLETED",
+            "ServicesLastAccessed": [{"ServiceName": "Amazon S3"}],
+            "IsTruncated": True,
+            "Marker": "page-2",
+        }
+
+    iam_client.generate_service_last_accessed_details.side_effect = generate
+    iam_client.get_service_last_accessed_details.side_effect = get_details
+    return iam_client
+
+
+@patch("aws_identity_center.list_users_iamv2.time.sleep")
+def test_batch_submits_all_jobs_then_polls_with_backoff(mock_sleep):
+    rounds = {"arn:user/a": 1, "arn:user/b": 4, "arn:user/failed": 2, "arn:user/broken": 1}
+    iam_client = make_iam_client(rounds)
+
+    results = get_codecommit_last_used_batch(iam_client, list(rounds))
+
+    assert results == {
+        "arn:user/a": "date-arn:user/a",
+        "arn:user/b": "date-arn:user/b",
+        "arn:user/failed": None,
+        "arn:user/broken": None,
+    }
+    # the slowest job needs 4 rounds: 3 sleeps, doubling each time
+    assert [c.args[0] for c in mock_sleep.call_args_list] == [1, 2, 4]
+    assert iam_client.generate_service_last_accessed_details.call_count == 4
+
+
+@patch("aws_identity_center.list_users_iamv2.time.sleep")
+def test_single_user_lookup_uses_the_batch(mock_sleep):
+    iam_client = make_iam_client({"arn:user/a": 2})
+    assert get_codecommit_last_used(iam_client, "arn:user/a") == "date-arn:user/a"
+    assert mock_sleep.call_count == 1
+
+
+REPORT = (
+    "user,arn,user_creation_time,password_enabled,password_last_used,"
+    "access_key_1_active,access_key_1_last_used_date,access_key_2_active,access_key_2_last_used_date\n"
+    "<root_account>,arn:aws:iam::1:root,2020-01-01T00:00:00+00:00,not_supported,no_information,false,N/A,false,N/A\n"
+    "alice,arn:aws:iam::1:user/alice,2020-01-01T00:00:00+00:00,true,2024-05-01T10:00:00+00:00,"
+    "true,2024-04-01T00:00:00+00:00,true,2024-06-01T00:00:00+00:00\n"
+    "bob,arn:aws:iam::1:user/bob,2020-01-01T00:00:00+00:00,false,N/A,false,N/A,false,N/A\n"
+).encode("utf-8")
+
+
+def test_parse_report_date():
+    assert parse_report_date("N/A") is None
+    assert parse_report_date("no_information") is None
+    assert parse_report_date("2024-05-01T10:00:00+00:00") == datetime(2024, 5, 1, 10, tzinfo=timezone.utc)
+
+
+@patch("aws_identity_center.list_users_iamv2.time.sleep")
+def test_collect_user_activity_from_report_uses_one_report(mock_sleep):
+    iam_client = MagicMock()
+    iam_client.generate_credential_report.side_effect = [
+        {"State": "STARTED"},
+        {"State": "COMPLETE"},
+    ]
+    iam_client.get_credential_report.return_value = {"Content": REPORT}
+
+    activity = collect_user_activity_from_report(iam_client)
+
+    assert set(activity) == {"alice", "bob"}
+    assert activity["alice"]["AccessKeyLastUsed"] == datetime(2024, 6, 1, tzinfo=timezone.utc)
+    assert activity["alice"]["PasswordLastUsed"].month == 5
+    assert activity["bob"] == {"PasswordLastUsed": None, "AccessKeyLastUsed": None}
+    assert mock_sleep.call_count == 1
+    iam_client.list_access_keys.assert_not_called()
+
+
+@mock_aws
+def test_credential_report_rows_stream_from_moto():
+    iam_client = boto3.client("iam", region_name="us-east-1")
+    iam_client.create_user(UserName="carol")
+    iam_client.create_access_key(UserName="carol")
+
+    with patch("aws_identity_center.list_users_iamv2.time.sleep"):
+        activity = collect_user_activity_from_report(iam_client)
+
+    assert "carol" in activity
+    rows = list(iter_credential_report(iam_client.get_credential_report()["Content"]))
+    assert any(row["user"] == "carol" for row in rows)
+
+
+def test_user_last_activity_prefers_the_credential_report():
+    iam_client = MagicMock()
+    report_activity = {
+        "alice": {
+            "PasswordLastUsed": datetime(2024, 5, 1, tzinfo=timezone.utc),
+            "AccessKeyLastUsed": datetime(2024, 6, 1, tzinfo=timezone.utc),
+        }
+    }
+    alice = {"UserName": "alice", "PasswordLastUsed": datetime(2023, 1, 1, tzinfo=timezone.utc)}
+
+    assert get_user_last_activity(iam_client, alice, report_activity) == (
+        datetime(2024, 5, 1, tzinfo=timezone.utc),
+        datetime(2024, 6, 1, tzinfo=timezone.utc),
+    )
+    iam_client.list_access_keys.assert_not_called()
+
+    # users missing from the report fall back to list_users and per-user calls
+    iam_client.list_access_keys.return_value = {"AccessKeyMetadata": []}
+    bob = {"UserName": "bob", "PasswordLastUsed": datetime(2023, 1, 1, tzinfo=timezone.utc)}
+    assert get_user_last_activity(iam_client, bob, report_activity) == (
+        datetime(2023, 1, 1, tzinfo=timezone.utc),
+        None,
+    )
+    iam_client.list_access_keys.assert_called_once_with(UserName="bob")
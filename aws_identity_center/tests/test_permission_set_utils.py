@@ -0,0 +1,293 @@
+import boto3
+import csv
+import json
+from moto import mock_aws
+from unittest.mock import MagicMock, patch
+
+from aws_identity_center.main_inline_policies import collect_inline_permission_set_data
+from aws_identity_center.permission_set_utils import (
+    CsvRowWriter,
+    PermissionSetSnapshot,
+    PolicyTableWriter,
+    PrincipalDirectory,
+    clear_identity_store_ids,
+    get_identity_store_id,
+    iter_permission_set_assignments,
+    list_permission_set_assignments,
+    load_permission_set_snapshot,
+    pop_normalized_flag,
+    write_to_csv,
+)
+
+INSTANCE_ARN = "arn:aws:sso:::instance/ssoins-xxxx"
+
+mock_permission_sets = [
+    f"arn:aws:sso:::permissionSet/ssoins-xxxx/ps-{i:04d}" for i in range(40)
+]
+
+
+def make_sso_client():
+    """Build a fake sso-admin client backed by in-memory permission sets."""
+    sso_client = MagicMock()
+    sso_client.exceptions.ResourceNotFoundException = type(
+        "ResourceNotFoundException", (Exception,), {}
+    )
+
+    sso_client.list_permission_sets.side_effect = [
+        {"PermissionSets": mock_permission_sets[:25], "NextToken": "page-2"},
+        {"PermissionSets": mock_permission_sets[25:]},
+    ]
+
+    def describe_permission_set(InstanceArn, PermissionSetArn):
+        return {"PermissionSet": {"Name": PermissionSetArn.split("/")[-1]}}
+
+    def get_inline_policy(InstanceArn, PermissionSetArn):
+        if PermissionSetArn.endswith("0"):
+            raise sso_client.exceptions.ResourceNotFoundException()
+        policy = {"Statement": [{"Effect": "Allow", "Action": "s3:*", "Resource": "*"}]}
+        return {"InlinePolicy": json.dumps(policy)}
+
+    def list_managed_policies(InstanceArn, PermissionSetArn):
+        return {
+            "AttachedManagedPolicies": [
+                {"Name": "ReadOnlyAccess", "Arn": "arn:aws:iam::aws:policy/ReadOnlyAccess"}
+            ]
+        }
+
+    sso_client.describe_permission_set.side_effect = describe_permission_set
+    sso_client.get_inline_policy_for_permission_set.side_effect = get_inline_policy
+    sso_client.list_managed_policies_in_permission_set.side_effect = list_managed_policies
+    return sso_client
+
+
+def test_load_permission_set_snapshot():
+    sso_client = make_sso_client()
+
+    snapshot = load_permission_set_snapshot(INSTANCE_ARN, sso_client=sso_client, max_workers=8)
+
+    assert isinstance(snapshot, PermissionSetSnapshot)
+    assert len(snapshot) == 40
+    # Order follows list_permission_sets even though fetches run concurrently
+    assert [ps.arn for ps in snapshot] == mock_permission_sets
+    assert all(ps.name == ps.arn.split("/")[-1] for ps in snapshot)
+
+    no_inline = [ps for ps in snapshot if ps.inline_policy is None]
+    assert len(no_inline) == 4
+
+    details = snapshot.get(mock_permission_sets[1])
+    assert details.managed_policies[0]["Name"] == "ReadOnlyAccess"
+    assert snapshot.get("arn:aws:sso:::permissionSet/ssoins-xxxx/missing") is None
+    assert sso_client.describe_permission_set.call_count == 40
+
+
+@mock_aws
+def test_principal_directory_resolves_names_from_one_listing():
+    identitystore_client = boto3.client("identitystore", region_name="us-east-1")
+    identity_store_id = "d-test"
+
+    user_id = identitystore_client.create_user(
+        IdentityStoreId=identity_store_id,
+        UserName="jane.doe",
+        DisplayName="Jane Doe",
+        Name={"GivenName": "Jane", "FamilyName": "Doe"},
+    )["UserId"]
+    group_id = identitystore_client.create_group(
+        IdentityStoreId=identity_store_id, DisplayName="Admins"
+    )["GroupId"]
+
+    directory = PrincipalDirectory(identity_store_id, identitystore_client).load()
+
+    with patch.object(identitystore_client, "describe_user") as describe_user, \
+            patch.object(identitystore_client, "describe_group") as describe_group:
+        for _ in range(200):
+            assert directory.get_name(group_id, "GROUP") == "Admins"
+            assert directory.get_name(user_id, "USER") == "jane.doe"
+
+        describe_user.assert_not_called()
+        describe_group.assert_not_called()
+
+    # Unknown IDs fall back to a single describe call
+    late_group_id = identitystore_client.create_group(
+        IdentityStoreId=identity_store_id, DisplayName="Late"
+    )["GroupId"]
+    with patch.object(
+        identitystore_client, "describe_group", return_value={"DisplayName": "Late"}
+    ) as describe_group:
+        assert directory.get_name(late_group_id, "GROUP") == "Late"
+        assert directory.get_name(late_group_id, "GROUP") == "Late"
+        assert describe_group.call_count == 1
+
+
+def test_iter_permission_set_assignments_fans_out_accounts():
+    account_ids = [f"{i:012d}" for i in range(60)]
+    permission_set_arn = mock_permission_sets[0]
+
+    sso_client = MagicMock()
+    sso_client.list_instances.return_value = {
+        "Instances": [{"InstanceArn": INSTANCE_ARN, "IdentityStoreId": "d-test"}]
+    }
+    sso_client.list_accounts_for_provisioned_permission_set.side_effect = [
+        {"AccountIds": account_ids[:30], "NextToken": "page-2"},
+        {"AccountIds": account_ids[30:]},
+    ]
+
+    def list_account_assignments(InstanceArn, PermissionSetArn, AccountId, NextToken=None):
+        if NextToken is None:
+            return {
+                "AccountAssignments": [{"PrincipalId": "g-1", "PrincipalType": "GROUP"}],
+                "NextToken": "more",
+            }
+        return {"AccountAssignments": [{"PrincipalId": "u-1", "PrincipalType": "USER"}]}
+
+    sso_client.list_account_assignments.side_effect = list_account_assignments
+
+    directory = PrincipalDirectory("d-test", identitystore_client=MagicMock())
+    directory.names.update({"g-1": "Admins", "u-1": "jane.doe"})
+
+    assignments = list(
+        iter_permission_set_assignments(
+            INSTANCE_ARN,
+            permission_set_arn,
+            principal_directory=directory,
+            max_workers=8,
+            sso_client=sso_client,
+        )
+    )
+
+    assert len(assignments) == 120
+    assert {a["AccountId"] for a in assignments} == set(account_ids)
+    assert {a["PrincipalName"] for a in assignments} == {"Admins", "jane.doe"}
+    directory.client.describe_group.assert_not_called()
+
+
+@patch("boto3.client")
+def test_list_permission_set_assignments_resolves_instance_once(mock_boto_client):
+    sso_client = mock_boto_client.return_value
+    sso_client.list_instances.return_value = {
+        "Instances": [
+            {"InstanceArn": "arn:aws:sso:::instance/ssoins-once", "IdentityStoreId": "d-once"}
+        ]
+    }
+    sso_client.list_accounts_for_provisioned_permission_set.return_value = {"AccountIds": []}
+
+    for ps in mock_permission_sets[:5]:
+        assert list_permission_set_assignments("arn:aws:sso:::instance/ssoins-once", ps) == []
+
+    assert sso_client.list_instances.call_count == 1
+
+
+def test_csv_row_writer_streams_rows_and_keeps_header_only_files(tmp_path):
+    empty = tmp_path / "empty.csv"
+    with CsvRowWriter(str(empty)):
+        pass
+    assert empty.read_text().startswith("PermissionSetName,PermissionSetArn")
+
+    streamed = tmp_path / "streamed.csv"
+    writer = CsvRowWriter(str(streamed), fieldnames=["A"], flush_every=2)
+    writer.write({"A": "1"})
+    writer.write({"A": "2"})
+    # flushed after every second row, before the file is closed
+    assert streamed.read_text().splitlines() == ["A", "1", "2"]
+    writer.close()
+
+
+def test_inline_collector_yields_rows_lazily(tmp_path):
+    snapshot = load_permission_set_snapshot(INSTANCE_ARN, sso_client=make_sso_client())
+    assignments = [{"PrincipalType": "GROUP", "PrincipalName": "admins", "AccountId": "111"}]
+
+    with patch(
+        "aws_identity_center.main_inline_policies.list_permission_set_assignments",
+        return_value=assignments,
+    ) as mock_list:
+        rows = collect_inline_permission_set_data(
+            INSTANCE_ARN, ["s3:*"], snapshot=snapshot, principal_directory=MagicMock()
+        )
+        assert mock_list.call_count == 0  # nothing fetched until rows are consumed
+
+        first = next(rows)
+        assert mock_list.call_count == 1
+        assert first["PrincipalName"] == "admins"
+
+        output = tmp_path / "inline.csv"
+        write_to_csv(str(output), rows)
+
+    # 36 permission sets have an inline policy; the first row was consumed above
+    assert len(output.read_text().splitlines()) == 1 + 35
+
+
+def test_policy_table_writes_each_policy_once(tmp_path):
+    policy = json.dumps({"Statement": [{"Effect": "Allow", "Action": "s3:*", "Resource": "*"}]})
+    rows = [
+        {
+            "PermissionSetName": name,
+            "PermissionSetArn": f"arn:aws:sso:::permissionSet/ssoins-xxxx/{name}",
+            "ManagedPolicies": "ReadOnlyAccess",
+            "InlinePolicy": policy,
+            "PrincipalType": "GROUP",
+            "PrincipalName": f"group-{account}",
+            "AccountId": str(account),
+        }
+        for name in ("ps-a", "ps-b")
+        for account in range(3)
+    ]
+
+    table_path = tmp_path / "policies.csv"
+    with PolicyTableWriter(str(table_path)) as policy_table:
+        slim_rows = [policy_table.normalize(row) for row in rows]
+
+    # both permission sets have identical content, so it is stored once
+    assert len(table_path.read_text().splitlines()) == 2
+    assert len({row["PolicyHash"] for row in slim_rows}) == 1
+    assert "InlinePolicy" not in slim_rows[0]
+    assert slim_rows[4]["PrincipalName"] == "group-1"
+
+
+def test_policy_table_keeps_hashes_of_an_earlier_run(tmp_path):
+    def row(name, managed, inline):
+        return {
+            "PermissionSetName": name,
+            "PermissionSetArn": f"arn:aws:sso:::permissionSet/ssoins-xxxx/{name}",
+            "ManagedPolicies": managed,
+            "InlinePolicy": inline,
+            "PrincipalType": "USER",
+            "PrincipalName": "alice",
+            "AccountId": "111111111111",
+        }
+
+    table_path = str(tmp_path / "policies.csv")
+    # e.g. main_aws_managed.py, then main_inline_policies.py in the same folder
+    with PolicyTableWriter(table_path) as policy_table:
+        first = policy_table.normalize(row("ps-a", "ReadOnlyAccess", ""))
+    with PolicyTableWriter(table_path) as policy_table:
+        second = policy_table.normalize(row("ps-b", "", '{"Statement": []}'))
+        again = policy_table.normalize(row("ps-a", "ReadOnlyAccess", ""))
+
+    with open(table_path, newline="") as f:
+        table = list(csv.DictReader(f))
+    hashes = [entry["PolicyHash"] for entry in table]
+
+    assert sorted(hashes) == sorted({first["PolicyHash"], second["PolicyHash"]})
+    assert again["PolicyHash"] == first["PolicyHash"]
+    assert table[0]["ManagedPolicies"] == "ReadOnlyAccess"
+
+
+def test_pop_normalized_flag():
+    argv = ["main_inline_policies.py", "--normalized", "['s3:*']"]
+    assert pop_normalized_flag(argv) is True
+    assert argv == ["main_inline_policies.py", "['s3:*']"]
+    assert pop_normalized_flag(argv) is False
+
+
+def test_identity_store_id_is_resolved_once_per_instance():
+    sso_client = MagicMock()
+    sso_client.list_instances.return_value = {
+        "Instances": [{"InstanceArn": INSTANCE_ARN, "IdentityStoreId": "d-1234567890"}]
+    }
+
+    assert get_identity_store_id(INSTANCE_ARN, sso_client) == "d-1234567890"
+    assert get_identity_store_id(INSTANCE_ARN, sso_client) == "d-1234567890"
+    assert sso_client.list_instances.call_count == 1
+
+    clear_identity_store_ids()
+    get_identity_store_id(INSTANCE_ARN, sso_client)
+    assert sso_client.list_instances.call_count == 2
@@ -0,0 +1,55 @@
+import os
+
+from aws_identity_center import profiling
+from aws_identity_center.profiling import PhaseTimer, run_with_profiling
+
+
+def test_phase_is_a_no_op_without_the_flag():
+    calls = []
+
+    def main():
+        with profiling.phase("analyze"):
+            calls.append(profiling._active_timer)
+        return "done"
+
+    argv = ["script.py", "--other"]
+    assert run_with_profiling(main, "script", argv=argv) == "done"
+    assert calls == [None]
+    assert argv == ["script.py", "--other"]
+
+
+def test_profile_flag_times_phases_and_writes_report(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    seen_argv = []
+
+    def main():
+        seen_argv.extend(argv)
+        with profiling.phase("fetch policies"):
+            pass
+        for _ in range(2):
+            with profiling.phase("analyze"):
+                sum(range(1000))
+
+    argv = ["script.py", "positional", "--cprofile"]
+    run_with_profiling(main, "my_script", argv=argv)
+
+    assert seen_argv == ["script.py", "positional"]
+    reports = sorted(os.listdir(tmp_path / "outputs"))
+    assert any(name.endswith(".prof") for name in reports)
+    report = next(name for name in reports if name.endswith(".txt"))
+    assert report.startswith("my_script_profile_")
+
+    content = (tmp_path / "outputs" / report).read_text()
+    assert "fetch policies" in content
+    assert "Hot functions" in content
+    assert profiling._active_timer is None
+
+
+def test_phase_timer_accumulates_repeated_phases():
+    timer = PhaseTimer()
+    for _ in range(3):
+        with timer.phase("write"):
+            pass
+
+    assert timer.calls == {"write": 3}
+    assert "write" in timer.format_table()
@@ -0,0 +1,94 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from aws_identity_center.permission_set_utils import (
+    PermissionSetDetails,
+    PermissionSetSnapshot,
+    PrincipalDirectory,
+    get_instance_arn,
+    load_permission_set_snapshot,
+)
+from aws_identity_center.snapshot_store import SnapshotStore, open_snapshot_store
+
+INSTANCE_ARN = "arn:aws:sso:::instance/ssoins-xxxx"
+PS_ARN = "arn:aws:sso:::permissionSet/ssoins-xxxx/ps-1111"
+
+
+def make_snapshot():
+    return PermissionSetSnapshot(
+        instance_arn=INSTANCE_ARN,
+        permission_sets=[
+            PermissionSetDetails(
+                arn=PS_ARN,
+                name="Admins",
+                inline_policy='{"Statement": []}',
+                managed_policies=[
+                    {"Name": "ReadOnlyAccess", "Arn": "arn:aws:iam::aws:policy/ReadOnlyAccess"}
+                ],
+            ),
+            PermissionSetDetails(arn=PS_ARN + "2", name="Viewers"),
+        ],
+    )
+
+
+def test_snapshot_round_trip(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshot.sqlite"), ttl_seconds=60)
+    assert store.load_permission_set_snapshot(INSTANCE_ARN) is None
+
+    store.save_permission_set_snapshot(make_snapshot())
+    store.save_assignments(
+        INSTANCE_ARN,
+        PS_ARN,
+        [{"AccountId": "111111111111", "PrincipalType": "GROUP", "PrincipalId": "g-1", "PrincipalName": "Admins"}],
+    )
+    store.save_principals("d-test", {"g-1": "Admins", "u-1": "jane.doe"})
+
+    loaded = store.load_permission_set_snapshot(INSTANCE_ARN)
+    assert [vars(ps) for ps in loaded] == [vars(ps) for ps in make_snapshot()]
+    assert store.load_assignments(INSTANCE_ARN, PS_ARN)[0]["PrincipalName"] == "Admins"
+    assert store.load_principals("d-test") == {"g-1": "Admins", "u-1": "jane.doe"}
+
+
+def test_stale_sections_are_refetched(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshot.sqlite"), ttl_seconds=60)
+    store.save_permission_set_snapshot(make_snapshot())
+
+    with patch("time.time", return_value=time.time() + 120):
+        assert store.load_permission_set_snapshot(INSTANCE_ARN) is None
+
+
+def test_fresh_snapshot_skips_aws_calls(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshot.sqlite"), ttl_seconds=60)
+    store.save_permission_set_snapshot(make_snapshot())
+    store.save_principals("d-test", {"g-1": "Admins"})
+    sso_client = MagicMock()
+    identitystore_client = MagicMock()
+
+    snapshot = load_permission_set_snapshot(INSTANCE_ARN, sso_client=sso_client, store=store)
+    directory = PrincipalDirectory("d-test", identitystore_client).load(store=store)
+
+    assert [ps.name for ps in snapshot] == ["Admins", "Viewers"]
+    assert directory.get_name("g-1", "GROUP") == "Admins"
+    sso_client.list_permission_sets.assert_not_called()
+    identitystore_client.get_paginator.assert_not_called()
+
+
+def test_instance_arn_is_read_from_a_fresh_snapshot(tmp_path):
+    store = SnapshotStore(str(tmp_path / "snapshot.sqlite"), ttl_seconds=60)
+    sso_client = MagicMock()
+    sso_client.list_instances.return_value = {"Instances": [{"InstanceArn": "arn:aws:sso:::instance/live"}]}
+
+    assert get_instance_arn(sso_client, store=store) == "arn:aws:sso:::instance/live"
+
+    store.save_permission_set_snapshot(make_snapshot())
+    sso_client.reset_mock()
+    assert get_instance_arn(sso_client, store=store) == INSTANCE_ARN
+    sso_client.list_instances.assert_not_called()
+
+    with patch("time.time", return_value=time.time() + 120):
+        assert store.load_instance_arn() is None
+
+
+def test_store_is_disabled_without_ttl(monkeypatch):
+    monkeypatch.delenv("IDENTITY_CENTER_SNAPSHOT_TTL", raising=False)
+    assert open_snapshot_store() is None